@@ -1,97 +1,140 @@
+import time
 import numpy as np
-import matplotlib.pyplot as plt
+
+# Category order of the last axis of membership arrays
+PRICE_CATEGORIES = ('cheap', 'moderate', 'expensive')
+QUALITY_CATEGORIES = ('poor', 'average', 'excellent')
 
 class FuzzyRestaurantSystem:
     def __init__(self):
         # Universe of discourse
         self.price_range = np.arange(0, 101, 1)  # 0-100 dollars
         self.quality_range = np.arange(0, 11, 1)  # 0-10 rating
-        
+
+        # Term memberships over each universe, (categories, universe)
+        self.price_terms = self.price_membership(self.price_range).T
+        self.quality_terms = self.quality_membership(self.quality_range).T
+
+        # Fuzzy relation of every (price, quality) category pair over
+        # price_range x quality_range, (price cat, quality cat, price, quality)
+        self.relation = np.minimum(self.price_terms[:, None, :, None],
+                                   self.quality_terms[None, :, None, :])
+
     def price_membership(self, price):
-        """Calculate membership values for price categories"""
-        cheap = max(0, min((40 - price) / 40, 1))
-        moderate = max(0, min((price - 20) / 30, (80 - price) / 30))
-        expensive = max(0, min((price - 60) / 40, 1))
-        return {'cheap': cheap, 'moderate': moderate, 'expensive': expensive}
-    
+        """Calculate membership values for price categories, (..., 3) in PRICE_CATEGORIES order"""
+        price = np.asarray(price, dtype=float)
+        cheap = np.clip((40 - price) / 40, 0, 1)
+        moderate = np.maximum(0, np.minimum((price - 20) / 30, (80 - price) / 30))
+        expensive = np.clip((price - 60) / 40, 0, 1)
+        return np.stack([cheap, moderate, expensive], axis=-1)
+
     def quality_membership(self, quality):
-        """Calculate membership values for quality categories"""
-        poor = max(0, min((4 - quality) / 4, 1))
-        average = max(0, min((quality - 2) / 3, (8 - quality) / 3))
-        excellent = max(0, min((quality - 6) / 4, 1))
-        return {'poor': poor, 'average': average, 'excellent': excellent}
-    
+        """Calculate membership values for quality categories, (..., 3) in QUALITY_CATEGORIES order"""
+        quality = np.asarray(quality, dtype=float)
+        poor = np.clip((4 - quality) / 4, 0, 1)
+        average = np.maximum(0, np.minimum((quality - 2) / 3, (8 - quality) / 3))
+        excellent = np.clip((quality - 6) / 4, 0, 1)
+        return np.stack([poor, average, excellent], axis=-1)
+
     def cylindrical_extension(self, price_val, quality_val):
-        """Perform cylindrical extension of price and quality memberships"""
+        """
+        Perform cylindrical extension of price and quality memberships
+
+        Takes scalars or arrays of restaurants; returns (..., 3, 3) indexed
+        [price category, quality category], the minimum of both memberships
+        for conjunction.
+        """
         price_memberships = self.price_membership(price_val)
         quality_memberships = self.quality_membership(quality_val)
-        
-        # Create 2D membership matrix
-        extended_memberships = {}
-        for p_cat, p_val in price_memberships.items():
-            for q_cat, q_val in quality_memberships.items():
-                key = (p_cat, q_cat)
-                # Take minimum of memberships for conjunction
-                extended_memberships[key] = min(p_val, q_val)
-        
-        return extended_memberships
-    
+        return np.minimum(price_memberships[..., :, None], quality_memberships[..., None, :])
+
     def projection(self, extended_memberships, project_on='price'):
-        """Project the fuzzy relation onto either price or quality dimension"""
-        projected = {}
-        
+        """Project the fuzzy relation onto either price or quality dimension (max over the other)"""
         if project_on == 'price':
-            categories = ['cheap', 'moderate', 'expensive']
-        else:  # project on quality
-            categories = ['poor', 'average', 'excellent']
-            
-        for category in categories:
-            # Find maximum membership value for each category
-            relevant_pairs = [v for k, v in extended_memberships.items() 
-                            if k[0 if project_on == 'price' else 1] == category]
-            projected[category] = max(relevant_pairs) if relevant_pairs else 0
-            
-        return projected
+            return extended_memberships.max(axis=-1)
+        return extended_memberships.max(axis=-2)
+
+    def project_relation(self, project_on='price'):
+        """
+        Project self.relation back onto price_range or quality_range
+
+        Returns (price cat, quality cat, universe); a pair's projection is
+        the price (or quality) term capped at the other term's height.
+        """
+        if project_on == 'price':
+            return self.relation.max(axis=-1)
+        return self.relation.max(axis=-2)
 
     def recommend(self, price, quality):
-        """Provide restaurant recommendation based on price and quality"""
+        """
+        Provide restaurant recommendation based on price and quality
+
+        price and quality may be arrays of restaurants, scored in one call.
+        """
         # Perform cylindrical extension
         extended = self.cylindrical_extension(price, quality)
-        
+
         # Project onto both dimensions
         price_proj = self.projection(extended, 'price')
         quality_proj = self.projection(extended, 'quality')
-        
+
         return {
             'extended_memberships': extended,
             'price_projection': price_proj,
             'quality_projection': quality_proj
         }
 
-# Example usage
-system = FuzzyRestaurantSystem()
-
-# Let's analyze a restaurant with $45 price and 7.5 quality rating
-price = 45
-quality = 7.5
-
-result = system.recommend(price, quality)
+    def rank(self, prices, qualities, price_category='cheap', quality_category='excellent', top=10):
+        """
+        Indices of the top restaurants by membership in a (price, quality) category pair, best first
+        """
+        extended = self.cylindrical_extension(prices, qualities)
+        scores = extended[..., PRICE_CATEGORIES.index(price_category), QUALITY_CATEGORIES.index(quality_category)]
+        top = min(top, len(scores))
+        best = np.argpartition(-scores, top - 1)[:top]
+        return best[np.argsort(-scores[best], kind='stable')]
+
+def main():
+    # Example usage
+    system = FuzzyRestaurantSystem()
+
+    # Let's analyze a restaurant with $45 price and 7.5 quality rating
+    price = 45
+    quality = 7.5
+
+    result = system.recommend(price, quality)
+
+    # Print results
+    print(f"\nAnalyzing restaurant with price ${price} and quality rating {quality}")
+    print("\nCylindrical Extension Results:")
+    for i, p_cat in enumerate(PRICE_CATEGORIES):
+        for j, q_cat in enumerate(QUALITY_CATEGORIES):
+            membership = result['extended_memberships'][i, j]
+            if membership > 0:
+                print(f"Price: {p_cat}, Quality: {q_cat} -> Membership: {membership:.2f}")
+
+    print("\nPrice Projection Results:")
+    for category, membership in zip(PRICE_CATEGORIES, result['price_projection']):
+        print(f"{category}: {membership:.2f}")
+
+    print("\nQuality Projection Results:")
+    for category, membership in zip(QUALITY_CATEGORIES, result['quality_projection']):
+        print(f"{category}: {membership:.2f}")
+
+    # Rank a catalogue of restaurants in one call
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(0, 100, 100000)
+    qualities = rng.uniform(0, 10, 100000)
+    start = time.perf_counter()
+    best = system.rank(prices, qualities, 'cheap', 'excellent', top=5)
+    elapsed = time.perf_counter() - start
+    print(f"\nTop cheap & excellent of {len(prices)} restaurants ({elapsed * 1000:.1f} ms):")
+    for index in best:
+        print(f"  #{index}: ${prices[index]:.2f}, quality {qualities[index]:.2f}")
+
+if __name__ == "__main__":
+    main()
 
-# Print results
-print(f"\nAnalyzing restaurant with price ${price} and quality rating {quality}")
-print("\nCylindrical Extension Results:")
-for (p_cat, q_cat), membership in result['extended_memberships'].items():
-    if membership > 0:
-        print(f"Price: {p_cat}, Quality: {q_cat} -> Membership: {membership:.2f}")
-
-print("\nPrice Projection Results:")
-for category, membership in result['price_projection'].items():
-    print(f"{category}: {membership:.2f}")
-
-print("\nQuality Projection Results:")
-for category, membership in result['quality_projection'].items():
-    print(f"{category}: {membership:.2f}")
-    
 # import numpy as np
 # import skfuzzy as fuzz
 # import matplotlib.pyplot as plt
@@ -1,18 +1,16 @@
+import argparse
+import os
+import time
+from functools import lru_cache
 import numpy as np
 import skfuzzy as fuzz
 from skfuzzy import control as ctrl
-import matplotlib.pyplot as plt
 
 # 1. Define the inputs (temperature and humidity) and output (fan speed)
 temperature = ctrl.Antecedent(np.arange(0, 41, 1), 'temperature')  # 0°C to 40°C
 humidity = ctrl.Antecedent(np.arange(0, 101, 1), 'humidity')        # 0% to 100%
 fan_speed = ctrl.Consequent(np.arange(0, 101, 1), 'fan_speed')      # 0% to 100%
 
-# Print the universe values of temperature, humidity, and fan_speed
-print("Temperature universe values:", temperature.universe)
-print("Humidity universe values:", humidity.universe)
-print("Fan speed universe values:", fan_speed.universe)
-
 # 2. Define fuzzy sets using membership functions
 # Temperature fuzzy sets
 temperature['cool'] = fuzz.trimf(temperature.universe, [0, 0, 20])
@@ -42,8 +40,6 @@ rule7 = ctrl.Rule(temperature['hot'] & humidity['low'], fan_speed['fast'])
 rule8 = ctrl.Rule(temperature['hot'] & humidity['medium'], fan_speed['fast'])
 rule9 = ctrl.Rule(temperature['hot'] & humidity['high'], fan_speed['fast'])
 
-
-
 # 4. Create control system and simulation
 fan_control = ctrl.ControlSystem([rule1, rule2, rule3, rule4, rule5, rule6, rule7, rule8, rule9])
 fan_simulation = ctrl.ControlSystemSimulation(fan_control)
@@ -65,19 +61,190 @@ input_values = [
     (80, 10),
 ]
 
-# 6. Compute fan speed for each input pair
-print("Temperature and Humidity to Fan Speed Mapping:")
-for temp, hum in input_values:
+# 6. Control surface lookup table
+# The controller has two bounded inputs, so its whole surface can be sampled
+# once onto a grid and read back by bilinear interpolation instead of running
+# a ControlSystemSimulation per pair. Inputs outside the universes are
+# clamped to the nearest edge, (50, 20) reads as (40, 20) and (70, 5) as
+# (40, 5); skfuzzy clips inputs to the universe the same way
+# (clip_to_bounds), so the table and the controller agree there too.
+LUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fan_speed_lut.npz')
+
+# Grids tried in order by choose_grid, (temperature points, humidity points)
+GRID_CANDIDATES = [(11, 26), (21, 51), (41, 101), (81, 201)]
+
+@lru_cache(maxsize=None)
+def compute_fan_speed(temp, hum):
+    """
+    Fan speed from the skfuzzy simulation, cached so grids share their nodes
+    """
     fan_simulation.input['temperature'] = temp
     fan_simulation.input['humidity'] = hum
     fan_simulation.compute()
-    print(f"Temperature: {temp}°C, Humidity: {hum}% -> Fan Speed: {fan_simulation.output['fan_speed']:.2f}%")
+    return float(fan_simulation.output['fan_speed'])
+
+class FanSpeedLUT:
+    """
+    Fan speed surface on a regular (temperature, humidity) grid
+
+    Calls take a single pair in plain Python (about a microsecond);
+    evaluate() takes arrays. Both clamp inputs to the grid, which spans the
+    input universes.
+    """
+
+    def __init__(self, temperatures, humidities, table):
+        self.temperatures = np.asarray(temperatures, dtype=float)
+        self.humidities = np.asarray(humidities, dtype=float)
+        self.table = np.asarray(table, dtype=float)
+        self._t0, self._t1 = float(self.temperatures[0]), float(self.temperatures[-1])
+        self._h0, self._h1 = float(self.humidities[0]), float(self.humidities[-1])
+        self._dt = (self._t1 - self._t0) / (len(self.temperatures) - 1)
+        self._dh = (self._h1 - self._h0) / (len(self.humidities) - 1)
+        self._rows = self.table.tolist()
+
+    @classmethod
+    def compile(cls, temp_points=41, hum_points=101):
+        """
+        Sample the controller at every grid node
+        """
+        temperatures = np.linspace(temperature.universe[0], temperature.universe[-1], temp_points)
+        humidities = np.linspace(humidity.universe[0], humidity.universe[-1], hum_points)
+        table = [[compute_fan_speed(float(t), float(h)) for h in humidities] for t in temperatures]
+        return cls(temperatures, humidities, table)
+
+    def save(self, path=LUT_PATH):
+        np.savez(path, temperatures=self.temperatures, humidities=self.humidities, table=self.table)
+        return path
+
+    @classmethod
+    def load(cls, path=LUT_PATH):
+        with np.load(path) as data:
+            return cls(data['temperatures'], data['humidities'], data['table'])
+
+    def __call__(self, temp, hum):
+        t = (min(max(temp, self._t0), self._t1) - self._t0) / self._dt
+        h = (min(max(hum, self._h0), self._h1) - self._h0) / self._dh
+        i = min(int(t), len(self._rows) - 2)
+        j = min(int(h), len(self._rows[0]) - 2)
+        u, v = t - i, h - j
+        row0, row1 = self._rows[i], self._rows[i + 1]
+        low = row0[j] + (row0[j + 1] - row0[j]) * v
+        high = row1[j] + (row1[j + 1] - row1[j]) * v
+        return low + (high - low) * u
+
+    def evaluate(self, temps, hums):
+        """
+        Fan speed for arrays of temperatures and humidities
+        """
+        t = (np.clip(temps, self._t0, self._t1) - self._t0) / self._dt
+        h = (np.clip(hums, self._h0, self._h1) - self._h0) / self._dh
+        i = np.minimum(t.astype(int), len(self.temperatures) - 2)
+        j = np.minimum(h.astype(int), len(self.humidities) - 2)
+        u, v = t - i, h - j
+        low = self.table[i, j] + (self.table[i, j + 1] - self.table[i, j]) * v
+        high = self.table[i + 1, j] + (self.table[i + 1, j + 1] - self.table[i + 1, j]) * v
+        return low + (high - low) * u
+
+    def max_error(self, samples=1000, seed=0):
+        """
+        Largest difference from the controller over random in-range points
+
+        Returns:
+            tuple: (error, temperature, humidity) of the worst point
+        """
+        rng = np.random.default_rng(seed)
+        temps = rng.uniform(self._t0, self._t1, samples).round(3)
+        hums = rng.uniform(self._h0, self._h1, samples).round(3)
+        exact = np.array([compute_fan_speed(float(t), float(h)) for t, h in zip(temps, hums)])
+        errors = np.abs(self.evaluate(temps, hums) - exact)
+        worst = int(np.argmax(errors))
+        return float(errors[worst]), float(temps[worst]), float(hums[worst])
+
+def choose_grid(tolerance, candidates=GRID_CANDIDATES, samples=1000):
+    """
+    Coarsest candidate grid whose max error is within tolerance (the finest otherwise)
+
+    Prints the error of every grid tried.
+    """
+    for temp_points, hum_points in candidates:
+        lut = FanSpeedLUT.compile(temp_points, hum_points)
+        error, temp, hum = lut.max_error(samples)
+        print(f"Grid {temp_points}x{hum_points}: max error {error:.3f}% at ({temp}, {hum})")
+        if error <= tolerance:
+            break
+    return lut
+
+def benchmark(lut, n=1000, seed=0):
+    """
+    Microseconds per pair for the simulation and the table
+
+    Uses a simulation without skfuzzy's result cache, which would otherwise
+    answer repeated pairs from memory.
+    """
+    rng = np.random.default_rng(seed)
+    pairs = list(zip(rng.uniform(-10, 50, n).tolist(), rng.uniform(-10, 110, n).tolist()))
+    simulation = ctrl.ControlSystemSimulation(fan_control, cache=False)
+
+    start = time.perf_counter()
+    for temp, hum in pairs:
+        simulation.input['temperature'] = temp
+        simulation.input['humidity'] = hum
+        simulation.compute()
+    exact_us = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    for temp, hum in pairs:
+        lut(temp, hum)
+    lut_us = (time.perf_counter() - start) / n * 1e6
+    print(f"compute(): {exact_us:.1f} us per pair, table: {lut_us:.2f} us per pair")
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzy fan speed controller')
+    parser.add_argument('--compile', action='store_true', help='Sample the control surface and save it')
+    parser.add_argument('--grid', type=int, nargs=2, metavar=('TEMP_POINTS', 'HUM_POINTS'),
+                        help='Grid to compile (default: chosen by --tolerance)')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='Max interpolation error in fan speed %% when choosing the grid (default: 1.0)')
+    parser.add_argument('--output', default=LUT_PATH, help='Where to save the table')
+    args = parser.parse_args()
+
+    if args.compile:
+        if args.grid:
+            lut = FanSpeedLUT.compile(*args.grid)
+            error, temp, hum = lut.max_error()
+            print(f"Grid {args.grid[0]}x{args.grid[1]}: max error {error:.3f}% at ({temp}, {hum})")
+        else:
+            lut = choose_grid(args.tolerance)
+        print(f"Saved to {lut.save(args.output)}")
+        benchmark(lut)
+        return
+
+    # Print the universe values of temperature, humidity, and fan_speed
+    print("Temperature universe values:", temperature.universe)
+    print("Humidity universe values:", humidity.universe)
+    print("Fan speed universe values:", fan_speed.universe)
+
+    lut = FanSpeedLUT.load(args.output) if os.path.exists(args.output) else None
+
+    # 7. Compute fan speed for each input pair
+    print("Temperature and Humidity to Fan Speed Mapping:")
+    for temp, hum in input_values:
+        fan_simulation.input['temperature'] = temp
+        fan_simulation.input['humidity'] = hum
+        fan_simulation.compute()
+        print(f"Temperature: {temp}°C, Humidity: {hum}% -> Fan Speed: {fan_simulation.output['fan_speed']:.2f}%")
+        if lut is not None:
+            print(f"    Table: {lut(temp, hum):.2f}%")
+
+    # Optional: Visualize the fuzzy membership functions
+    import matplotlib.pyplot as plt
+    temperature.view()  # Temperature fuzzy sets
+    humidity.view()     # Humidity fuzzy sets
+    fan_speed.view()    # Fan speed fuzzy sets
+    plt.show()
 
-# Optional: Visualize the fuzzy membership functions
-temperature.view()  # Temperature fuzzy sets
-humidity.view()     # Humidity fuzzy sets
-fan_speed.view()    # Fan speed fuzzy sets
-plt.show()
+if __name__ == "__main__":
+    main()
 
 
 # import numpy as np
@@ -1,7 +1,9 @@
+import argparse
+import time
 import numpy as np
 import skfuzzy as fuzz
 import skfuzzy.control as ctrl
-import matplotlib.pyplot as plt
+from mamdani import CompiledControlSystem
 
 class FuzzyTemperatureController:
     def __init__(self):
@@ -31,6 +33,7 @@ class FuzzyTemperatureController:
         # Create control system
         self.heating_ctrl = ctrl.ControlSystem([rule1, rule2, rule3, rule4, rule5])
         self.heating = ctrl.ControlSystemSimulation(self.heating_ctrl)
+        self.compiled = CompiledControlSystem(self.heating_ctrl)
 
     def control_heating(self, temperature):
         """
@@ -44,10 +47,22 @@ class FuzzyTemperatureController:
         
         return self.heating.output['heating_power']
 
+    def control_heating_batch(self, temperatures):
+        """
+        Compute heating power for an array of temperatures
+
+        Matches control_heating element by element, evaluated in a few array
+        passes by the compiled rule base (mamdani.CompiledControlSystem).
+        NaN where no rule fires.
+        """
+        return self.compiled.compute_batch(temperature=temperatures)['heating_power']
+
     def visualize_membership_functions(self):
         """
         Visualize temperature and heating power membership functions
         """
+        import matplotlib.pyplot as plt
+
         # Visualize temperature membership functions
         plt.figure(figsize=(12, 5))
         plt.subplot(1, 2, 1)
@@ -116,5 +131,37 @@ def main():
         
         print(f"Recommended Heating Power: {analysis['heating_power']:.2f}")
 
+def benchmark(n=100000, scalar_n=2000, seed=0):
+    """
+    Readings per second of control_heating_batch against the control_heating loop
+
+    The scalar loop runs on the first scalar_n readings only; both paths are
+    compared on those.
+    """
+    controller = FuzzyTemperatureController()
+    temperatures = np.random.default_rng(seed).uniform(-5, 55, n)
+
+    start = time.perf_counter()
+    scalar = np.array([controller.control_heating(t) for t in temperatures[:scalar_n]])
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = controller.control_heating_batch(temperatures)
+    batch_seconds = time.perf_counter() - start
+
+    scalar_rate = scalar_n / scalar_seconds
+    batch_rate = n / batch_seconds
+    print(f"Scalar loop: {scalar_rate:,.0f} readings/s ({scalar_n} readings)")
+    print(f"Batch:       {batch_rate:,.0f} readings/s ({n} readings)")
+    print(f"Speedup:     {batch_rate / scalar_rate:,.0f}x")
+    print(f"Max abs difference: {np.max(np.abs(batch[:scalar_n] - scalar)):.2e}")
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Fuzzy temperature controller demo')
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help='Time batch inference on N readings against the scalar loop')
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        main()
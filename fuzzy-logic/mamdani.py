@@ -0,0 +1,310 @@
+"""
+Compiled Mamdani inference for skfuzzy control systems
+
+CompiledControlSystem takes a ctrl.ControlSystem built from the usual
+Antecedent, Consequent and Rule definitions and turns it once into dense
+arrays:
+
+- a term membership matrix per antecedent, (terms, universe), so
+  fuzzifying an input is one gather and one interpolation for all terms
+- a rule-antecedent index table, (rules, terms per rule), into the stacked
+  term memberships, reduced with min for AND rules and max for OR rules
+- consequent clip indices, one (rule, output term, weight) triple per
+  consequent, accumulated into the output term cuts with max
+
+Evaluation then runs a fixed sequence of array operations with no walk over
+skfuzzy's rule graph, no per-call state objects and no input validation
+beyond clipping, for a single input or a whole array of inputs. It follows
+ControlSystemSimulation step by step (inputs clipped to the universe, the
+output universe upsampled where each term meets its cut, centroid of the
+piecewise-linear result), so outputs match skfuzzy to rounding.
+
+Supported: centroid defuzzification, the default min/max AND/OR and max
+accumulation, antecedents that are one term, NOT term, or a pure AND or pure
+OR of (possibly negated) terms. Anything else raises ValueError at compile
+time; use ControlSystemSimulation for those systems.
+"""
+import time
+
+import numpy as np
+from skfuzzy.control.antecedent_consequent import accumulation_max
+from skfuzzy.control.term import Term, TermAggregate
+
+# Rows of a batch evaluated together, so the per-row work arrays
+# (output universe x batch) stay a few MB
+BATCH_BLOCK = 16384
+
+EPS = np.finfo(float).eps
+
+def _monotone_runs(mf):
+    """
+    (start, values, rising) of each stretch over which a sampled mf strictly rises or falls
+
+    values are the mf samples of the stretch, negated when falling so they
+    always ascend for searchsorted.
+    """
+    signs = np.sign(np.diff(mf))
+    runs = []
+    start = 0
+    for i in range(1, len(signs) + 1):
+        if i == len(signs) or signs[i] != signs[start]:
+            if signs[start] != 0:
+                rising = bool(signs[start] > 0)
+                values = mf[start:i + 1] if rising else -mf[start:i + 1]
+                runs.append((start, values, rising))
+            start = i
+    return runs
+
+def _cut_points(universe, mf, runs, cuts):
+    """
+    Where mf crosses each cut level, one column per monotone run
+
+    The same points skfuzzy adds to the output universe before clipping a
+    term, so clipped sets keep their corners. Runs without a crossing repeat
+    their first universe point, which adds a zero-width segment only.
+    """
+    columns = []
+    for start, values, rising in runs:
+        if rising:
+            j = values.searchsorted(cuts, side='left')
+        else:
+            j = values.searchsorted(-cuts, side='right')
+        crosses = (cuts > 0) & (j > 0) & (j < len(values))
+        i = start + np.minimum(np.maximum(j - 1, 0), len(values) - 2)
+        point = universe[i] + (cuts - mf[i]) * (universe[i + 1] - universe[i]) / (mf[i + 1] - mf[i])
+        columns.append(np.where(crosses, point, universe[start]))
+    return columns
+
+def _centroids(x, mfx):
+    """
+    Centroid of each row's piecewise-linear set, as skfuzzy's centroid()
+
+    NaN for rows with no area (no rule fired).
+    """
+    x1, dx = x[:, :-1], np.diff(x, axis=1)
+    y1, y2 = mfx[:, :-1], mfx[:, 1:]
+    area = 0.5 * dx * (y1 + y2)
+    # Per segment moment * area of the rectangle/triangle/trapezoid, expanded
+    # so it needs no division
+    moment_area = area * x1 + dx * dx * (2 * y2 + y1) / 6
+    sum_area = area.sum(axis=1)
+    return np.where(sum_area > 0, moment_area.sum(axis=1) / np.fmax(sum_area, EPS), np.nan)
+
+def _leaves(antecedent, kind):
+    """
+    (term, negated) leaves of an antecedent joined only by kind ('and' or 'or')
+    """
+    if isinstance(antecedent, Term):
+        return [(antecedent, False)]
+    if isinstance(antecedent, TermAggregate):
+        if antecedent.kind == 'not' and isinstance(antecedent.term1, Term):
+            return [(antecedent.term1, True)]
+        if antecedent.kind == kind:
+            return _leaves(antecedent.term1, kind) + _leaves(antecedent.term2, kind)
+    raise ValueError(f"Unsupported rule antecedent: {antecedent}")
+
+class CompiledControlSystem:
+    """
+    A ctrl.ControlSystem compiled to dense arrays for repeated evaluation
+    """
+
+    def __init__(self, control_system):
+        self.antecedents = []
+        rows = {}
+        for antecedent in control_system.antecedents:
+            universe = np.asarray(antecedent.universe, dtype=float)
+            terms = list(antecedent.terms.values())
+            for term in terms:
+                rows[id(term)] = len(rows)
+            membership = np.array([term.mf for term in terms], dtype=float)
+            slopes = np.diff(membership, axis=1) / np.diff(universe)
+            self.antecedents.append((antecedent.label, universe, membership, slopes))
+        n_terms = len(rows)
+
+        # Stacked memberships are [terms, 1 - terms, 1, 0]; AND rules pad
+        # with the row of ones, OR rules with the row of zeros
+        self.one_row, self.zero_row = 2 * n_terms, 2 * n_terms + 1
+        rule_rows, is_or = [], []
+        # Consequent labels each rule reaches
+        self.rule_outputs = []
+        consequent_terms = {}
+        clips = []
+        for r, rule in enumerate(control_system.rules):
+            methods = rule._aggregation_methods
+            if methods.and_func is not np.fmin or methods.or_func is not np.fmax:
+                raise ValueError(f"Rule {rule.label}: only the default fmin/fmax AND/OR are supported")
+            antecedent = rule.antecedent
+            kind = antecedent.kind if isinstance(antecedent, TermAggregate) and antecedent.kind != 'not' else 'and'
+            leaves = _leaves(antecedent, kind)
+            rule_rows.append([rows[id(term)] + (n_terms if negated else 0) for term, negated in leaves])
+            is_or.append(kind == 'or')
+            self.rule_outputs.append({weighted.term.parent.label for weighted in rule.consequent})
+            for weighted in rule.consequent:
+                term = weighted.term
+                if id(term) not in consequent_terms:
+                    consequent_terms[id(term)] = (len(consequent_terms), term)
+                clips.append((r, consequent_terms[id(term)][0], weighted.weight))
+
+        width = max(len(r) for r in rule_rows)
+        self.rule_table = np.array([
+            r + [self.zero_row if or_rule else self.one_row] * (width - len(r))
+            for r, or_rule in zip(rule_rows, is_or)
+        ], dtype=np.intp)
+        self.or_rules = np.array(is_or)
+        self.clip_rules = np.array([rule for rule, _, _ in clips], dtype=np.intp)
+        self.clip_terms = np.array([term for _, term, _ in clips], dtype=np.intp)
+        self.clip_weights = np.array([weight for _, _, weight in clips], dtype=float)[:, None]
+        self.n_cuts = len(consequent_terms)
+
+        # Per consequent: universe, and (cut index, mf, monotone runs) of
+        # every term some rule clips; terms no rule reaches are left out,
+        # as skfuzzy does
+        by_term = {term_id: index for term_id, (index, _) in consequent_terms.items()}
+        self.consequents = []
+        for consequent in control_system.consequents:
+            if consequent.defuzzify_method != 'centroid':
+                raise ValueError(f"{consequent.label}: only centroid defuzzification is supported")
+            if consequent.accumulation_method not in (accumulation_max, np.fmax):
+                raise ValueError(f"{consequent.label}: only fmax accumulation is supported")
+            universe = np.asarray(consequent.universe, dtype=float)
+            terms = [
+                (by_term[id(term)], np.asarray(term.mf, dtype=float), _monotone_runs(term.mf))
+                for term in consequent.terms.values() if id(term) in by_term
+            ]
+            self.consequents.append((consequent.label, universe, terms))
+
+    def _memberships(self, inputs, n):
+        """
+        Stacked term memberships for n input rows, (rows of the table, n)
+        """
+        parts = []
+        for label, universe, membership, slopes in self.antecedents:
+            x = np.minimum(np.maximum(inputs[label], universe[0]), universe[-1]) + np.zeros(n)
+            i = np.minimum(universe.searchsorted(x, side='right') - 1, len(universe) - 2)
+            # np.interp's formula, with the right edge taken exactly
+            values = slopes[:, i] * (x - universe[i]) + membership[:, i]
+            parts.append(np.where(x == universe[-1], membership[:, -1:], values))
+        terms = np.concatenate(parts)
+        return np.concatenate([terms, 1.0 - terms, np.ones((1, n)), np.zeros((1, n))])
+
+    def _evaluate(self, inputs, n):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._infer(inputs, n)
+
+    def fire(self, inputs, n):
+        """
+        Firing strength of every rule for n rows of inputs, (rules, n)
+
+        inputs maps antecedent labels to scalars or length-n arrays.
+        """
+        memberships = self._memberships(inputs, n)
+
+        # Min over AND rules' terms, max over OR rules'
+        gathered = memberships[self.rule_table]
+        return np.where(self.or_rules[:, None], gathered.max(axis=1), gathered.min(axis=1))
+
+    def _infer(self, inputs, n):
+        firing = self.fire(inputs, n)
+
+        # Clip levels of the consequent terms, accumulated with max
+        cuts = np.zeros((self.n_cuts, n))
+        np.fmax.at(cuts, self.clip_terms, firing[self.clip_rules] * self.clip_weights)
+
+        outputs = {}
+        for label, universe, terms in self.consequents:
+            points = [np.broadcast_to(universe, (n, len(universe)))]
+            for index, mf, runs in terms:
+                points.extend(column[:, None] for column in _cut_points(universe, mf, runs, cuts[index]))
+            x = np.sort(np.concatenate(points, axis=1), axis=1)
+
+            aggregated = np.zeros_like(x)
+            for index, mf, runs in terms:
+                np.maximum(aggregated, np.minimum(cuts[index][:, None], np.interp(x, universe, mf)), out=aggregated)
+            outputs[label] = _centroids(x, aggregated)
+        return outputs
+
+    def compute(self, inputs=None, **kwargs):
+        """
+        Crisp outputs for one set of inputs, by antecedent label
+
+        Like ControlSystemSimulation in its default lenient mode, an output
+        none of whose terms is activated is left out of the result.
+        """
+        inputs = dict(inputs or {}, **kwargs)
+        outputs = self._evaluate(inputs, 1)
+        return {label: float(value[0]) for label, value in outputs.items() if not np.isnan(value[0])}
+
+    def compute_batch(self, inputs=None, **kwargs):
+        """
+        Crisp outputs for arrays of inputs (broadcast together), NaN where no term is activated
+        """
+        inputs = {label: np.asarray(value, dtype=float) for label, value in dict(inputs or {}, **kwargs).items()}
+        shape = np.broadcast_shapes(*(value.shape for value in inputs.values()))
+        flat = {label: np.broadcast_to(value, shape).ravel() for label, value in inputs.items()}
+        n = int(np.prod(shape))
+
+        outputs = {label: np.empty(n) for label, _, _ in self.consequents}
+        for start in range(0, n, BATCH_BLOCK):
+            block = {label: value[start:start + BATCH_BLOCK] for label, value in flat.items()}
+            for label, value in self._evaluate(block, len(next(iter(block.values())))).items():
+                outputs[label][start:start + BATCH_BLOCK] = value
+        return {label: value.reshape(shape) for label, value in outputs.items()}
+
+def compare(control_system, input_ranges, n=500, seed=0):
+    """
+    Per-call latency of ControlSystemSimulation against CompiledControlSystem
+
+    Args:
+        control_system (ctrl.ControlSystem): System to compare on
+        input_ranges (dict): Antecedent label -> (low, high) to draw inputs
+            from, wider than the universe to exercise clipping
+
+    Returns:
+        dict: 'skfuzzy_us' and 'compiled_us' per call, 'speedup' and
+            'max_abs_diff' between the two over the n inputs
+    """
+    from skfuzzy import control as ctrl
+
+    rng = np.random.default_rng(seed)
+    samples = {label: rng.uniform(low, high, n).tolist() for label, (low, high) in input_ranges.items()}
+    simulation = ctrl.ControlSystemSimulation(control_system, cache=False)
+    compiled = CompiledControlSystem(control_system)
+
+    expected = []
+    start = time.perf_counter()
+    for k in range(n):
+        for label, values in samples.items():
+            simulation.input[label] = values[k]
+        simulation.compute()
+        expected.append(dict(simulation.output))
+    skfuzzy_seconds = time.perf_counter() - start
+
+    actual = []
+    start = time.perf_counter()
+    for k in range(n):
+        actual.append(compiled.compute({label: values[k] for label, values in samples.items()}))
+    compiled_seconds = time.perf_counter() - start
+
+    diff = max(abs(a[label] - e[label]) for a, e in zip(actual, expected) for label in e)
+    return {
+        'skfuzzy_us': skfuzzy_seconds / n * 1e6,
+        'compiled_us': compiled_seconds / n * 1e6,
+        'speedup': skfuzzy_seconds / compiled_seconds,
+        'max_abs_diff': diff
+    }
+
+def main():
+    import fuzz
+    from fz import FuzzyTemperatureController
+
+    systems = [
+        ('fz.py heating', FuzzyTemperatureController().heating_ctrl, {'temperature': (-5, 55)}),
+        ('fuzz.py fan', fuzz.fan_control, {'temperature': (-10, 50), 'humidity': (-10, 110)})
+    ]
+    for name, control_system, input_ranges in systems:
+        result = compare(control_system, input_ranges)
+        print(f"{name}: skfuzzy {result['skfuzzy_us']:.0f} us, compiled {result['compiled_us']:.0f} us "
+              f"per call ({result['speedup']:.0f}x), max abs diff {result['max_abs_diff']:.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Exact centroid defuzzification on breakpoint lists
+
+A membership function made of straight pieces (trimf, trapmf, the
+piecewise-constant sets of q3.py) is fully described by its breakpoints, so
+there is no need to sample it on a dense universe. PiecewiseSet keeps the
+pieces as segments (x0, x1, y0, y1); clipping at a rule strength, the max
+envelope of several clipped sets and the centroid of the result are all
+computed on the segments:
+
+- clip adds at most one breakpoint per segment, where it meets the level
+- envelope merges the breakpoints of all sets and, between two consecutive
+  ones, adds the points where two sets cross (the envelope of straight
+  lines only bends there)
+- centroid sums the exact area and moment of every trapezoid
+
+Cost is O(breakpoints) (times the number of sets squared for the crossings,
+which is small) and the result is exact, unlike skfuzzy's centroid over a
+sampled universe, which misses envelope corners between samples and costs
+O(universe size) per evaluation.
+
+Outside its segments a set is 0. Piecewise-constant sets are step
+segments; a jump between two steps is just two adjacent segments.
+"""
+import time
+from bisect import bisect_right
+
+class PiecewiseSet:
+    """
+    Fuzzy set of non-overlapping linear segments (x0, x1, y0, y1), zero elsewhere
+    """
+
+    def __init__(self, segments):
+        self.segments = sorted(
+            (float(x0), float(x1), float(y0), float(y1)) for x0, x1, y0, y1 in segments if x1 > x0
+        )
+        self._starts = [segment[0] for segment in self.segments]
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Set through breakpoints (x, y) in x order; a repeated x is a jump
+        """
+        return cls((x0, x1, y0, y1) for (x0, y0), (x1, y1) in zip(points, points[1:]))
+
+    @classmethod
+    def trimf(cls, a, b, c):
+        """
+        Triangle with feet a, c and peak b, as skfuzzy.trimf
+        """
+        return cls.from_points([(a, 0.0), (b, 1.0), (c, 0.0)])
+
+    @classmethod
+    def trapmf(cls, a, b, c, d):
+        """
+        Trapezoid with feet a, d and shoulders b, c, as skfuzzy.trapmf
+        """
+        return cls.from_points([(a, 0.0), (b, 1.0), (c, 1.0), (d, 0.0)])
+
+    @classmethod
+    def steps(cls, intervals):
+        """
+        Piecewise-constant set from (start, end, height) intervals
+        """
+        return cls((start, end, height, height) for start, end, height in intervals)
+
+    def breakpoints(self):
+        """
+        (x, y) at both ends of every segment, in x order
+        """
+        points = []
+        for x0, x1, y0, y1 in self.segments:
+            points.extend([(x0, y0), (x1, y1)])
+        return points
+
+    def __call__(self, x):
+        i = bisect_right(self._starts, x) - 1
+        if i < 0:
+            return 0.0
+        x0, x1, y0, y1 = self.segments[i]
+        if x > x1:
+            return 0.0
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    def clip(self, level):
+        """
+        min(self, level), the set activated by a rule firing at level
+        """
+        clipped = []
+        for x0, x1, y0, y1 in self.segments:
+            if y0 <= level and y1 <= level:
+                clipped.append((x0, x1, y0, y1))
+            elif y0 >= level and y1 >= level:
+                clipped.append((x0, x1, level, level))
+            else:
+                crossing = x0 + (level - y0) * (x1 - x0) / (y1 - y0)
+                if y0 < level:
+                    clipped.extend([(x0, crossing, y0, level), (crossing, x1, level, level)])
+                else:
+                    clipped.extend([(x0, crossing, level, level), (crossing, x1, level, y1)])
+        return PiecewiseSet(clipped)
+
+    def area(self):
+        return sum(0.5 * (x1 - x0) * (y0 + y1) for x0, x1, y0, y1 in self.segments)
+
+    def centroid(self):
+        """
+        Exact centroid; ValueError for a set with no area
+        """
+        area = moment = 0.0
+        for x0, x1, y0, y1 in self.segments:
+            dx = x1 - x0
+            piece = 0.5 * dx * (y0 + y1)
+            area += piece
+            moment += piece * x0 + dx * dx * (2 * y1 + y0) / 6
+        if area <= 0:
+            raise ValueError("Centroid of a set with no area")
+        return moment / area
+
+def envelope(sets):
+    """
+    Pointwise max of several sets
+    """
+    edges = sorted({x for s in sets for x0, x1, _, _ in s.segments for x in (x0, x1)})
+    cursors = [0] * len(sets)
+    segments = []
+    for u, v in zip(edges, edges[1:]):
+        # Each set is one straight line on [u, v]: its values at both ends
+        lines = []
+        for k, s in enumerate(sets):
+            while cursors[k] < len(s.segments) and s.segments[cursors[k]][1] <= u:
+                cursors[k] += 1
+            if cursors[k] < len(s.segments) and s.segments[cursors[k]][0] <= u:
+                x0, x1, y0, y1 = s.segments[cursors[k]]
+                slope = (y1 - y0) / (x1 - x0)
+                lines.append((y0 + slope * (u - x0), y0 + slope * (v - x0)))
+        if not lines:
+            continue
+
+        # The max of straight lines bends only where two of them cross
+        cuts = [0.0, 1.0]
+        for i in range(len(lines)):
+            for j in range(i + 1, len(lines)):
+                du = lines[i][0] - lines[j][0]
+                dv = lines[i][1] - lines[j][1]
+                if du * dv < 0:
+                    cuts.append(du / (du - dv))
+        cuts.sort()
+        heights = [max(a + (b - a) * t for a, b in lines) for t in cuts]
+        for t0, t1, h0, h1 in zip(cuts, cuts[1:], heights, heights[1:]):
+            if t1 > t0:
+                segments.append((u + (v - u) * t0, u + (v - u) * t1, h0, h1))
+    return PiecewiseSet(segments)
+
+def defuzzify(sets, levels):
+    """
+    Centroid of the max of sets clipped at their rule strengths (Mamdani)
+
+    Sets with a level of 0 or less are left out.
+    """
+    return envelope([s.clip(level) for s, level in zip(sets, levels) if level > 0]).centroid()
+
+def main():
+    import numpy as np
+    import skfuzzy as fuzz
+
+    # fz.py heating power sets, clipped at a few rule strengths
+    universe = np.arange(0, 101, 1)
+    sets = [PiecewiseSet.trimf(0, 0, 50), PiecewiseSet.trimf(0, 50, 100), PiecewiseSet.trimf(50, 100, 100)]
+    mfs = [fuzz.trimf(universe, [0, 0, 50]), fuzz.trimf(universe, [0, 50, 100]), fuzz.trimf(universe, [50, 100, 100])]
+
+    def sampled(x, levels):
+        aggregated = np.max([np.minimum(level, np.interp(x, universe, mf)) for mf, level in zip(mfs, levels)], axis=0)
+        return fuzz.defuzz(x, aggregated, 'centroid')
+
+    fine = np.linspace(0, 100, 100001)
+    print(f"{'levels':>18} {'exact':>10} {'arange(0,101)':>14} {'100001 samples':>15}")
+    for levels in [(0.3, 0.6, 0.2), (0.7, 0.45, 0.0), (0.13, 0.77, 0.41), (0.0, 0.0, 0.9)]:
+        exact = defuzzify(sets, levels)
+        print(f"{str(levels):>18} {exact:10.5f} {sampled(universe, levels):14.5f} {sampled(fine, levels):15.5f}")
+
+    levels, n = (0.13, 0.77, 0.41), 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        defuzzify(sets, levels)
+    exact_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        sampled(universe, levels)
+    sampled_us = (time.perf_counter() - start) / n * 1e6
+    print(f"\nBreakpoints: {exact_us:.1f} us, sampled on arange(0, 101): {sampled_us:.1f} us per defuzzification")
+
+if __name__ == "__main__":
+    main()
@@ -259,3 +259,18 @@ print(f" Rectangle 3: area={area3:.2f}, centroid={centroid3:.2f}, moment={moment
 print(f"\n Total Area = {A_total:.2f}")
 print(f" Total Moment = {M_total:.2f}")
 print(f" Defuzzified Fan Speed = {rpm_crisp:.2f} rpm")
+
+# --------------------------------------------------
+# 8. Same result from the general defuzzifier (piecewise.py): the output
+#    sets as (start, end, height) steps, clipped at the rule strengths,
+#    max envelope and exact centroid, with no sampled universe.
+# --------------------------------------------------
+
+from piecewise import PiecewiseSet, defuzzify
+
+out_low = PiecewiseSet.steps([(0, 500, 1.0), (501, 1000, 0.4)])
+out_medium = PiecewiseSet.steps([(0, 500, 0.0), (501, 1000, 0.3), (1001, 1500, 0.8), (1501, 2000, 0.5)])
+out_high = PiecewiseSet.steps([(0, 500, 0.0), (501, 1000, 0.2), (1001, 1500, 0.6), (1501, 2000, 1.0)])
+
+rpm_general = defuzzify([out_low, out_medium, out_high], [L_strength, M_strength, H_strength])
+print(f" General defuzzifier = {rpm_general:.2f} rpm")
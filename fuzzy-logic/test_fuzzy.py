@@ -0,0 +1,217 @@
+import unittest
+
+import numpy as np
+import skfuzzy as fuzzy
+from skfuzzy import control as ctrl
+
+import fuzz
+from cylindaric import FuzzyRestaurantSystem
+from mamdani import CompiledControlSystem
+from piecewise import PiecewiseSet, defuzzify, envelope
+from tsk import TSKControlSystem, fit_tsk
+from fz import FuzzyTemperatureController
+
+class TestControlHeatingBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.controller = FuzzyTemperatureController()
+
+    def test_matches_scalar_path(self):
+        # Includes out-of-range readings and the universe/term breakpoints
+        temperatures = np.concatenate([np.linspace(-5, 55, 241), [0, 10, 15, 20, 25, 30, 35, 40, 50]])
+        expected = [self.controller.control_heating(t) for t in temperatures]
+        np.testing.assert_allclose(self.controller.control_heating_batch(temperatures), expected,
+                                   rtol=0, atol=1e-9)
+
+    def test_keeps_shape(self):
+        temperatures = np.array([[5.0, 17.0], [23.0, 42.0]])
+        self.assertEqual(self.controller.control_heating_batch(temperatures).shape, (2, 2))
+
+class TestFanSpeedLUT(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.lut = fuzz.FanSpeedLUT.compile(5, 11)
+
+    def test_exact_at_grid_nodes(self):
+        for temp, hum in [(0, 0), (10, 30), (20, 80), (30, 60), (40, 100)]:
+            self.assertAlmostEqual(self.lut(temp, hum), fuzz.compute_fan_speed(float(temp), float(hum)))
+
+    def test_clamps_out_of_range_inputs(self):
+        for temp, hum in [(50, 20), (60, 50), (70, 5), (80, 10), (-5, 120)]:
+            clamped = (min(max(temp, 0), 40), min(max(hum, 0), 100))
+            self.assertAlmostEqual(self.lut(temp, hum), self.lut(*clamped))
+
+    def test_clamping_matches_controller(self):
+        # Clamped onto grid nodes, where the table is exact
+        for temp, hum in [(50, 20), (60, 50), (80, 10), (-5, 120)]:
+            self.assertAlmostEqual(self.lut(temp, hum), fuzz.compute_fan_speed(float(temp), float(hum)))
+
+    def test_array_evaluation_matches_scalar(self):
+        rng = np.random.default_rng(1)
+        temps, hums = rng.uniform(-10, 50, 50), rng.uniform(-10, 110, 50)
+        expected = [self.lut(t, h) for t, h in zip(temps, hums)]
+        np.testing.assert_allclose(self.lut.evaluate(temps, hums), expected)
+
+class TestFuzzyRestaurantSystem(unittest.TestCase):
+    def setUp(self):
+        self.system = FuzzyRestaurantSystem()
+
+    def test_recommend_point(self):
+        result = self.system.recommend(45, 7.5)
+        np.testing.assert_allclose(result['price_projection'], [0, 0.375, 0])
+        np.testing.assert_allclose(result['quality_projection'], [0, 1 / 6, 0.375])
+        self.assertAlmostEqual(result['extended_memberships'][1, 2], 0.375)
+
+    def test_recommend_arrays_match_points(self):
+        rng = np.random.default_rng(2)
+        prices, qualities = rng.uniform(-10, 110, 200), rng.uniform(-1, 11, 200)
+        batch = self.system.recommend(prices, qualities)
+        for k in (0, 57, 199):
+            single = self.system.recommend(prices[k], qualities[k])
+            for key in single:
+                np.testing.assert_allclose(batch[key][k], single[key])
+
+    def test_relation_projects_back_to_terms(self):
+        # Every quality term reaches 1, so projecting onto price recovers the price term
+        projected = self.system.project_relation('price')
+        for j in range(3):
+            np.testing.assert_allclose(projected[:, j], self.system.price_terms)
+
+    def test_rank(self):
+        prices = np.array([38, 10, 30, 5])
+        qualities = np.array([10, 9, 10, 3])
+        self.assertEqual(list(self.system.rank(prices, qualities, 'cheap', 'excellent', top=3)), [1, 2, 0])
+
+def skfuzzy_outputs(control_system, samples):
+    simulation = ctrl.ControlSystemSimulation(control_system)
+    outputs = []
+    for inputs in samples:
+        for label, value in inputs.items():
+            simulation.input[label] = value
+        simulation.compute()
+        outputs.append(dict(simulation.output))
+    return outputs
+
+class TestCompiledControlSystem(unittest.TestCase):
+    def assert_matches_skfuzzy(self, control_system, samples):
+        compiled = CompiledControlSystem(control_system)
+        for inputs, expected in zip(samples, skfuzzy_outputs(control_system, samples)):
+            actual = compiled.compute(inputs)
+            self.assertEqual(actual.keys(), expected.keys())
+            for label in expected:
+                self.assertAlmostEqual(actual[label], expected[label], places=9)
+
+    def test_fan_controller(self):
+        rng = np.random.default_rng(3)
+        samples = [{'temperature': t, 'humidity': h} for t, h in fuzz.input_values]
+        samples += [{'temperature': t, 'humidity': h}
+                    for t, h in zip(rng.uniform(-10, 50, 40), rng.uniform(-10, 110, 40))]
+        self.assert_matches_skfuzzy(fuzz.fan_control, samples)
+
+    def test_or_not_and_weights(self):
+        x = ctrl.Antecedent(np.arange(0, 11, 1), 'x')
+        y = ctrl.Antecedent(np.linspace(0, 1, 21), 'y')
+        out = ctrl.Consequent(np.arange(0, 51, 1), 'out')
+        x.automf(3)
+        y.automf(3)
+        out['low'] = fuzzy.trimf(out.universe, [0, 0, 25])
+        out['high'] = fuzzy.trapmf(out.universe, [20, 30, 40, 50])
+        out['unused'] = fuzzy.trimf(out.universe, [0, 25, 50])
+        rules = [
+            ctrl.Rule(x['poor'] | y['good'] | x['good'], out['low']),
+            ctrl.Rule(~x['average'] & y['average'], out['high'] % 0.5),
+            ctrl.Rule(~y['poor'], [out['low'] % 0.3, out['high']])
+        ]
+        samples = [{'x': a, 'y': b} for a in np.linspace(-1, 11, 13) for b in (0.0, 0.33, 0.5, 0.9, 1.2)]
+        self.assert_matches_skfuzzy(ctrl.ControlSystem(rules), samples)
+
+    def test_batch_matches_single(self):
+        compiled = CompiledControlSystem(fuzz.fan_control)
+        temps, hums = np.linspace(-5, 45, 30), np.linspace(-5, 105, 30)
+        batch = compiled.compute_batch(temperature=temps, humidity=hums)['fan_speed']
+        single = [compiled.compute(temperature=t, humidity=h)['fan_speed'] for t, h in zip(temps, hums)]
+        np.testing.assert_allclose(batch, single, rtol=0, atol=1e-12)
+
+    def test_rejects_mixed_and_or(self):
+        x = ctrl.Antecedent(np.arange(0, 11, 1), 'x')
+        out = ctrl.Consequent(np.arange(0, 11, 1), 'out')
+        x.automf(3)
+        out.automf(3)
+        rule = ctrl.Rule((x['poor'] & x['good']) | x['average'], out['good'])
+        with self.assertRaises(ValueError):
+            CompiledControlSystem(ctrl.ControlSystem([rule]))
+
+class TestTSK(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.controller = FuzzyTemperatureController()
+
+    def test_weighted_average_of_constants(self):
+        # Rules: very_cold -> 90, cold -> 50, mild/warm/hot -> 10
+        system = TSKControlSystem(self.controller.heating_ctrl, {'heating_power': [[90], [50], [10], [10], [10]]})
+        # At 12: very_cold 0.2, cold 0.2
+        self.assertAlmostEqual(system.compute(temperature=12)['heating_power'], (0.2 * 90 + 0.2 * 50) / 0.4)
+        # Clipped to the universe like the Mamdani path
+        self.assertEqual(system.compute(temperature=80), system.compute(temperature=50))
+
+    def test_linear_consequents(self):
+        coefficients = np.zeros((5, 2))
+        coefficients[:, 1] = 2.0
+        system = TSKControlSystem(self.controller.heating_ctrl, {'heating_power': coefficients})
+        np.testing.assert_allclose(system.compute_batch(temperature=[3.0, 27.5, 60.0])['heating_power'],
+                                   [6.0, 55.0, 100.0])
+
+    def test_fit_tracks_mamdani(self):
+        temperatures = np.linspace(0, 50, 501)
+        exact = self.controller.control_heating_batch(temperatures)
+        rms = {}
+        for order in (0, 1):
+            system = fit_tsk(self.controller.heating_ctrl, order)
+            approx = system.compute_batch(temperature=temperatures)['heating_power']
+            self.assertAlmostEqual(system.compute(temperature=21.3)['heating_power'],
+                                   system.compute_batch(temperature=21.3)['heating_power'])
+            rms[order] = np.sqrt(np.mean((approx - exact) ** 2))
+        self.assertLess(rms[1], rms[0])
+        self.assertLess(rms[1], 2.0)
+
+    def test_rejects_bad_coefficients(self):
+        with self.assertRaises(ValueError):
+            TSKControlSystem(self.controller.heating_ctrl, {'heating_power': np.zeros((5, 3))})
+
+class TestPiecewise(unittest.TestCase):
+    def test_triangle_centroid(self):
+        self.assertAlmostEqual(PiecewiseSet.trimf(0, 30, 60).centroid(), 30.0)
+        self.assertAlmostEqual(PiecewiseSet.trimf(0, 0, 50).centroid(), 50 / 3)
+
+    def test_q3_rectangles(self):
+        medium = PiecewiseSet.steps([(0, 500, 0.0), (501, 1000, 0.3), (1001, 1500, 0.8), (1501, 2000, 0.5)])
+        high = PiecewiseSet.steps([(0, 500, 0.0), (501, 1000, 0.2), (1001, 1500, 0.6), (1501, 2000, 1.0)])
+        rectangles = [(501, 1000, 0.3), (1001, 1500, 0.8), (1501, 2000, 0.7)]
+        area = sum((end - start) * height for start, end, height in rectangles)
+        moment = sum((end - start) * height * (start + end) / 2 for start, end, height in rectangles)
+        self.assertAlmostEqual(defuzzify([medium, high], [0.8, 0.7]), moment / area)
+
+    def test_envelope_matches_pointwise_max(self):
+        sets = [PiecewiseSet.trimf(0, 0, 50), PiecewiseSet.trapmf(10, 30, 60, 90).clip(0.55),
+                PiecewiseSet.steps([(40, 70, 0.3), (70, 100, 0.9)])]
+        top = envelope(sets)
+        for x in np.linspace(-5, 105, 331):
+            self.assertAlmostEqual(top(x), max(s(x) for s in sets))
+
+    def test_centroid_matches_fine_sampling(self):
+        universe = np.arange(0, 101, 1)
+        mfs = [fuzzy.trimf(universe, [0, 0, 50]), fuzzy.trimf(universe, [0, 50, 100]),
+               fuzzy.trimf(universe, [50, 100, 100])]
+        sets = [PiecewiseSet.trimf(0, 0, 50), PiecewiseSet.trimf(0, 50, 100), PiecewiseSet.trimf(50, 100, 100)]
+        levels = [0.7, 0.45, 0.13]
+        fine = np.linspace(0, 100, 200001)
+        aggregated = np.max([np.minimum(level, np.interp(fine, universe, mf)) for mf, level in zip(mfs, levels)],
+                            axis=0)
+        self.assertAlmostEqual(defuzzify(sets, levels), fuzzy.defuzz(fine, aggregated, 'centroid'), places=6)
+
+    def test_no_area(self):
+        with self.assertRaises(ValueError):
+            defuzzify([PiecewiseSet.trimf(0, 0, 50)], [0.0])
+
+if __name__ == '__main__':
+    unittest.main()
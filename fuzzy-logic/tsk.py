@@ -0,0 +1,198 @@
+"""
+Takagi-Sugeno-Kang (TSK) inference over skfuzzy rule bases
+
+A TSK rule keeps its Mamdani antecedent but its consequent is a function of
+the inputs instead of a fuzzy set: a constant (zero order) or
+c0 + c1 * x1 + ... + ck * xk (first order). The output is the average of
+the rule outputs weighted by their firing strengths, so evaluation costs
+O(rules) with no output universe to sample, clip or defuzzify.
+
+fit_tsk derives the consequents from an existing Mamdani controller by
+least squares on its outputs over a grid of inputs: the antecedents (and so
+the firing strengths) are the controller's own, only the consequent
+coefficients are fitted.
+
+Inputs are clipped to the antecedent universes, as in the Mamdani systems,
+for both the firing strengths and the linear consequents.
+"""
+import time
+
+import numpy as np
+
+from mamdani import BATCH_BLOCK, CompiledControlSystem
+
+class TSKControlSystem:
+    """
+    TSK inference with the rule antecedents of a ctrl.ControlSystem
+
+    Args:
+        control_system (ctrl.ControlSystem): Rule base whose antecedents are
+            used; a rule contributes to the outputs its consequents name
+        coefficients (dict): Output label -> (rules, 1) constant or
+            (rules, 1 + inputs) linear consequents, columns ordered as
+            [1] + self.inputs; rows of rules not reaching the output are
+            ignored
+    """
+
+    def __init__(self, control_system, coefficients):
+        self.rules = CompiledControlSystem(control_system)
+        self.inputs = [label for label, _, _, _ in self.rules.antecedents]
+        self.bounds = [(universe[0], universe[-1]) for _, universe, _, _ in self.rules.antecedents]
+        self.outputs = []
+        for label, matrix in coefficients.items():
+            matrix = np.asarray(matrix, dtype=float).reshape(len(self.rules.rule_outputs), -1)
+            if matrix.shape[1] not in (1, 1 + len(self.inputs)):
+                raise ValueError(f"{label}: expected 1 or {1 + len(self.inputs)} coefficients per rule")
+            mask = np.array([label in outputs for outputs in self.rules.rule_outputs])
+            self.outputs.append((label, mask, matrix[mask]))
+
+    def _regressors(self, inputs, n):
+        """
+        [1, x1, ..., xk] for n rows of clipped inputs, (1 + inputs, n)
+        """
+        rows = [np.ones(n)]
+        for label, (low, high) in zip(self.inputs, self.bounds):
+            rows.append(np.minimum(np.maximum(inputs[label], low), high) + np.zeros(n))
+        return np.array(rows)
+
+    def _evaluate(self, inputs, n):
+        firing = self.rules.fire(inputs, n)
+        regressors = None
+        outputs = {}
+        for label, mask, matrix in self.outputs:
+            weights = firing[mask]
+            if matrix.shape[1] == 1:
+                rule_outputs = matrix
+            else:
+                if regressors is None:
+                    regressors = self._regressors(inputs, n)
+                rule_outputs = matrix @ regressors
+            total = weights.sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                outputs[label] = np.where(total > 0, (weights * rule_outputs).sum(axis=0) / total, np.nan)
+        return outputs
+
+    def compute(self, inputs=None, **kwargs):
+        """
+        Crisp outputs for one set of inputs, by antecedent label; outputs with no firing rule are left out
+        """
+        outputs = self._evaluate(dict(inputs or {}, **kwargs), 1)
+        return {label: float(value[0]) for label, value in outputs.items() if not np.isnan(value[0])}
+
+    def compute_batch(self, inputs=None, **kwargs):
+        """
+        Crisp outputs for arrays of inputs (broadcast together), NaN where no rule fires
+        """
+        inputs = {label: np.asarray(value, dtype=float) for label, value in dict(inputs or {}, **kwargs).items()}
+        shape = np.broadcast_shapes(*(value.shape for value in inputs.values()))
+        flat = {label: np.broadcast_to(value, shape).ravel() for label, value in inputs.items()}
+        n = int(np.prod(shape))
+
+        outputs = {label: np.empty(n) for label, _, _ in self.outputs}
+        for start in range(0, n, BATCH_BLOCK):
+            block = {label: value[start:start + BATCH_BLOCK] for label, value in flat.items()}
+            for label, value in self._evaluate(block, len(next(iter(block.values())))).items():
+                outputs[label][start:start + BATCH_BLOCK] = value
+        return {label: value.reshape(shape) for label, value in outputs.items()}
+
+def fit_tsk(control_system, order=1, points=201):
+    """
+    TSK system fitted to a Mamdani controller's outputs
+
+    Samples every antecedent universe at points values (the full grid for
+    several inputs), evaluates the Mamdani controller there and solves for
+    the consequent coefficients by least squares on the normalized firing
+    strengths.
+
+    Args:
+        control_system (ctrl.ControlSystem): Mamdani controller to imitate
+        order (int): 0 for constant consequents, 1 for linear
+        points (int): Samples per input
+
+    Returns:
+        TSKControlSystem
+    """
+    if order not in (0, 1):
+        raise ValueError("order must be 0 or 1")
+    mamdani = CompiledControlSystem(control_system)
+    axes = [np.linspace(universe[0], universe[-1], points) for _, universe, _, _ in mamdani.antecedents]
+    grid = [axis.ravel() for axis in np.meshgrid(*axes, indexing='ij')]
+    inputs = {label: values for (label, _, _, _), values in zip(mamdani.antecedents, grid)}
+    n = len(grid[0])
+
+    targets = mamdani.compute_batch(inputs)
+    firing = mamdani.fire(inputs, n)
+    regressors = np.vstack([np.ones(n)] + grid) if order == 1 else np.ones((1, n))
+
+    coefficients = {}
+    for label, target in targets.items():
+        mask = np.array([label in outputs for outputs in mamdani.rule_outputs])
+        weights = firing[mask]
+        total = weights.sum(axis=0)
+        keep = (total > 0) & ~np.isnan(target)
+        normalized = weights[:, keep] / total[keep]
+        design = (normalized[:, None, :] * regressors[None, :, keep]).reshape(-1, keep.sum()).T
+        solution = np.linalg.lstsq(design, target[keep], rcond=None)[0]
+        matrix = np.zeros((len(mask), len(regressors)))
+        matrix[mask] = solution.reshape(mask.sum(), len(regressors))
+        coefficients[label] = matrix
+    return TSKControlSystem(control_system, coefficients)
+
+def compare(control_system, input_ranges, n=500, accuracy_n=20000, seed=0):
+    """
+    Accuracy and per-call latency of TSK against Mamdani on one controller
+
+    Errors are against the Mamdani output (compiled, which matches skfuzzy)
+    on accuracy_n random inputs; latencies are per compute() call on n.
+
+    Returns:
+        list: (name, microseconds per call, max abs error, RMS error) for
+            skfuzzy, compiled Mamdani and zero and first order TSK
+    """
+    from skfuzzy import control as ctrl
+
+    rng = np.random.default_rng(seed)
+    mamdani = CompiledControlSystem(control_system)
+    systems = [('Mamdani (compiled)', mamdani)] + [
+        (f"TSK order {order}", fit_tsk(control_system, order)) for order in (0, 1)
+    ]
+
+    accuracy_inputs = {label: rng.uniform(low, high, accuracy_n) for label, (low, high) in input_ranges.items()}
+    exact = mamdani.compute_batch(accuracy_inputs)
+
+    samples = [{label: float(rng.uniform(low, high)) for label, (low, high) in input_ranges.items()}
+               for _ in range(n)]
+    simulation = ctrl.ControlSystemSimulation(control_system, cache=False)
+    start = time.perf_counter()
+    for inputs in samples:
+        for label, value in inputs.items():
+            simulation.input[label] = value
+        simulation.compute()
+    rows = [('Mamdani (skfuzzy)', (time.perf_counter() - start) / n * 1e6, 0.0, 0.0)]
+
+    for name, system in systems:
+        start = time.perf_counter()
+        for inputs in samples:
+            system.compute(inputs)
+        latency = (time.perf_counter() - start) / n * 1e6
+        approx = system.compute_batch(accuracy_inputs)
+        errors = np.concatenate([np.abs(approx[label] - exact[label]) for label in exact])
+        rows.append((name, latency, float(np.nanmax(errors)), float(np.sqrt(np.nanmean(errors ** 2)))))
+    return rows
+
+def main():
+    import fuzz
+    from fz import FuzzyTemperatureController
+
+    systems = [
+        ('fz.py heating', FuzzyTemperatureController().heating_ctrl, {'temperature': (0, 50)}),
+        ('fuzz.py fan', fuzz.fan_control, {'temperature': (0, 40), 'humidity': (0, 100)})
+    ]
+    for title, control_system, input_ranges in systems:
+        print(f"\n{title}")
+        print(f"{'':20} {'us/call':>9} {'max err':>9} {'rms err':>9}")
+        for name, latency, max_error, rms_error in compare(control_system, input_ranges):
+            print(f"{name:20} {latency:9.1f} {max_error:9.3f} {rms_error:9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import subprocess
+import numpy as np
+
+# Whisper expects 16 kHz mono PCM
+SAMPLE_RATE = 16000
+
+def load_audio(path, sr=SAMPLE_RATE):
+    """
+    Decode any ffmpeg-readable file to mono float32 PCM
+
+    Args:
+        path (str): Path to the audio or video file
+        sr (int): Target sample rate
+
+    Returns:
+        np.ndarray: float32 samples in [-1, 1]
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-threads', '0', '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-'
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+def probe_duration(path):
+    """
+    Duration in seconds from container metadata, without decoding
+
+    Returns:
+        float: Duration, or None if ffprobe cannot tell
+    """
+    cmd = [
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1', path
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True, text=True).stdout
+        return float(out.strip())
+    except (subprocess.CalledProcessError, ValueError, OSError):
+        return None
+
+def stream_audio(path, block_seconds=30, sr=SAMPLE_RATE):
+    """
+    Decode a file incrementally, yielding fixed-size blocks of float32 PCM
+
+    Only one block is held at a time, so memory does not grow with the
+    file's length.
+
+    Args:
+        path (str): Path to the audio or video file
+        block_seconds (float): Length of each yielded block (the last may be shorter)
+        sr (int): Target sample rate
+    """
+    cmd = [
+        'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0', '-i', path,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sr), '-'
+    ]
+    block_bytes = int(block_seconds * sr) * 2
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    finished = False
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                finished = True
+                break
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    finally:
+        process.stdout.close()
+        if not finished:
+            process.kill()
+        returncode = process.wait()
+    if returncode != 0:
+        raise RuntimeError(f"Failed to load audio: ffmpeg exited with {returncode} for {path}")
+
+def frame_energy(samples, frame_samples):
+    """
+    Energy in dB of consecutive non-overlapping frames
+    """
+    n_frames = len(samples) // frame_samples
+    frames = samples[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    return 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+
+def quiet_cut(samples, nominal_seconds, search_seconds, sr=SAMPLE_RATE, frame_seconds=0.02):
+    """
+    Quietest point within +/- search_seconds of nominal_seconds
+
+    Returns:
+        float: Cut position in seconds (nominal_seconds if the range is empty)
+    """
+    lo = max(nominal_seconds - search_seconds, 0.0)
+    hi = min(nominal_seconds + search_seconds, len(samples) / sr)
+    frame_samples = int(frame_seconds * sr)
+    energy = frame_energy(samples[int(lo * sr):int(hi * sr)], frame_samples)
+    if len(energy) == 0:
+        return nominal_seconds
+    return lo + (int(np.argmin(energy)) + 0.5) * frame_seconds
+
+def plan_chunks(samples, chunk_seconds=300, overlap_seconds=2.0,
+                search_seconds=10.0, sr=SAMPLE_RATE, frame_seconds=0.02):
+    """
+    Split audio into overlapping windows cut at silence boundaries
+
+    Every chunk_seconds the quietest frame within +/- search_seconds becomes a
+    cut point. Each chunk owns the audio between two cuts and its window
+    extends overlap_seconds past both cuts, so words straddling a cut are
+    heard whole by at least one window.
+
+    Args:
+        samples (np.ndarray): Mono PCM at sr
+        chunk_seconds (float): Nominal chunk length
+        overlap_seconds (float): Audio added on each side of a cut
+        search_seconds (float): How far from the nominal cut to look for silence
+        sr (int): Sample rate of samples
+        frame_seconds (float): Frame length used for the energy envelope
+
+    Returns:
+        list: Chunk dicts with window (start, end) and owned (keep_start,
+            keep_end) ranges, all in seconds
+    """
+    duration = len(samples) / sr
+
+    # Snap each nominal cut to the quietest nearby frame
+    cuts = [0.0]
+    nominal = chunk_seconds
+    while nominal < duration - chunk_seconds / 2:
+        cut = quiet_cut(samples, nominal, search_seconds, sr, frame_seconds)
+        if cut > cuts[-1]:
+            cuts.append(cut)
+        nominal = cut + chunk_seconds
+    cuts.append(duration)
+
+    return [
+        {
+            'index': i,
+            'start': max(keep_start - overlap_seconds, 0.0),
+            'end': min(keep_end + overlap_seconds, duration),
+            'keep_start': keep_start,
+            'keep_end': keep_end
+        }
+        for i, (keep_start, keep_end) in enumerate(zip(cuts[:-1], cuts[1:]))
+    ]
+
+def slice_chunk(samples, chunk, sr=SAMPLE_RATE):
+    """
+    Samples of a chunk's window (a view, not a copy)
+    """
+    return samples[int(chunk['start'] * sr):int(chunk['end'] * sr)]
+
+def shift_segments(segments, offset):
+    """
+    Move window-relative Whisper segments onto the file's global timeline
+    """
+    return [
+        {
+            'start': segment['start'] + offset,
+            'end': segment['end'] + offset,
+            'text': segment['text'],
+            'avg_logprob': segment.get('avg_logprob'),
+            'no_speech_prob': segment.get('no_speech_prob')
+        }
+        for segment in segments
+    ]
+
+def stitch_segments(chunk_segments):
+    """
+    Merge per-chunk segments into one transcript on the global timeline
+
+    A segment belongs to the chunk whose owned range contains its midpoint,
+    which drops the copy transcribed again in the neighbour's overlap. A
+    segment repeating the previous kept text over overlapping time is also
+    dropped, for boundaries the two windows timed slightly differently.
+
+    Args:
+        chunk_segments (list): (chunk, segments) pairs, segments already
+            shifted to global time
+
+    Returns:
+        list: Ordered, de-duplicated segments
+    """
+    last_index = max((chunk['index'] for chunk, _ in chunk_segments), default=0)
+    kept = []
+    for chunk, segments in sorted(chunk_segments, key=lambda pair: pair[0]['index']):
+        for segment in segments:
+            midpoint = (segment['start'] + segment['end']) / 2
+            owned = chunk['keep_start'] <= midpoint < chunk['keep_end'] or (
+                chunk['index'] == last_index and midpoint >= chunk['keep_end']
+            )
+            if not owned:
+                continue
+            if kept and kept[-1]['text'].strip() == segment['text'].strip() \
+                    and segment['start'] < kept[-1]['end']:
+                continue
+            kept.append(segment)
+
+    kept.sort(key=lambda segment: segment['start'])
+    for i, segment in enumerate(kept):
+        segment['id'] = i
+    return kept
@@ -0,0 +1,237 @@
+"""
+Pick the worker count and torch threads per worker for stt_parallel.py
+
+Every worker runs torch with its own intra-op thread pool. Left alone each
+pool uses every core, so N workers oversubscribe the CPU N times; and each
+worker needs working memory on top of the (shared) weights. plan() sizes the
+pool from cores, available RAM and the model's footprint; calibrate() times a
+few candidate layouts with real encoder passes and remembers the fastest per
+machine and model size.
+
+Usage:
+    python autotune.py --model medium --calibrate
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+CONFIG_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'whisper-transcriber', 'autotune.json')
+
+# Weights (fp32) and per-worker working memory (activations, decoder cache,
+# decoded audio) in MB, and the threads per worker that keep matmuls efficient
+MODEL_PROFILES = {
+    'tiny':   {'weights_mb': 150,  'working_mb': 350,  'threads': 1},
+    'base':   {'weights_mb': 290,  'working_mb': 450,  'threads': 2},
+    'small':  {'weights_mb': 970,  'working_mb': 800,  'threads': 2},
+    'medium': {'weights_mb': 3000, 'working_mb': 1500, 'threads': 4},
+    'large':  {'weights_mb': 6200, 'working_mb': 2500, 'threads': 4},
+}
+
+# Fraction of available RAM the pool may use
+MEMORY_HEADROOM = 0.8
+
+def usable_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def available_memory_mb():
+    """
+    Memory available to new processes, in MB
+    """
+    try:
+        import psutil
+        return psutil.virtual_memory().available / 2**20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES') / 2**20
+
+def plan(model_size, n_jobs=None, device='cpu', cores=None, memory_mb=None):
+    """
+    Worker count and threads per worker from cores, RAM and model footprint
+
+    Args:
+        model_size (str): Whisper model size
+        n_jobs (int, optional): Files or chunks to process; caps the workers
+        device (str): 'cpu' shares one copy of the weights between workers,
+            any other device holds one copy per worker
+        cores (int, optional): Override the detected core count
+        memory_mb (float, optional): Override the detected available memory
+
+    Returns:
+        dict: 'workers', 'threads_per_worker' and the inputs they came from
+    """
+    profile = MODEL_PROFILES.get(model_size, MODEL_PROFILES['large'])
+    cores = cores or usable_cores()
+    memory_mb = memory_mb if memory_mb is not None else available_memory_mb()
+    budget = memory_mb * MEMORY_HEADROOM
+
+    if device == 'cpu':
+        # Weights live once in shared memory
+        per_worker = profile['working_mb']
+        memory_workers = int((budget - profile['weights_mb']) // per_worker)
+    else:
+        per_worker = profile['working_mb'] + profile['weights_mb']
+        memory_workers = int(budget // per_worker)
+
+    threads = min(profile['threads'], cores)
+    workers = max(1, min(cores // threads, memory_workers))
+    if n_jobs:
+        workers = max(1, min(workers, n_jobs))
+    # Give idle cores to the workers we have
+    threads = max(threads, cores // workers)
+
+    return {
+        'workers': workers,
+        'threads_per_worker': threads,
+        'cores': cores,
+        'memory_mb': round(memory_mb),
+        'model': model_size,
+        'source': 'heuristic'
+    }
+
+def machine_key(model_size, device='cpu'):
+    return f"{platform.node()}:{usable_cores()}cores:{model_size}:{device}"
+
+def load_config(model_size, device='cpu', path=CONFIG_PATH):
+    """
+    Calibrated configuration saved for this machine and model, or None
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get(machine_key(model_size, device))
+    except (OSError, ValueError):
+        return None
+
+def save_config(config, model_size, device='cpu', path=CONFIG_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path, encoding='utf-8') as f:
+            configs = json.load(f)
+    except (OSError, ValueError):
+        configs = {}
+    configs[machine_key(model_size, device)] = config
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(configs, f, indent=2)
+
+def recommend(model_size, n_jobs=None, device='cpu', cores=None, memory_mb=None):
+    """
+    Saved calibration if there is one, otherwise the heuristic plan
+
+    Overriding cores or memory_mb describes another host, so the plan for
+    it is returned instead of this machine's saved configuration.
+    """
+    config = load_config(model_size, device) if cores is None and memory_mb is None else None
+    if config is None:
+        return plan(model_size, n_jobs, device, cores, memory_mb)
+    config = dict(config)
+    if n_jobs:
+        config['workers'] = max(1, min(config['workers'], n_jobs))
+    return config
+
+def _encoder_passes(passes):
+    """
+    Run encoder forward passes on 30 s of synthetic audio; returns seconds taken
+
+    Runs in a stt_parallel.worker_pool worker, on the model _init_worker attached.
+    """
+    import torch
+    import whisper
+    import stt_parallel
+    model = stt_parallel._worker_model
+    audio = torch.randn(whisper.audio.N_SAMPLES) * 0.1
+    mel = whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels)
+    start = time.perf_counter()
+    with torch.no_grad():
+        for _ in range(passes):
+            model.embed_audio(mel.unsqueeze(0))
+    return time.perf_counter() - start
+
+def candidate_layouts(cores, max_workers):
+    """
+    (workers, threads) pairs that use every core without oversubscribing
+    """
+    layouts = set()
+    threads = 1
+    while threads <= cores:
+        workers = min(cores // threads, max_workers)
+        if workers >= 1:
+            layouts.add((workers, threads))
+        threads *= 2
+    return sorted(layouts)
+
+def calibrate(model_size, passes=3, save=True):
+    """
+    Time candidate layouts with real encoder passes and keep the fastest
+
+    Each layout runs passes 30 s encoder forwards per worker, all workers at
+    once; throughput is windows per wall second. Layouts run on
+    stt_parallel's worker_pool, so, as in production, the workers share one
+    copy of the weights in shared memory and the memory bound is the weights
+    once plus a working set per worker. Layouts that do not fit are skipped.
+
+    Returns:
+        dict: The chosen configuration, including every layout's throughput
+    """
+    from stt_parallel import EfficientWhisperTranscriber
+
+    transcriber = EfficientWhisperTranscriber()
+    limit = plan(model_size)
+    max_workers = max(1, int(
+        (limit['memory_mb'] * MEMORY_HEADROOM - MODEL_PROFILES[model_size]['weights_mb'])
+        // MODEL_PROFILES[model_size]['working_mb']
+    ))
+    results = []
+    for workers, threads in candidate_layouts(limit['cores'], max_workers):
+        with transcriber.worker_pool(model_size, workers, threads, device='cpu') as executor:
+            # Warm up: attach the model and run one pass in every worker
+            list(executor.map(_encoder_passes, [1] * workers))
+            start = time.perf_counter()
+            list(executor.map(_encoder_passes, [passes] * workers))
+            wall = time.perf_counter() - start
+        throughput = workers * passes / wall
+        print(f"workers={workers:<3} threads={threads:<3} {throughput:6.2f} windows/s")
+        results.append({'workers': workers, 'threads_per_worker': threads,
+                        'windows_per_second': round(throughput, 3)})
+
+    best = max(results, key=lambda r: r['windows_per_second'])
+    config = {
+        'workers': best['workers'],
+        'threads_per_worker': best['threads_per_worker'],
+        'cores': limit['cores'],
+        'memory_mb': limit['memory_mb'],
+        'model': model_size,
+        'source': 'calibrated',
+        'layouts': results
+    }
+    if save:
+        save_config(config, model_size)
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description='Choose stt_parallel workers and threads for this machine.')
+    parser.add_argument('--model', default='base', choices=list(MODEL_PROFILES))
+    parser.add_argument('--calibrate', action='store_true',
+                        help='Time candidate layouts and save the fastest for this machine')
+    parser.add_argument('--passes', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.calibrate:
+        config = calibrate(args.model, passes=args.passes)
+        print(f"Saved to {CONFIG_PATH}")
+    else:
+        config = recommend(args.model)
+    print(json.dumps({k: v for k, v in config.items() if k != 'layouts'}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Batched Whisper inference across 30-second windows
+
+model.transcribe walks a file one 30 s mel window at a time, so every
+encoder call is a batch of one. WindowBatcher cuts files into windows of at
+most 30 s (at the quietest point near each boundary), packs windows from one
+long file or from several short files into batches, runs the encoder and
+decoder on a whole batch with whisper.decode, and reassembles each file's
+segments on its own timeline.
+
+Windows are decoded independently (greedy, temperature 0, no conditioning on
+the previous window's text), which is what makes them batchable.
+
+Throughput for several batch sizes:
+    python batched.py clip.mp4 --model base --batch-sizes 1 4 8 16
+"""
+import argparse
+import time
+
+import audio
+
+# Seconds per timestamp token
+TIME_PRECISION = 0.02
+WINDOW_SECONDS = 30.0
+
+def plan_windows(samples, sr=audio.SAMPLE_RATE, max_seconds=WINDOW_SECONDS, search_seconds=2.0):
+    """
+    Consecutive windows of at most max_seconds, cut at the quietest point
+    within the last search_seconds*2 of each window
+
+    Returns:
+        list: (start, end) pairs in seconds
+    """
+    duration = len(samples) / sr
+    windows = []
+    start = 0.0
+    while start < duration:
+        if duration - start <= max_seconds:
+            end = duration
+        else:
+            end = audio.quiet_cut(samples, start + max_seconds - search_seconds, search_seconds, sr)
+            if end <= start:
+                end = start + max_seconds
+        windows.append((start, end))
+        start = end
+    return windows
+
+def tokens_to_segments(tokenizer, tokens, offset, window_seconds):
+    """
+    Timestamped segments from one window's decoded tokens
+
+    Whisper emits <|t0|> text <|t1|> pairs; text left without a closing
+    timestamp runs to the end of the window.
+    """
+    segments = []
+    start = None
+    text_tokens = []
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            t = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                segments.append({
+                    'start': offset + start,
+                    'end': offset + t,
+                    'text': tokenizer.decode(text_tokens)
+                })
+                text_tokens = []
+                start = None
+            else:
+                start = t
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    if text_tokens:
+        segments.append({
+            'start': offset + (start or 0.0),
+            'end': offset + window_seconds,
+            'text': tokenizer.decode(text_tokens)
+        })
+    return segments
+
+class WindowBatcher:
+    """
+    Pack 30 s windows from any number of files into encoder/decoder batches
+
+    add() queues a file's windows and runs every full batch; flush() runs
+    the remainder. Both yield (key, result) for each file whose windows have
+    all been decoded, where result has Whisper's 'text', 'segments' and
+    'language' keys.
+    """
+
+    def __init__(self, model, batch_size=8, language='en', fp16=False,
+                 no_speech_threshold=0.6, logprob_threshold=-1.0):
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.language = language
+        self.options = whisper.DecodingOptions(
+            task='transcribe', language=language, temperature=0.0,
+            without_timestamps=False, fp16=fp16
+        )
+        self.tokenizer = get_tokenizer(
+            model.is_multilingual, num_languages=model.num_languages,
+            language=language, task='transcribe'
+        )
+        self.no_speech_threshold = no_speech_threshold
+        self.logprob_threshold = logprob_threshold
+        self.queue = []
+        self.files = {}
+        self.windows_decoded = 0
+
+    def add(self, key, samples, sr=audio.SAMPLE_RATE):
+        windows = plan_windows(samples, sr)
+        self.files[key] = {'remaining': len(windows), 'segments': {}}
+        for index, (start, end) in enumerate(windows):
+            # Keep a view; the mel is computed when the window's batch runs
+            self.queue.append((key, index, start, end, samples[int(start * sr):int(end * sr)]))
+        if not windows:
+            yield from self._complete(key)
+        while len(self.queue) >= self.batch_size:
+            yield from self._run_batch(self.queue[:self.batch_size])
+            self.queue = self.queue[self.batch_size:]
+
+    def flush(self):
+        while self.queue:
+            yield from self._run_batch(self.queue[:self.batch_size])
+            self.queue = self.queue[self.batch_size:]
+
+    def _run_batch(self, batch):
+        import torch
+        import whisper
+
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(window)), n_mels=self.model.dims.n_mels
+            )
+            for _, _, _, _, window in batch
+        ]).to(self.model.device)
+        with torch.no_grad():
+            results = whisper.decode(self.model, mel, self.options)
+        self.windows_decoded += len(batch)
+
+        for (key, index, start, end, _), result in zip(batch, results):
+            silent = (result.no_speech_prob > self.no_speech_threshold
+                      and result.avg_logprob < self.logprob_threshold)
+            state = self.files[key]
+            state['segments'][index] = [] if silent else tokens_to_segments(
+                self.tokenizer, result.tokens, start, end - start
+            )
+            state['remaining'] -= 1
+            if state['remaining'] == 0:
+                yield from self._complete(key)
+
+    def _complete(self, key):
+        state = self.files.pop(key)
+        segments = [
+            segment
+            for index in sorted(state['segments'])
+            for segment in state['segments'][index]
+        ]
+        for i, segment in enumerate(segments):
+            segment['id'] = i
+        yield key, {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': self.language
+        }
+
+def transcribe_batched(model, items, batch_size=8, **options):
+    """
+    Transcribe (key, samples) pairs with batched windows
+
+    Yields:
+        tuple: (key, result) as each file completes
+    """
+    batcher = WindowBatcher(model, batch_size=batch_size, **options)
+    for key, samples in items:
+        yield from batcher.add(key, samples)
+    yield from batcher.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of batched window inference.')
+    parser.add_argument('clips', nargs='+', help='Audio/video files')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--threads', type=int, default=None, help='torch threads')
+    args = parser.parse_args()
+
+    import torch
+    import whisper
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = whisper.load_model(args.model, device=device)
+    clips = [(clip, audio.load_audio(clip)) for clip in args.clips]
+    audio_seconds = sum(len(samples) for _, samples in clips) / audio.SAMPLE_RATE
+
+    print(f"{args.model} on {device}, {audio_seconds:.0f}s of audio in {len(clips)} file(s)")
+    print(f"{'batch':>6} {'windows/s':>10} {'RTF':>8} {'wall s':>8}")
+    for batch_size in args.batch_sizes:
+        batcher = WindowBatcher(model, batch_size=batch_size, fp16=device == "cuda")
+        start = time.perf_counter()
+        for key, samples in clips:
+            for _ in batcher.add(key, samples):
+                pass
+        for _ in batcher.flush():
+            pass
+        wall = time.perf_counter() - start
+        print(f"{batch_size:>6} {batcher.windows_decoded / wall:>10.2f} "
+              f"{wall / audio_seconds:>8.3f} {wall:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Benchmark the engine's strategies on deterministic synthetic media
+
+Generates speech-like fixtures (voiced bursts separated by pauses, seeded so
+every run sees the same audio) and transcribes them with
+engine.TranscriptionEngine under each strategy, so the numbers are those of
+the code the front ends run:
+
+    sequential    one model, next files decoded in the background
+    threads       a thread pool with a model copy per thread
+    processes     worker processes sharing one copy of the weights
+    chunked       every file's windows spread over the worker processes
+
+Each run reports wall time, real-time factor (RTF, wall seconds per audio
+second), peak RSS of the process tree and CPU utilisation over all cores.
+Decoded PCM is dropped before every run, so each one pays for its decode.
+
+--stub loads StubModel where Whisper would be loaded (the model registry
+for sequential and threads, the worker pool for processes and chunked).
+It burns a fixed amount of matmul work per second of audio and holds a
+weight buffer of a given size, shared by the pool's workers as the real
+weights are, so scheduling and pipeline overheads can be measured without
+downloading weights. Decoding still goes through ffmpeg.
+
+Usage:
+    python benchmark.py --stub --workers 1 2 4
+    python benchmark.py --model base --durations 60 300 --video
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import audio
+import models
+import pcm
+import stt_parallel
+from engine import STRATEGIES, TranscriptionEngine
+from stt_parallel import EfficientWhisperTranscriber
+
+PATHS = STRATEGIES
+
+def synthetic_speech(seconds, seed=0, sr=audio.SAMPLE_RATE):
+    """
+    Deterministic speech-like signal: harmonic bursts with a wandering
+    pitch, 0.2-0.8 s pauses between them and a low noise floor
+    """
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sr)
+    samples = rng.normal(0.0, 0.003, total).astype(np.float32)
+    position = 0
+    while position < total:
+        length = int(rng.uniform(0.8, 4.0) * sr)
+        end = min(position + length, total)
+        t = np.arange(end - position) / sr
+        pitch = rng.uniform(90, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = np.abs(np.sin(np.pi * rng.uniform(3, 8) * t))
+        samples[position:end] += (0.2 * envelope * voiced).astype(np.float32)
+        position = end + int(rng.uniform(0.2, 0.8) * sr)
+    return np.clip(samples, -1.0, 1.0)
+
+def write_wav(path, samples, sr=audio.SAMPLE_RATE):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes((samples * 32767).astype('<i2').tobytes())
+
+def make_fixtures(directory, durations=(30, 120, 300), seed=0, video=False):
+    """
+    Write one fixture per duration, reusing files from earlier runs
+
+    Fixtures are 16 kHz WAV, or MP4 (black frames plus AAC audio) with
+    video=True so the decode includes demuxing a video container.
+
+    Returns:
+        list: Fixture paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, seconds in enumerate(durations):
+        wav_path = os.path.join(directory, f"speech_{seconds}s_seed{seed + index}.wav")
+        if not os.path.exists(wav_path):
+            write_wav(wav_path, synthetic_speech(seconds, seed + index))
+        if not video:
+            paths.append(wav_path)
+            continue
+
+        mp4_path = os.path.splitext(wav_path)[0] + '.mp4'
+        if not os.path.exists(mp4_path):
+            subprocess.run([
+                'ffmpeg', '-nostdin', '-y', '-v', 'error',
+                '-f', 'lavfi', '-i', 'color=c=black:s=320x240:r=10', '-i', wav_path,
+                '-shortest', '-c:v', 'libx264', '-c:a', 'aac',
+                '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact',
+                mp4_path
+            ], check=True)
+        paths.append(mp4_path)
+    return paths
+
+class StubModel:
+    """
+    Stand-in for a Whisper model with a realistic, fixed compute cost
+
+    transcribe() accepts a path or samples like whisper's and spends
+    iterations_per_second matmuls of a size x size float32 matrix on every
+    second of audio. The work is fixed rather than a sleep, so workers
+    compete for cores the way real inference does. weights_mb is held as a
+    buffer so memory scales with the number of model copies; with
+    weights_path the buffer is a read-only map of that file instead, shared
+    by every process that maps it.
+    """
+
+    def __init__(self, iterations_per_second=20, size=256, weights_mb=64, seed=0,
+                 weights_path=None):
+        rng = np.random.default_rng(seed)
+        self.iterations_per_second = iterations_per_second
+        self.matrix = rng.standard_normal((size, size)).astype(np.float32) / np.sqrt(size)
+        if weights_path is not None and os.path.getsize(weights_path):
+            self.weights = np.memmap(weights_path, dtype=np.float32, mode='r')
+        else:
+            self.weights = np.ones(int(weights_mb * 2**20 / 4), dtype=np.float32)
+        self.device = 'cpu'
+
+    @classmethod
+    def for_rtf(cls, rtf, size=256, weights_mb=64):
+        """
+        Stub whose single-threaded cost on this machine is about rtf
+        processing seconds per audio second
+        """
+        probe = cls(iterations_per_second=0, size=size, weights_mb=0)
+        state = probe.matrix
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            state = np.tanh(state @ probe.matrix)
+        per_iteration = (time.perf_counter() - start) / runs
+        return cls(max(1, round(rtf / per_iteration)), size, weights_mb)
+
+    def transcribe(self, audio_input, **options):
+        samples = audio.load_audio(audio_input) if isinstance(audio_input, str) else audio_input
+        sr = audio.SAMPLE_RATE
+        segments = []
+        state = self.matrix
+        # One segment per 30 s window, like Whisper's window loop
+        for index, start in enumerate(range(0, len(samples), 30 * sr)):
+            window = samples[start:start + 30 * sr]
+            for _ in range(int(len(window) / sr * self.iterations_per_second)):
+                state = np.tanh(state @ self.matrix)
+            segments.append({
+                'id': index,
+                'start': start / sr,
+                'end': (start + len(window)) / sr,
+                'text': f" Window {index} energy {float(np.abs(window).mean()):.4f}."
+            })
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': options.get('language') or 'en'
+        }
+
+def _init_stub_worker(stub, weights_path):
+    # The stub's counterpart of stt_parallel._init_worker; worker progress
+    # goes to stderr with the engine's
+    sys.stdout = sys.stderr
+    stt_parallel._worker_model = StubModel(**stub, weights_path=weights_path)
+
+class StubTranscriber(EfficientWhisperTranscriber):
+    """
+    The engine's transcriber with StubModel loaded where Whisper would be
+
+    Everything but the model load is EfficientWhisperTranscriber's, so the
+    strategies run their real per-file, per-worker and chunk paths.
+
+    Args:
+        stub (dict): StubModel arguments
+        weights_dir (str): Where the pool's shared weight file is written
+    """
+
+    def __init__(self, stub, weights_dir):
+        super().__init__()
+        self.stub = stub
+        self.weights_dir = weights_dir
+        self._device = 'cpu'
+
+    def load(self, model_size, device, precision='fp32'):
+        """
+        models.ModelRegistry loader
+        """
+        return StubModel(**self.stub)
+
+    def worker_pool(self, model_size, max_workers, threads_per_worker=None, quantized=False,
+                    device=None):
+        # As with Whisper on CPU, the weights are created once by the parent
+        # and every worker maps the same pages
+        weights_path = os.path.join(self.weights_dir, 'stub_weights.f32')
+        if not os.path.exists(weights_path):
+            StubModel(**self.stub).weights.tofile(weights_path)
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_stub_worker,
+            initargs=(self.stub, weights_path)
+        )
+
+def process_tree_rss():
+    import psutil
+    process = psutil.Process()
+    total = 0
+    for p in [process] + process.children(recursive=True):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+class PeakRssSampler:
+    """
+    Peak summed RSS of this process and its children, sampled on a thread
+
+    Without psutil, falls back to getrusage: the larger of this process's
+    and the largest child's peak, a lower bound for process pools.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        try:
+            import psutil  # noqa: F401
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+        except ImportError:
+            self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, process_tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._thread is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        else:
+            # ru_maxrss is in KB on Linux
+            self.peak = 1024 * max(
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            )
+
+def measure(strategy, spec, paths, audio_seconds, workers=1, chunk_seconds=None):
+    """
+    Transcribe the fixtures with one strategy and collect its metrics
+
+    Wall time includes loading the model(s), as a user would see it. CPU
+    time covers this process and every child it has waited for (worker
+    processes and ffmpeg).
+    """
+    output_dir = tempfile.mkdtemp(prefix='stt-bench-')
+    for path in paths:
+        pcm.evict(path)
+    # The engine's progress lines go to stderr, the table to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        if 'stub' in spec:
+            transcriber = StubTranscriber(spec['stub'], output_dir)
+            registry = models.ModelRegistry(loader=transcriber.load)
+        else:
+            transcriber = EfficientWhisperTranscriber()
+            registry = models.ModelRegistry()
+        previous = models.set_default_registry(registry)
+        try:
+            cpu_before = os.times()
+            with PeakRssSampler() as sampler:
+                start = time.perf_counter()
+                results = TranscriptionEngine(transcriber).run(
+                    paths,
+                    model_size=spec.get('whisper', 'base'),
+                    strategy=strategy,
+                    max_workers=None if strategy == 'sequential' else workers,
+                    chunk_seconds=chunk_seconds if strategy == 'chunked' else None,
+                    output_dir=output_dir
+                )
+                wall = time.perf_counter() - start
+            cpu_after = os.times()
+        finally:
+            models.set_default_registry(previous)
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+    failed = [result for result in results if not result['success']]
+    if failed:
+        raise RuntimeError(f"{failed[0]['input_file']}: {failed[0]['error']}")
+    cpu_seconds = sum(after - before for after, before in zip(cpu_after[:4], cpu_before[:4]))
+    return {
+        'path': strategy,
+        'workers': workers,
+        'files': len(paths),
+        'audio_seconds': round(audio_seconds, 1),
+        'wall_seconds': round(wall, 3),
+        'rtf': round(wall / audio_seconds, 4),
+        'peak_rss_mb': round(sampler.peak / 2**20, 1),
+        'cpu_seconds': round(cpu_seconds, 2),
+        'cpu_utilisation': round(cpu_seconds / (wall * (os.cpu_count() or 1)), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine's strategies on synthetic media.")
+    parser.add_argument('--paths', nargs='+', default=list(PATHS), choices=PATHS)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4],
+                        help='Worker counts for threads, processes and chunked')
+    parser.add_argument('--durations', type=float, nargs='+', default=[30, 120, 300],
+                        help='Fixture lengths in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fixtures', default='bench_fixtures', help='Fixture directory (reused across runs)')
+    parser.add_argument('--video', action='store_true', help='Wrap fixtures in MP4 with a video stream')
+    parser.add_argument('--model', default='base', help='Whisper model size (ignored with --stub)')
+    parser.add_argument('--chunk-seconds', type=float, default=60,
+                        help='Window length for chunked')
+    parser.add_argument('--stub', action='store_true', help='Use StubModel instead of Whisper')
+    parser.add_argument('--stub-rtf', type=float, default=0.1,
+                        help='Single-threaded seconds of stub compute per audio second')
+    parser.add_argument('--stub-weights-mb', type=float, default=64)
+    parser.add_argument('--output', default=None, help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    paths = make_fixtures(args.fixtures, [int(d) for d in args.durations], args.seed, args.video)
+    audio_seconds = sum(args.durations)
+
+    if args.stub:
+        # Calibrate once here so every process does the same amount of work
+        stub = StubModel.for_rtf(args.stub_rtf, weights_mb=0)
+        spec = {'stub': {'iterations_per_second': stub.iterations_per_second,
+                         'weights_mb': args.stub_weights_mb}}
+        print(f"Stub model: {stub.iterations_per_second} matmuls per audio second")
+    else:
+        spec = {'whisper': args.model}
+
+    runs = [(name, 1) for name in args.paths if name == 'sequential']
+    runs += [(name, workers) for name in args.paths if name != 'sequential'
+             for workers in args.workers]
+
+    print(f"{len(paths)} files, {audio_seconds:.0f}s of audio, {os.cpu_count()} cores")
+    print(f"{'path':<11} {'workers':>7} {'wall s':>8} {'RTF':>8} {'peak MB':>8} {'CPU %':>6}")
+    results = []
+    for name, workers in runs:
+        result = measure(name, spec, paths, audio_seconds, workers, args.chunk_seconds)
+        results.append(result)
+        print(f"{name:<11} {workers:>7} {result['wall_seconds']:>8.2f} {result['rtf']:>8.4f} "
+              f"{result['peak_rss_mb']:>8.1f} {100 * result['cpu_utilisation']:>6.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': spec, 'fixtures': paths, 'results': results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
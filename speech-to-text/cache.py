@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+MANIFEST_NAME = 'manifest.sqlite3'
+
+def file_digest(path, block_size=1 << 20):
+    """
+    SHA-256 of a file's content, read in fixed-size blocks
+
+    Args:
+        path (str): File to hash
+        block_size (int): Bytes read per block; memory stays at one block
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+class TranscriptionCache:
+    """
+    Content-addressed manifest of finished transcriptions
+
+    Lives as a SQLite file in the transcriptions directory. Jobs are keyed by
+    the input's content hash plus model size, language and decode options, so
+    a renamed or copied video is still a hit while changing the model is a
+    miss. Content hashes are remembered per (path, size, mtime), so a rerun
+    only streams files that are new or changed; every other lookup is a
+    primary-key read.
+
+    Jobs are marked 'running' when submitted and 'done' or 'failed' when
+    they finish. After a crash, 'running' and 'failed' jobs are simply not
+    hits, so rerunning the same batch resumes where it stopped.
+    """
+
+    def __init__(self, output_dir, filename=MANIFEST_NAME):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, filename)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "key TEXT PRIMARY KEY, digest TEXT, input_file TEXT, output_file TEXT, "
+                "status TEXT, error TEXT, updated REAL)"
+            )
+
+    def content_digest(self, path):
+        """
+        Content hash of path, streamed only if the file changed since last seen
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT digest FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, stat.st_size, stat.st_mtime_ns)
+        ).fetchone()
+        if row:
+            return row[0]
+
+        digest = file_digest(path)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest)
+            )
+        return digest
+
+    def job_key(self, path, model_size, language=None, **options):
+        """
+        Cache key for transcribing path with the given model and options
+        """
+        params = json.dumps(
+            {'model': model_size, 'language': language, 'options': options},
+            sort_keys=True
+        )
+        return hashlib.sha256(
+            (self.content_digest(path) + params).encode('utf-8')
+        ).hexdigest()
+
+    def lookup(self, key, output_base=None, formats=None):
+        """
+        Output file of a finished job, or None if it must be (re)run
+
+        The hit may have been transcribed from another file with the same
+        content (a rename or a copy). Given output_base, this file's
+        transcription path without the format extension, the cached
+        transcriptions in formats (default: the cached file's) are copied
+        there, so callers find them under this file's name, and the copy
+        is returned.
+        """
+        row = self.conn.execute(
+            "SELECT output_file FROM jobs WHERE key = ? AND status = 'done'", (key,)
+        ).fetchone()
+        if not (row and row[0] and os.path.exists(row[0])):
+            return None
+        cached_base, extension = os.path.splitext(row[0])
+        if output_base is None or cached_base == output_base:
+            return row[0]
+
+        try:
+            for fmt in formats or [extension[1:]]:
+                target = f"{output_base}.{fmt}"
+                tmp_target = f"{target}.{os.getpid()}.tmp"
+                shutil.copyfile(f"{cached_base}.{fmt}", tmp_target)
+                os.replace(tmp_target, target)
+        except OSError:
+            # Cached output removed since; transcribe again
+            return None
+        return output_base + extension
+
+    def _record(self, key, path, status, output_file=None, error=None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, "
+                "(SELECT digest FROM hashes WHERE path = ?), ?, ?, ?, ?, ?)",
+                (key, os.path.abspath(path), path, output_file, status, error, time.time())
+            )
+
+    def mark_running(self, key, path):
+        self._record(key, path, 'running')
+
+    def mark_done(self, key, path, output_file):
+        self._record(key, path, 'done', output_file=output_file)
+
+    def mark_failed(self, key, path, error):
+        self._record(key, path, 'failed', error=str(error))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,117 @@
+"""
+Compare the two ways stt_parallel.py can hand the Whisper model to workers:
+
+- per-task: the model is an argument of every executor.submit call
+- initializer: each worker attaches to the model once (_init_worker)
+
+For each design this reports the bytes serialized through the executor pipe
+for a batch of tasks, and the resident (RSS) and unique (USS) memory of every
+worker once it holds the model. USS excludes pages shared with other
+processes, so weights in shared memory do not count against each worker.
+
+Usage:
+    python compare_worker_init.py --model base --workers 4 --tasks 32
+"""
+import argparse
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+
+import psutil
+import torch
+import whisper
+
+import stt_parallel
+
+def worker_memory(model=None, payload=None):
+    """
+    Report the memory of the calling worker after it has touched the model
+
+    payload is the model pickled by value, as the per-task design sent it;
+    unpickling it gives the worker a private copy of the weights.
+    """
+    if payload is not None:
+        model = pickle.loads(payload)
+    model = model if model is not None else stt_parallel._worker_model
+    # Read every element so all of each tensor's pages are mapped and counted
+    checksum = sum(float(p.detach().sum()) for p in model.parameters())
+    info = psutil.Process().memory_full_info()
+    return {'pid': os.getpid(), 'rss': info.rss, 'uss': info.uss, 'checksum': checksum}
+
+def measure_pool(model_size, workers, model=None, payload=None, initializer=None, initargs=()):
+    """
+    Run one probe per worker and return their memory reports keyed by pid
+    """
+    reports = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=torch.multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs
+    ) as executor:
+        # Oversubmit so every worker answers at least once
+        tasks = workers * 4
+        for report in executor.map(worker_memory, [model] * tasks, [payload] * tasks):
+            reports[report['pid']] = report
+    return reports
+
+def format_reports(label, reports):
+    mb = 1024 * 1024
+    rss = [r['rss'] / mb for r in reports.values()]
+    uss = [r['uss'] / mb for r in reports.values()]
+    return (f"{label:<12} workers={len(reports):<3} "
+            f"RSS/worker={sum(rss) / len(rss):8.1f} MB  "
+            f"USS/worker={sum(uss) / len(uss):8.1f} MB  "
+            f"USS total={sum(uss):8.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tasks', type=int, default=32)
+    args = parser.parse_args()
+
+    transcriber = stt_parallel.EfficientWhisperTranscriber()
+    model = whisper.load_model(args.model, device="cpu")
+    n_tensors = len(model.state_dict())
+    mb = 1024 * 1024
+
+    # Pipe traffic: what executor.submit serializes for each task
+    per_task_args = (transcriber.transcribe_video, 'video.mp4', model, 'transcriptions')
+    per_task_plain = len(pickle.dumps(per_task_args))
+    # The per-task design shipped the weights by value with every task, so
+    # its workers are measured before share_memory() moves them to shared
+    # memory
+    legacy = measure_pool(args.model, args.workers, payload=pickle.dumps(model))
+    model.share_memory()
+    per_task_shared = len(ForkingPickler.dumps(per_task_args))
+    init_args = (transcriber.transcribe_in_worker, 'video.mp4', 'transcriptions')
+    init_task = len(ForkingPickler.dumps(init_args))
+    init_once = len(ForkingPickler.dumps((args.model, 'cpu', model)))
+
+    print(f"Model: {args.model} ({n_tensors} tensors), "
+          f"{args.tasks} tasks on {args.workers} workers")
+    print("\n--- Serialized per batch ---")
+    print(f"per-task (weights by value):    {per_task_plain * args.tasks / mb:10.1f} MB")
+    print(f"per-task (shared-memory refs):  {per_task_shared * args.tasks / mb:10.3f} MB, "
+          f"{n_tensors * args.tasks} storage handles re-attached")
+    print(f"initializer:                    "
+          f"{(init_task * args.tasks + init_once * args.workers) / mb:10.3f} MB, "
+          f"{n_tensors * args.workers} storage handles attached")
+
+    print("\n--- Worker memory ---")
+    print(format_reports('per-task', legacy))
+    private = measure_pool(
+        args.model, args.workers,
+        initializer=stt_parallel._init_worker, initargs=(args.model, 'cpu', None)
+    )
+    print(format_reports('private', private))
+    shared = measure_pool(
+        args.model, args.workers,
+        initializer=stt_parallel._init_worker, initargs=(args.model, 'cpu', model)
+    )
+    print(format_reports('shared', shared))
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,20 @@
-import os
-import torch
-import whisper
-import tkinter as tk
-from tkinter import filedialog, scrolledtext
+try:
+    import tkinter as tk
+    from tkinter import filedialog, scrolledtext, ttk
+except ImportError:
+    # Headless nodes without Tk can still use engine.TranscriptionEngine
+    tk = None
 import threading
-import logging
-
-class WhisperTranscriber:
-    def __init__(self):
-        # Configure logging
-        logging.basicConfig(
-            level=logging.INFO, 
-            format='%(asctime)s - %(levelname)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        self.logger = logging.getLogger(__name__)
-
-        # Check and log GPU availability
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.logger.info(f"Transcription will use: {self.device}")
-
-    def transcribe_video(self, video_path, model, output_dir):
-        """
-        Transcribe a single video file using Whisper
-        """
-        try:
-            filename = os.path.basename(video_path)
-            self.logger.info(f"Transcribing: {filename}")
-            
-            # Transcribe with GPU optimization
-            result = model.transcribe(
-                video_path, 
-                fp16=torch.cuda.is_available(),  # Use half precision on GPU
-                language='en',  # Adjust language as needed
-                verbose=False
-            )
-            
-            # Generate output path
-            transcription_filename = os.path.splitext(filename)[0] + '_transcription.txt'
-            transcription_path = os.path.join(output_dir, transcription_filename)
-            
-            # Write transcription
-            with open(transcription_path, 'w', encoding='utf-8') as f:
-                f.write(result['text'])
-            
-            self.logger.info(f"Transcription saved: {transcription_path}")
-            return True
-        
-        except Exception as e:
-            self.logger.error(f"Transcription failed for {filename}: {e}")
-            return False
-
-    def transcribe_batch(self, video_files, model_size='base'):
-        """
-        Batch transcribe videos using CUDA
-        """
-        try:
-            # Create output directory
-            if not video_files:
-                self.logger.warning("No video files selected")
-                return 0, 0
-
-            output_dir = os.path.join(os.path.dirname(video_files[0]), 'transcriptions')
-            os.makedirs(output_dir, exist_ok=True)
-
-            # Load Whisper model to GPU
-            self.logger.info(f"Loading {model_size} Whisper model to {self.device}")
-            model = whisper.load_model(model_size).to(self.device)
-            self.logger.info(f"Whisper model loaded on {model.device}")
-
-            # Transcribe videos
-            successful = 0
-            failed = 0
-            for video in video_files:
-                if self.transcribe_video(video, model, output_dir):
-                    successful += 1
-                else:
-                    failed += 1
-
-            return successful, failed
-
-        except Exception as e:
-            self.logger.error(f"Batch transcription error: {e}")
-            return 0, len(video_files)
+import metrics
+import models
+import probe
+from engine import TranscriptionEngine
 
 class WhisperTranscriptionApp:
     def __init__(self, master):
         self.master = master
-        self.transcriber = WhisperTranscriber()
+        self.engine = TranscriptionEngine()
+        self.recommended = probe.load_recommendation() or {}
         
         master.title("Whisper GPU Transcription")
         master.geometry("600x500")
@@ -95,7 +22,7 @@ class WhisperTranscriptionApp:
         # Device Information
         self.device_label = tk.Label(
             master, 
-            text=f"Transcription Device: {self.transcriber.device}", 
+            text="Transcription Device: detected when transcription starts", 
             fg="blue"
         )
         self.device_label.pack(pady=10)
@@ -116,12 +43,24 @@ class WhisperTranscriptionApp:
 
         # Model Selection
         tk.Label(master, text="Whisper Model:").pack()
-        self.model_var = tk.StringVar(value="base")
+        # Defaults to the size test.py recommended for this machine
+        self.model_var = tk.StringVar(value=self.recommended.get('model', 'base'))
         tk.OptionMenu(
             master, 
             self.model_var, 
             "tiny", "base", "small", "medium", "large"
         ).pack()
+        # Start loading a size as soon as it is chosen
+        self.model_var.trace_add('write', lambda *_: self.preload_model())
+
+        # Execution strategy; auto runs one model on a GPU
+        tk.Label(master, text="Strategy:").pack()
+        self.strategy_var = tk.StringVar(value="auto")
+        tk.OptionMenu(
+            master,
+            self.strategy_var,
+            "auto", "sequential", "threads", "processes", "chunked"
+        ).pack()
 
         # Transcribe Button
         self.transcribe_btn = tk.Button(
@@ -132,6 +71,12 @@ class WhisperTranscriptionApp:
         )
         self.transcribe_btn.pack(pady=10)
 
+        # Progress bar and ETA, driven by the per-file stage metrics
+        self.progress_bar = ttk.Progressbar(master, length=500, maximum=1.0)
+        self.progress_bar.pack(pady=5)
+        self.eta_label = tk.Label(master, text="")
+        self.eta_label.pack()
+
         # Progress Display
         self.progress_text = scrolledtext.ScrolledText(
             master, height=10, width=70, wrap=tk.WORD
@@ -140,7 +85,17 @@ class WhisperTranscriptionApp:
         
         self.video_files = []
 
+    def preload_model(self):
+        # Loads on a background thread; the device is resolved there too
+        # Same precision as the run below (int8 only on CPU, as the engine
+        # does), so the run finds this model instead of loading another copy
+        quantized = self.recommended.get('quantized') and self.recommended.get('device') == 'cpu'
+        precision = 'int8' if quantized else 'fp32'
+        models.default_registry().preload(self.model_var.get(), precision=precision)
+
     def select_files(self):
+        # Overlap loading the selected model with picking files
+        self.preload_model()
         filetypes = [
             ('Video Files', '*.mp4 *.avi *.mov *.mkv *.flv'),
             ('All Files', '*.*')
@@ -170,6 +125,8 @@ class WhisperTranscriptionApp:
         self.progress_text.config(state=tk.NORMAL)
         self.progress_text.delete(1.0, tk.END)
         self.progress_text.config(state=tk.DISABLED)
+        self.progress_bar['value'] = 0
+        self.eta_label.config(text="")
         
         # Start in a separate thread
         threading.Thread(target=self.run_transcription, daemon=True).start()
@@ -180,14 +137,24 @@ class WhisperTranscriptionApp:
             
             # Update UI with transcription start
             self.update_progress(f"Starting transcription with {model_size} model")
+            device_text = f"Transcription Device: {self.engine.transcriber.device}"
+            self.master.after(0, lambda: self.device_label.config(text=device_text))
             
             # Perform transcription
-            successful, failed = self.transcriber.transcribe_batch(
+            results = self.engine.run(
                 self.video_files, 
-                model_size=model_size
+                model_size=model_size,
+                strategy=self.strategy_var.get(),
+                # int8 as recommended for this machine; the engine only uses it on CPU
+                quantized=self.recommended.get('quantized', False),
+                on_progress=self.show_progress
             )
+            successful = sum(1 for r in results if r['success'])
+            failed = len(results) - successful
             
             # Update UI with results
+            self.update_progress(f"Strategy: {self.engine.plan['strategy']} "
+                                 f"({self.engine.plan['reason']})")
             self.update_progress(f"Transcription Complete")
             self.update_progress(f"Successful: {successful}, Failed: {failed}")
         
@@ -202,6 +169,14 @@ class WhisperTranscriptionApp:
         # Thread-safe progress update
         self.master.after(0, self._update_progress_thread, message)
 
+    def show_progress(self, progress):
+        # Thread-safe progress bar update
+        self.master.after(0, self._show_progress_thread, progress)
+
+    def _show_progress_thread(self, progress):
+        self.progress_bar['value'] = progress['fraction']
+        self.eta_label.config(text=metrics.describe_progress(progress))
+
     def _update_progress_thread(self, message):
         # Actual progress update method
         self.progress_text.config(state=tk.NORMAL)
@@ -210,6 +185,8 @@ class WhisperTranscriptionApp:
         self.progress_text.config(state=tk.DISABLED)
 
 def main():
+    if tk is None:
+        raise SystemExit("tkinter is not available; use 'python -m transcribe' instead")
     root = tk.Tk()
     app = WhisperTranscriptionApp(root)
     root.mainloop()
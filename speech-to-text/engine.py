@@ -0,0 +1,664 @@
+"""
+Transcription engine with pluggable executors
+
+One batch loop behind every front-end (stt.py, cuda.py, stt_parallel.py and
+the command line): files the cache already has are skipped, durations are
+probed, the pending files run on an executor, and every result is recorded
+in the cache, the stage metrics and the caller's callbacks. Executors only
+differ in where the model runs:
+
+    sequential  one model in this process; upcoming files are decoded in the
+                background while the current one is transcribed, and with
+                encoder_batch_size the windows of several files share a batch
+                (the GPU path)
+    threads     a thread pool in this process with a model copy per thread;
+                no worker processes to start, which suits short batches
+    processes   a process pool holding the model once per worker (in shared
+                memory on CPU), longest files first
+    chunked     every file cut into windows at silences and the windows
+                spread over the process pool, so one long file uses every core
+
+strategy='auto' picks one from the batch's file count and durations and the
+host's cores and memory (see choose_strategy).
+
+Usage:
+    engine = TranscriptionEngine()
+    results = engine.run(video_files, model_size='small', strategy='auto')
+"""
+import copy
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import audio
+import autotune
+import metrics
+import models
+import pcm
+import streaming
+from batched import WindowBatcher
+from cache import TranscriptionCache
+from pipeline import DecodePipeline
+from scheduler import DEFAULT_RTF, DurationScheduler, probe_durations, simulate_makespan
+from stt_parallel import EfficientWhisperTranscriber
+
+STRATEGIES = ('sequential', 'threads', 'processes', 'chunked')
+
+# Window length of the chunked strategy when none is given
+CHUNK_SECONDS = 300
+
+# Rough start-up cost of a process pool: spawn the workers, import torch and
+# whisper in each and attach the model
+POOL_STARTUP_SECONDS = 8.0
+
+# Threads stop scaling past a few, since Whisper's decoding loop holds the
+# GIL between torch calls
+MAX_THREAD_WORKERS = 4
+
+def _result(video, output_file=None, spans=None, error=None):
+    return {
+        'input_file': video,
+        'output_file': output_file,
+        'success': error is None,
+        'error': None if error is None else str(error),
+        'stages': spans.stages if spans is not None else {},
+        'audio_seconds': spans.audio_seconds if spans is not None else None
+    }
+
+def thread_workers(model_size, n_files, cores=None, memory_mb=None):
+    """
+    Threads for the threads strategy: every thread holds its own model copy
+    """
+    profile = autotune.MODEL_PROFILES.get(model_size, autotune.MODEL_PROFILES['large'])
+    cores = cores or autotune.usable_cores()
+    memory_mb = memory_mb if memory_mb is not None else autotune.available_memory_mb()
+    per_thread = profile['weights_mb'] + profile['working_mb']
+    fit = int(memory_mb * autotune.MEMORY_HEADROOM // per_thread)
+    return max(1, min(n_files, MAX_THREAD_WORKERS, cores // profile['threads'], fit))
+
+def choose_strategy(durations, model_size, device='cpu', chunk_seconds=CHUNK_SECONDS,
+                    cores=None, memory_mb=None):
+    """
+    Strategy for a batch from its file count and durations and the host
+
+    The worker layout is autotune.recommend's: a configuration saved by
+    autotune --calibrate or probe.py for this machine, otherwise the
+    heuristic plan. In order:
+        - on a GPU, one model keeps the device busy: sequential
+        - if cores or memory fit one worker only: sequential
+        - if the longest file would bound the makespan of a file-level pool
+          and spans at least two windows: chunked
+        - a single (short) file: sequential
+        - if the pool would finish in a few pool start-ups, which the
+          threads avoid, and at least two model copies fit: threads
+        - otherwise: processes
+
+    Args:
+        durations (list): Seconds per file (None where unknown; those count
+            as the average of the known ones)
+        model_size (str): Whisper model size
+        device (str): 'cpu' or a GPU device
+        chunk_seconds (float): Window length the chunked strategy would use
+        cores (int, optional): Override the detected core count
+        memory_mb (float, optional): Override the detected available memory
+
+    Returns:
+        dict: 'strategy', 'workers', 'threads_per_worker', 'reason' and
+            the inputs they came from
+    """
+    known = [d for d in durations if d]
+    fallback = sum(known) / len(known) if known else 0.0
+    lengths = sorted((d or fallback for d in durations), reverse=True)
+    total = sum(lengths)
+    longest = lengths[0] if lengths else 0.0
+    layout = autotune.recommend(model_size, device=device, cores=cores, memory_mb=memory_mb)
+
+    def decide(strategy, workers, threads, reason):
+        return {
+            'strategy': strategy,
+            'workers': workers,
+            'threads_per_worker': threads,
+            'reason': reason,
+            'files': len(lengths),
+            'audio_seconds': total,
+            'cores': layout['cores'],
+            'memory_mb': layout['memory_mb'],
+            'model': model_size,
+            'source': 'auto',
+            'layout_source': layout['source']
+        }
+
+    if device != 'cpu':
+        return decide('sequential', 1, None, "one model keeps the GPU busy")
+    if layout['workers'] < 2:
+        return decide('sequential', 1, layout['cores'], "cores or memory fit one worker only")
+    if longest >= 2 * chunk_seconds and longest > total / layout['workers']:
+        return decide('chunked', layout['workers'], layout['threads_per_worker'],
+                      f"the longest file ({longest / 60:.0f} min) would bound a file-level pool")
+    if len(lengths) == 1:
+        return decide('sequential', 1, layout['cores'], "a single short file")
+
+    files_layout = autotune.recommend(model_size, n_jobs=len(lengths), device=device,
+                                      cores=cores, memory_mb=memory_mb)
+    rtf = DEFAULT_RTF.get(model_size, 1.0)
+    pool_seconds = simulate_makespan([d * rtf for d in lengths], files_layout['workers'])
+    # A saved layout's memory_mb is from when it was measured
+    threads = thread_workers(model_size, len(lengths), cores=layout['cores'], memory_mb=memory_mb)
+    if pool_seconds < 4 * POOL_STARTUP_SECONDS and threads >= 2:
+        return decide('threads', threads, max(1, layout['cores'] // threads),
+                      f"about {pool_seconds:.0f}s of work, too little to start worker processes for")
+    return decide('processes', files_layout['workers'], files_layout['threads_per_worker'],
+                  f"{len(lengths)} files over {files_layout['workers']} workers")
+
+class Executor:
+    """
+    Runs a batch's pending files and yields one result dict per file as it finishes
+
+    Args:
+        transcriber (EfficientWhisperTranscriber): Per-file transcription and output
+        model_size (str): Whisper model size
+        workers (int): Threads or processes working on files
+        threads_per_worker (int, optional): torch threads per worker; torch's
+            default when omitted
+        quantized (bool): Use the int8 CPU model
+    """
+    name = None
+
+    def __init__(self, transcriber, model_size, workers=1, threads_per_worker=None,
+                 quantized=False):
+        self.transcriber = transcriber
+        self.model_size = model_size
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.quantized = quantized
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        raise NotImplementedError
+
+    def load_model(self):
+        precision = 'int8' if self.quantized else 'fp32'
+        print(f"Loading {self.model_size} ({precision}) Whisper model")
+        model = models.default_registry().get(self.model_size, self.transcriber.device, precision)
+        # Loading Whisper imported torch; stand-in models (benchmark.py) do not use it
+        torch = sys.modules.get('torch')
+        if self.threads_per_worker and torch is not None:
+            torch.set_num_threads(self.threads_per_worker)
+        return model
+
+class SequentialExecutor(Executor):
+    """
+    One model in this process, kept in the model registry between runs
+
+    Upcoming files are decoded into the PCM cache by a DecodePipeline while
+    the current one is transcribed; queue_depth bounds how many decoded
+    files wait and decode_workers is the number of ffmpeg threads. With
+    encoder_batch_size, windows of one long file or several short ones share
+    encoder and decoder batches (see batched.py); a batch's mel, encoder and
+    decoder time, and its wall time as processing_seconds, is charged to the
+    file being added when it runs, and the final flush is shared by the
+    files it completes.
+    """
+    name = 'sequential'
+
+    def __init__(self, *args, queue_depth=2, decode_workers=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queue_depth = queue_depth
+        self.decode_workers = decode_workers
+        # Per-stage totals of the last run (see DecodePipeline.summary)
+        self.stage_timings = None
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        transcriber = self.transcriber
+        model = self.load_model()
+
+        if any(fmt in streaming.STREAMING_FORMATS for fmt in output_format.split(',')):
+            # Segments are written as they are decoded; nothing to prefetch
+            for video in files:
+                start = time.perf_counter()
+                result = transcriber.transcribe_video(
+                    video, model, output_dir, output_format, language=language
+                )
+                result['processing_seconds'] = time.perf_counter() - start
+                yield result
+            return
+
+        batcher = None
+        if encoder_batch_size:
+            batcher = WindowBatcher(
+                model, batch_size=encoder_batch_size, language=language,
+                fp16=transcriber.device == "cuda"
+            )
+
+        spans = {}
+        # Batch wall time charged to each file, for the scheduler's RTF
+        processing = {}
+        pipeline = DecodePipeline(files, self.queue_depth, self.decode_workers, decode=pcm.load)
+        for item in pipeline:
+            video = item['path']
+            inference_start = time.perf_counter()
+            file_spans = metrics.FileSpans(video)
+            file_spans.add('decode', item['decode_end'] - item['decode_start'])
+            if item['error'] is not None:
+                yield _result(video, spans=file_spans, error=item['error'])
+                continue
+            # Decoded and waiting for the model
+            file_spans.add('queue_wait', inference_start - item['decode_end'])
+
+            if batcher is not None:
+                # Runs every batch this file's windows complete; files
+                # finish once all of their windows have been decoded
+                spans[video] = file_spans
+                file_spans.audio_seconds = len(item['samples']) / audio.SAMPLE_RATE
+                with metrics.measure(model, file_spans):
+                    completed = list(batcher.add(video, item['samples']))
+                pipeline.mark_inference(item, inference_start, time.perf_counter())
+                processing[video] = time.perf_counter() - inference_start
+                yield from self.write_completed(completed, spans, processing, output_dir,
+                                                output_format)
+                continue
+
+            # Maps the PCM the pipeline just decoded
+            result = transcriber.transcribe_video(
+                video, model, output_dir, output_format, spans=file_spans, use_vad=use_vad,
+                language=language
+            )
+            pipeline.mark_inference(item, inference_start, time.perf_counter())
+            result['processing_seconds'] = time.perf_counter() - inference_start
+            yield result
+
+        if batcher is not None:
+            # The last batches are shared evenly by the files they complete
+            flush_spans = metrics.FileSpans(None)
+            flush_start = time.perf_counter()
+            with metrics.measure(model, flush_spans):
+                completed = list(batcher.flush())
+            flush_seconds = time.perf_counter() - flush_start
+            for video, _ in completed:
+                for stage, seconds in flush_spans.stages.items():
+                    spans[video].add(stage, seconds / len(completed))
+                processing[video] += flush_seconds / len(completed)
+            yield from self.write_completed(completed, spans, processing, output_dir,
+                                            output_format)
+
+        self.stage_timings = pipeline.summary()
+        print("Batch stages: wall {wall_seconds:.2f}s, decode {decode_seconds:.2f}s "
+              "({overlapped_decode_seconds:.2f}s hidden behind inference), "
+              "inference {inference_seconds:.2f}s, waited {wait_seconds:.2f}s".format(
+                  **self.stage_timings
+              ))
+
+    def write_completed(self, completed, spans, processing, output_dir, output_format):
+        for video, result in completed:
+            file_spans = spans.pop(video)
+            start = time.perf_counter()
+            try:
+                with file_spans.stage('write'):
+                    path = self.transcriber.write_transcription(
+                        video, result, output_dir, output_format
+                    )
+            except OSError as e:
+                completed_result = _result(video, spans=file_spans, error=e)
+            else:
+                completed_result = _result(video, path, file_spans)
+            completed_result['processing_seconds'] = (
+                processing.pop(video) + time.perf_counter() - start
+            )
+            yield completed_result
+
+class ThreadExecutor(Executor):
+    """
+    A thread pool in this process, one model per thread
+
+    torch releases the GIL inside its kernels, so threads overlap most of
+    the encoder and decoder work without starting processes. Whisper
+    installs its kv-cache hooks on the model for every decode, so threads
+    cannot share one model: the first thread takes the registry's model and
+    the others deep-copy it.
+    """
+    name = 'threads'
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        transcriber = self.transcriber
+        spare = [self.load_model()]
+        base = spare[0]
+        local = threading.local()
+        lock = threading.Lock()
+
+        def thread_model():
+            if not hasattr(local, 'model'):
+                with lock:
+                    local.model = spare.pop() if spare else copy.deepcopy(base)
+            return local.model
+
+        def transcribe(video, submitted_at):
+            start = time.perf_counter()
+            spans = metrics.FileSpans(video)
+            spans.add('queue_wait', time.time() - submitted_at)
+            result = transcriber.transcribe_video(
+                video, thread_model(), output_dir, output_format, encoder_batch_size, spans,
+                use_vad, language
+            )
+            result['processing_seconds'] = time.perf_counter() - start
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='transcribe') as pool:
+            futures = [pool.submit(transcribe, video, time.time()) for video in files]
+            for future in as_completed(futures):
+                yield future.result()
+
+class ProcessExecutor(Executor):
+    """
+    A process pool holding the model once per worker (see
+    EfficientWhisperTranscriber.worker_pool); only paths cross the process
+    boundary
+    """
+    name = 'processes'
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        transcriber = self.transcriber
+        with transcriber.worker_pool(self.model_size, self.workers, self.threads_per_worker,
+                                     self.quantized) as executor:
+            futures = [
+                executor.submit(
+                    transcriber.transcribe_in_worker, video, output_dir, output_format,
+                    encoder_batch_size, time.time(), use_vad, language
+                )
+                for video in files
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+class ChunkExecutor(Executor):
+    """
+    Each file's silence-cut windows spread over the process pool and
+    stitched back (see EfficientWhisperTranscriber.transcribe_chunked)
+    """
+    name = 'chunked'
+
+    def __init__(self, *args, chunk_seconds=CHUNK_SECONDS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.chunk_seconds = chunk_seconds
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        transcriber = self.transcriber
+        with transcriber.worker_pool(self.model_size, self.workers, self.threads_per_worker,
+                                     self.quantized) as executor:
+            yield from transcriber.transcribe_chunked(
+                files, executor, output_dir, self.chunk_seconds, output_format,
+                language=language
+            )
+
+EXECUTORS = {
+    executor.name: executor
+    for executor in (SequentialExecutor, ThreadExecutor, ProcessExecutor, ChunkExecutor)
+}
+
+class TranscriptionEngine:
+    """
+    Batch transcription over any executor
+
+    Args:
+        transcriber (EfficientWhisperTranscriber, optional): Shared per-file
+            transcriber; one is created if omitted
+    """
+
+    def __init__(self, transcriber=None):
+        self.transcriber = transcriber or EfficientWhisperTranscriber()
+        # Strategy, workers and reason of the last run
+        self.plan = None
+        # Predicted vs actual makespan of the last file-level parallel run
+        self.schedule_report = None
+        # Per-stage totals of the last sequential run
+        self.stage_timings = None
+
+    def plan_run(self, strategy, durations, model_size, max_workers=None,
+                 threads_per_worker=None, chunk_seconds=None):
+        """
+        Resolve 'auto' and fill in workers and threads per worker
+
+        An explicit chunk_seconds with 'auto' asks for chunked. Explicit
+        max_workers and threads_per_worker override the plan.
+
+        Returns:
+            dict: As for choose_strategy, plus 'chunk_seconds'
+        """
+        device = self.transcriber.device
+        n_files = len(durations)
+        if strategy == 'auto' and chunk_seconds:
+            strategy = 'chunked'
+
+        if strategy == 'auto':
+            plan = choose_strategy(durations, model_size, device)
+        elif strategy == 'sequential':
+            plan = {'strategy': strategy, 'workers': 1, 'threads_per_worker': None,
+                    'reason': 'requested', 'source': 'requested'}
+        elif strategy == 'threads':
+            workers = thread_workers(model_size, n_files)
+            plan = {'strategy': strategy, 'workers': workers,
+                    'threads_per_worker': max(1, self.transcriber.num_cpus // workers),
+                    'reason': 'requested', 'source': 'requested'}
+        elif strategy in ('processes', 'chunked'):
+            plan = dict(autotune.recommend(
+                model_size, n_jobs=None if strategy == 'chunked' else n_files, device=device
+            ))
+            plan.update(strategy=strategy, reason='requested')
+        else:
+            raise ValueError(f"Unknown strategy: {strategy} (choose from auto, {', '.join(STRATEGIES)})")
+
+        plan['chunk_seconds'] = (chunk_seconds or CHUNK_SECONDS) if plan['strategy'] == 'chunked' else None
+        if max_workers is not None and plan['strategy'] != 'sequential':
+            plan['workers'] = max_workers
+            if threads_per_worker is None:
+                plan['threads_per_worker'] = max(1, self.transcriber.num_cpus // max_workers)
+        if threads_per_worker is not None:
+            plan['threads_per_worker'] = threads_per_worker
+        return plan
+
+    def run(self, video_files, model_size='base', strategy='auto', max_workers=None,
+            threads_per_worker=None, chunk_seconds=None, output_format='txt', output_dir=None,
+            quantized=False, encoder_batch_size=None, use_vad=False, on_result=None,
+            on_progress=None, queue_depth=2, decode_workers=1, language='en'):
+        """
+        Transcribe a batch of files with the given strategy
+
+        Args:
+            video_files (list): List of video file paths
+            model_size (str): Whisper model size
+            strategy (str): 'auto' or one of STRATEGIES
+            max_workers (int, optional): Threads or processes; planned from
+                cores, RAM and model size when omitted
+            threads_per_worker (int, optional): torch threads per worker
+            chunk_seconds (float, optional): Window length for chunked; with
+                'auto', asks for chunked
+            output_format (str): Comma-separated transcription formats: 'txt',
+                'json', or 'srt', 'vtt' and 'jsonl', which are streamed
+                segment by segment while the file is transcribed
+            output_dir (str, optional): Where transcriptions go; defaults to a
+                'transcriptions' directory next to the first video
+            quantized (bool): Opt-in int8 dynamically quantized inference;
+                CPU only, ignored on GPU
+            encoder_batch_size (int, optional): Batch 30 s windows through the
+                encoder and decoder (see batched.py); across files with
+                sequential, within each file otherwise. Ignored with chunked
+                and the streaming formats
+            use_vad (bool): Skip non-speech audio with the VAD pre-filter;
+                each result's 'vad' entry reports the seconds skipped.
+                Ignored with chunked, encoder_batch_size and the streaming
+                formats
+            on_result (callable, optional): Called with each result dict as
+                soon as its file finishes
+            on_progress (callable, optional): Called with
+                MetricsExporter.progress() after every file; per-file stage
+                spans are also written to metrics.jsonl and metrics.prom in
+                output_dir
+            queue_depth (int): Decoded files waiting on the model (sequential)
+            decode_workers (int): ffmpeg threads (sequential)
+            language (str, optional): Spoken language; None lets Whisper
+                detect it per file (per window with chunked). Ignored by
+                encoder_batch_size, whose windows share one prompt
+
+        Returns:
+            list: Transcription results; files skipped because an identical
+                transcription exists are marked 'cached'
+        """
+        transcriber = self.transcriber
+        formats = output_format.split(',')
+        unknown = [fmt for fmt in formats if fmt not in streaming.SINKS and fmt != 'json']
+        if unknown:
+            raise ValueError(f"Unknown output format: {', '.join(unknown)}")
+        streamed = any(fmt in streaming.STREAMING_FORMATS for fmt in formats)
+        if 'json' in formats and streamed:
+            raise ValueError("'json' holds the whole transcript and cannot be streamed; use 'jsonl'")
+        if not video_files:
+            return []
+
+        # The strategy decides the cache key (chunked output differs), so it
+        # is planned on every file before cached ones are skipped
+        durations = probe_durations(video_files)
+        plan = self.plan = self.plan_run(
+            strategy, [durations[v] for v in video_files], model_size, max_workers,
+            threads_per_worker, chunk_seconds
+        )
+        chunked = plan['strategy'] == 'chunked'
+        print(f"Strategy: {plan['strategy']} with {plan['workers']} workers "
+              f"({plan['reason']})")
+
+        # int8 dynamic quantization only exists for CPU kernels
+        quantized = quantized and transcriber.device == "cpu"
+        encoder_batch_size = None if chunked or streamed or language is None else encoder_batch_size
+        use_vad = use_vad and not (chunked or encoder_batch_size or streamed)
+
+        # Create output directory
+        if output_dir is None:
+            output_dir = os.path.join(os.path.dirname(video_files[0]), 'transcriptions')
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Skip files already transcribed with the same content and settings
+        results = []
+
+        def report(result):
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        cache = TranscriptionCache(output_dir)
+        keys = {}
+        pending = []
+        finished = set()
+        try:
+            for video in video_files:
+                try:
+                    keys[video] = cache.job_key(
+                        video, model_size, language=language,
+                        fp16=transcriber.device == "cuda", chunk_seconds=plan['chunk_seconds'],
+                        output_format=output_format, int8=quantized,
+                        encoder_batch_size=encoder_batch_size, vad=use_vad
+                    )
+                except OSError as e:
+                    report(_result(video, error=e))
+                    continue
+
+                cached_output = cache.lookup(
+                    keys[video], transcriber.transcription_base(video, output_dir), formats
+                )
+                if cached_output:
+                    print(f"Already transcribed: {video}")
+                    report({
+                        'input_file': video,
+                        'output_file': cached_output,
+                        'success': True,
+                        'error': None,
+                        'cached': True
+                    })
+                else:
+                    cache.mark_running(keys[video], video)
+                    pending.append(video)
+
+            if not pending:
+                return results
+
+            workers = plan['workers'] if chunked else max(1, min(plan['workers'], len(pending)))
+            options = {}
+            if chunked:
+                options['chunk_seconds'] = plan['chunk_seconds']
+            elif plan['strategy'] == 'sequential':
+                options.update(queue_depth=queue_depth, decode_workers=decode_workers)
+            executor = EXECUTORS[plan['strategy']](
+                transcriber, model_size, workers, plan['threads_per_worker'], quantized, **options
+            )
+
+            # File-level runs are ordered longest first and report a makespan
+            scheduler = None
+            files = pending
+            if not chunked:
+                scheduler = DurationScheduler(
+                    pending, workers, model_size, durations={v: durations[v] for v in pending}
+                )
+                if workers > 1:
+                    files = scheduler.order
+            exporter = metrics.MetricsExporter(
+                output_dir, total_files=len(pending),
+                total_audio_seconds=sum(durations[v] or 0.0 for v in pending),
+                # Chunked files each use every worker
+                workers=1 if chunked else workers
+            )
+
+            if scheduler is not None:
+                scheduler.start()
+                print(f"Predicted makespan: {scheduler.predicted:.0f}s for "
+                      f"{scheduler.total_audio / 60:.1f} min of audio")
+
+            for result in executor.run(
+                files, output_dir, output_format, encoder_batch_size, use_vad, language
+            ):
+                # Print individual results and record them in the manifest
+                video = result['input_file']
+                finished.add(video)
+                if result['success']:
+                    cache.mark_done(keys[video], video, result['output_file'])
+                    print(f"Successfully transcribed: {video}")
+                    if result.get('vad'):
+                        print(f"VAD skipped {result['vad']['skipped_seconds']:.1f}s of "
+                              f"{result['vad']['audio_seconds']:.1f}s")
+                else:
+                    cache.mark_failed(keys[video], video, result['error'])
+                    print(f"Failed to transcribe: {video} - {result['error']}")
+                if scheduler is not None:
+                    progress = scheduler.file_finished(
+                        video, result.get('processing_seconds', 0.0)
+                    )
+                    result['progress'] = progress
+                    print(f"Progress: {progress['audio_done'] / 60:.1f}/"
+                          f"{progress['audio_total'] / 60:.1f} min of audio, "
+                          f"RTF {progress['batch_rtf']:.2f}, ETA {progress['eta_seconds']:.0f}s")
+                exporter.record(
+                    video, result.get('stages', {}),
+                    result.get('audio_seconds') or durations.get(video),
+                    success=result['success'], error=result['error']
+                )
+                if on_progress is not None:
+                    on_progress(exporter.progress())
+                report(result)
+
+            if scheduler is not None:
+                self.schedule_report = scheduler.report()
+                print("Makespan: predicted {predicted_makespan:.0f}s "
+                      "(with measured RTF {predicted_makespan_measured_rtf:.0f}s), "
+                      "actual {actual_makespan:.0f}s".format(**self.schedule_report))
+            self.stage_timings = getattr(executor, 'stage_timings', None)
+        except BaseException as e:
+            # Jobs the executor never reported would otherwise stay 'running'
+            for video in pending:
+                if video not in finished:
+                    cache.mark_failed(keys[video], video, e)
+            raise
+        finally:
+            cache.close()
+        return results
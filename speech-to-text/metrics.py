@@ -0,0 +1,295 @@
+"""
+Per-file stage spans and metrics export for transcription jobs
+
+Every file gets a FileSpans with the seconds it spent in each stage:
+
+    queue_wait  decoded (or submitted) but not yet picked up by a model
+    decode      ffmpeg to 16 kHz PCM
+    mel         log-mel spectrogram
+    encoder     audio encoder forward passes
+    decoder     text decoder forward passes (all tokens)
+    write       writing the transcription files
+
+mel, encoder and decoder are measured inside model.transcribe / whisper.decode
+by measure(), which times whisper's log_mel_spectrogram and installs forward
+hooks on model.encoder and model.decoder.
+
+MetricsExporter appends one JSON line per finished file to metrics.jsonl and
+rewrites metrics.prom, a Prometheus text-format snapshot of the totals, so a
+node_exporter textfile collector (or a person with cat) can follow a batch.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from functools import partial
+
+STAGES = ('queue_wait', 'decode', 'mel', 'encoder', 'decoder', 'write')
+
+# FileSpans of the measure() block active on each thread
+_active = threading.local()
+_install_lock = threading.Lock()
+
+class FileSpans:
+    """
+    Seconds per stage for one file
+    """
+
+    def __init__(self, path, audio_seconds=None):
+        self.path = path
+        self.audio_seconds = audio_seconds
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + max(seconds, 0.0)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+class StageHooks:
+    """
+    Forward hooks that charge model.encoder and model.decoder time to the
+    FileSpans of the calling thread's measure() block
+
+    On CUDA the stop hook synchronizes, so kernels still in flight are
+    counted in the stage that launched them.
+    """
+
+    def __init__(self, model):
+        self._synchronize = None
+        if str(model.device).startswith('cuda'):
+            import torch
+            self._synchronize = torch.cuda.synchronize
+        for name in ('encoder', 'decoder'):
+            module = getattr(model, name)
+            module.register_forward_pre_hook(partial(self._enter, name))
+            module.register_forward_hook(partial(self._exit, name))
+
+    def _enter(self, name, module, args):
+        if getattr(_active, 'spans', None) is not None:
+            _active.started[name] = time.perf_counter()
+
+    def _exit(self, name, module, args, output):
+        spans = getattr(_active, 'spans', None)
+        if spans is None:
+            return
+        start = _active.started.pop(name, None)
+        if start is None:
+            return
+        if self._synchronize is not None:
+            self._synchronize()
+        spans.add(name, time.perf_counter() - start)
+
+def _timed(function, stage):
+    def wrapper(*args, **kwargs):
+        spans = getattr(_active, 'spans', None)
+        if spans is None:
+            return function(*args, **kwargs)
+        with spans.stage(stage):
+            return function(*args, **kwargs)
+    wrapper._stage_timer = True
+    return wrapper
+
+def _install_mel_timer():
+    # model.transcribe resolves log_mel_spectrogram in whisper.transcribe,
+    # batched.py through the whisper package
+    with _install_lock:
+        for module_name in ('whisper', 'whisper.transcribe'):
+            module = sys.modules.get(module_name)
+            original = getattr(module, 'log_mel_spectrogram', None)
+            if original is not None and not getattr(original, '_stage_timer', False):
+                module.log_mel_spectrogram = _timed(original, 'mel')
+
+@contextlib.contextmanager
+def measure(model, spans):
+    """
+    Charge mel, encoder and decoder time inside the block to spans
+
+    Hooks are installed on the model the first time and reused; the mel
+    timer wraps whisper's log_mel_spectrogram once and is left in place,
+    calling straight through outside a block. Models without
+    encoder/decoder submodules (e.g. benchmark.StubModel) are left alone.
+    The active spans are per thread, so threads running their own models
+    (engine.ThreadExecutor) can each be inside a block at the same time.
+    """
+    if not hasattr(model, '_stage_hooks') and hasattr(model, 'encoder') and hasattr(model, 'decoder'):
+        model._stage_hooks = StageHooks(model)
+    _install_mel_timer()
+
+    previous = getattr(_active, 'spans', None), getattr(_active, 'started', None)
+    _active.spans, _active.started = spans, {}
+    try:
+        yield spans
+    finally:
+        _active.spans, _active.started = previous
+
+def escape_label(value):
+    """
+    Label value escaped for the Prometheus text format
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_duration(seconds):
+    """
+    Compact h/m/s rendering for ETAs
+    """
+    seconds = int(round(max(seconds, 0)))
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+def describe_progress(progress):
+    """
+    One-line summary of MetricsExporter.progress() for status displays
+    """
+    text = f"{progress['files_done']}/{progress['files_total']} files"
+    if progress['audio_total']:
+        text += f", {progress['audio_done'] / 60:.1f}/{progress['audio_total'] / 60:.1f} min of audio"
+    if progress['rtf'] is not None:
+        text += f", RTF {progress['rtf']:.2f}"
+    if progress['eta_seconds'] is not None:
+        text += f", ETA {format_duration(progress['eta_seconds'])}"
+    return text
+
+class MetricsExporter:
+    """
+    Collect finished files' spans, export them and estimate progress
+
+    Args:
+        output_dir (str): Where metrics.jsonl and metrics.prom are written;
+            None keeps the metrics in memory only
+        total_files (int): Files expected in this batch
+        total_audio_seconds (float): Their audio length, if known
+        workers (int): Files transcribed concurrently, for the ETA
+    """
+
+    def __init__(self, output_dir, total_files=0, total_audio_seconds=0.0, workers=1,
+                 jsonl_name='metrics.jsonl', prom_name='metrics.prom'):
+        self.jsonl_path = os.path.join(output_dir, jsonl_name) if output_dir else None
+        self.prom_path = os.path.join(output_dir, prom_name) if output_dir else None
+        self.total_files = total_files
+        self.total_audio = total_audio_seconds or 0.0
+        self.workers = max(1, workers)
+        self.started = time.time()
+        self.stage_totals = {stage: 0.0 for stage in STAGES}
+        self.files = {'success': 0, 'failed': 0}
+        self.audio_done = 0.0
+        self.processing = 0.0
+
+    def record(self, path, stages, audio_seconds=None, success=True, error=None):
+        """
+        Record a finished file; returns its JSONL record
+        """
+        # Queue wait is latency, not work done on the file
+        processing = sum(seconds for stage, seconds in stages.items() if stage != 'queue_wait')
+        record = {
+            'time': round(time.time(), 3),
+            'file': path,
+            'success': success,
+            'error': None if error is None else str(error),
+            'audio_seconds': None if audio_seconds is None else round(audio_seconds, 3),
+            'stages': {stage: round(seconds, 4) for stage, seconds in stages.items()},
+            'processing_seconds': round(processing, 4),
+            'rtf': round(processing / audio_seconds, 4) if audio_seconds and processing else None
+        }
+
+        self.files['success' if success else 'failed'] += 1
+        for stage, seconds in stages.items():
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+        if audio_seconds and processing:
+            self.audio_done += audio_seconds
+            self.processing += processing
+        elif audio_seconds:
+            # Finished without stage timings (e.g. stitched chunks); still progress
+            self.audio_done += audio_seconds
+
+        if self.jsonl_path:
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.write_snapshot()
+        return record
+
+    @property
+    def rtf(self):
+        """
+        Processing seconds per audio second over the files timed so far
+        """
+        return self.processing / self.audio_done if self.processing and self.audio_done else None
+
+    def progress(self):
+        """
+        Files and audio done, fraction complete and the estimated seconds left
+        """
+        files_done = self.files['success'] + self.files['failed']
+        if self.total_audio:
+            fraction = min(self.audio_done / self.total_audio, 1.0)
+        else:
+            fraction = files_done / self.total_files if self.total_files else 0.0
+        eta = None
+        if self.rtf is not None and self.total_audio:
+            eta = max(self.total_audio - self.audio_done, 0.0) * self.rtf / self.workers
+        elif 0 < fraction < 1:
+            eta = (time.time() - self.started) * (1 - fraction) / fraction
+        return {
+            'files_done': files_done,
+            'files_total': self.total_files,
+            'audio_done': self.audio_done,
+            'audio_total': self.total_audio,
+            'fraction': fraction,
+            'rtf': self.rtf,
+            'eta_seconds': 0.0 if files_done >= self.total_files else eta
+        }
+
+    def prometheus_text(self):
+        progress = self.progress()
+        lines = [
+            '# HELP transcription_stage_seconds_total Seconds spent in each transcription stage.',
+            '# TYPE transcription_stage_seconds_total counter'
+        ]
+        lines += [
+            f'transcription_stage_seconds_total{{stage="{escape_label(stage)}"}} {seconds:.6f}'
+            for stage, seconds in self.stage_totals.items()
+        ]
+        lines += [
+            '# HELP transcription_files_total Files finished, by outcome.',
+            '# TYPE transcription_files_total counter'
+        ]
+        lines += [
+            f'transcription_files_total{{status="{escape_label(status)}"}} {count}'
+            for status, count in self.files.items()
+        ]
+        scalars = [
+            ('transcription_audio_seconds_total', 'counter', 'Audio seconds transcribed.', self.audio_done),
+            ('transcription_processing_seconds_total', 'counter',
+             'Processing seconds of timed files.', self.processing),
+            ('transcription_real_time_factor', 'gauge',
+             'Processing seconds per audio second.', self.rtf),
+            ('transcription_progress_ratio', 'gauge', 'Fraction of the batch done.', progress['fraction']),
+            ('transcription_eta_seconds', 'gauge', 'Estimated seconds until the batch finishes.',
+             progress['eta_seconds']),
+        ]
+        for name, kind, help_text, value in scalars:
+            if value is None:
+                continue
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value:.6f}']
+        return '\n'.join(lines) + '\n'
+
+    def write_snapshot(self):
+        if not self.prom_path:
+            return
+        # Scrapers must never see a half-written file
+        tmp_path = f"{self.prom_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, self.prom_path)
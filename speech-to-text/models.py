@@ -0,0 +1,138 @@
+"""
+In-process Whisper model registry
+
+Loaded models are kept across transcription runs, keyed by (size, device,
+precision), so clicking "Transcribe" again or switching back to a size used
+earlier does not reload the checkpoint. Models are evicted least recently
+used first once their estimated footprint exceeds the memory budget.
+
+preload() loads a model on a background thread, so the GUIs can start
+loading the selected size while the user is still picking files. Loads run
+one at a time, which keeps two checkpoints from being read at once.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import autotune
+
+# Weight footprint relative to fp32 (int8 quantizes the Linear layers only)
+PRECISION_SCALE = {'fp32': 1.0, 'int8': 0.3}
+
+def resolve_device(device=None):
+    if device is not None:
+        return str(device)
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def footprint_mb(model_size, precision='fp32'):
+    profile = autotune.MODEL_PROFILES.get(model_size, autotune.MODEL_PROFILES['large'])
+    return profile['weights_mb'] * PRECISION_SCALE.get(precision, 1.0)
+
+def load_model(model_size, device, precision='fp32'):
+    """
+    Load a model from disk (or the int8 cache) onto device
+    """
+    if precision == 'int8':
+        import quantize
+        return quantize.load_quantized_model(model_size)
+    import whisper
+    return whisper.load_model(model_size, device=device)
+
+class ModelRegistry:
+    """
+    LRU cache of loaded models under a memory budget
+
+    Args:
+        budget_mb (float, optional): Estimated weight memory the registry may
+            hold; defaults to half of the memory available when it is created.
+            The most recently used model is always kept, even over budget.
+        loader (callable): (model_size, device, precision) -> model; load_model
+            unless a stand-in model is wanted (see benchmark.py)
+    """
+
+    def __init__(self, budget_mb=None, loader=load_model):
+        self.budget_mb = budget_mb if budget_mb is not None else autotune.available_memory_mb() / 2
+        self.loader = loader
+        self.models = OrderedDict()
+        self.pending = None
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-load')
+
+    def _key(self, model_size, device, precision):
+        # int8 kernels only exist on CPU
+        device = 'cpu' if precision == 'int8' else resolve_device(device)
+        return (model_size, device, precision)
+
+    def _get_or_load(self, model_size, device, precision):
+        # Runs on the loader thread, so torch is imported there too
+        key = self._key(model_size, device, precision)
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+        model = self.loader(*key)
+        with self.lock:
+            self.models[key] = model
+            self._evict()
+        return model
+
+    def _evict(self):
+        total = sum(footprint_mb(size, precision) for size, _, precision in self.models)
+        while total > self.budget_mb and len(self.models) > 1:
+            (size, device, precision), model = self.models.popitem(last=False)
+            total -= footprint_mb(size, precision)
+            print(f"Evicted {size} ({precision}, {device}) from the model cache")
+            if device.startswith('cuda'):
+                import torch
+                del model
+                torch.cuda.empty_cache()
+
+    def preload(self, model_size, device=None, precision='fp32'):
+        """
+        Load in the background unless already loaded
+
+        A preload that has not started yet is dropped when the next one is
+        requested, so flicking through the dropdown only loads the final
+        choice.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the model
+        """
+        with self.lock:
+            if self.pending is not None:
+                self.pending.cancel()
+            self.pending = self.executor.submit(self._get_or_load, model_size, device, precision)
+            return self.pending
+
+    def get(self, model_size, device=None, precision='fp32'):
+        """
+        Loaded model for the key, loading it (after any load in progress) if needed
+        """
+        return self.executor.submit(self._get_or_load, model_size, device, precision).result()
+
+    def loaded(self):
+        with self.lock:
+            return list(self.models)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def default_registry():
+    """
+    Process-wide registry shared by the GUIs
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+def set_default_registry(registry):
+    """
+    Replace the process-wide registry; returns the previous one (or None)
+    """
+    global _registry
+    with _registry_lock:
+        previous, _registry = _registry, registry
+        return previous
@@ -0,0 +1,172 @@
+"""
+Decode-once PCM cache on local disk
+
+Every input is decoded by ffmpeg once into a raw float32 file
+(<key>.f32) with a JSON sidecar header (<key>.json) describing the source
+(path, size, mtime), sample rate and sample count. Later passes over the
+same file (chunk workers, retries, reruns) memory-map the raw file instead
+of decoding again. Mapped pages come from the page cache, so every process
+reading the same file shares one copy, and a chunk worker that is handed
+(pcm path, start sample, end sample) touches only its own window.
+
+The raw file is written under a temporary name and renamed into place before
+the header is written, so a header always describes a complete file.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import audio
+
+PCM_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'whisper-transcriber', 'pcm')
+
+# Decoded audio kept on disk, least recently used removed first (float32
+# 16 kHz mono is about 230 MB per hour of audio)
+MAX_CACHE_BYTES = 20 << 30
+
+# Memory maps opened by this process, by raw file path, most recent last;
+# DecodePipeline opens and prunes from several threads, so all access holds
+# _maps_lock
+_maps = OrderedDict()
+_maps_lock = threading.Lock()
+MAX_OPEN_MAPS = 8
+
+def cache_key(path):
+    """
+    Key of a file's decoded PCM; changes when the file is replaced
+    """
+    stat = os.stat(path)
+    identity = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+
+def read_header(header_path):
+    try:
+        with open(header_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def decode_to_pcm(path, cache_dir=PCM_DIR, sr=audio.SAMPLE_RATE):
+    """
+    Decode path to a raw float32 file once; later calls return the header
+
+    Decoding streams blocks from ffmpeg straight to disk, so memory stays at
+    one block whatever the file's length.
+
+    Returns:
+        dict: Header with 'pcm' (raw file path), 'samples', 'sample_rate',
+            'dtype' and the source's 'source', 'size' and 'mtime_ns'
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = cache_key(path)
+    raw_path = os.path.join(cache_dir, f"{key}.f32")
+    header_path = os.path.join(cache_dir, f"{key}.json")
+    header = read_header(header_path)
+    if header is not None and header['sample_rate'] == sr and os.path.exists(raw_path):
+        # Touch so pruning sees the file as recently used
+        os.utime(raw_path)
+        return header
+
+    tmp_path = f"{raw_path}.{os.getpid()}.tmp"
+    n_samples = 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            for block in audio.stream_audio(path, sr=sr):
+                f.write(block.astype('<f4').tobytes())
+                n_samples += len(block)
+        os.replace(tmp_path, raw_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    stat = os.stat(path)
+    header = {
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'pcm': raw_path,
+        'samples': n_samples,
+        'sample_rate': sr,
+        'dtype': 'float32'
+    }
+    tmp_header = f"{header_path}.{os.getpid()}.tmp"
+    with open(tmp_header, 'w', encoding='utf-8') as f:
+        json.dump(header, f)
+    os.replace(tmp_header, header_path)
+    prune(cache_dir)
+    return header
+
+def open_pcm(raw_path):
+    """
+    Memory-mapped float32 samples of a raw PCM file, opened once per process
+
+    Copy-on-write, so the array is writable for torch.from_numpy while the
+    file on disk and the shared pages are never modified.
+    """
+    with _maps_lock:
+        samples = _maps.get(raw_path)
+        if samples is None:
+            if os.path.getsize(raw_path) == 0:
+                return np.zeros(0, dtype=np.float32)
+            samples = _maps[raw_path] = np.memmap(raw_path, dtype='<f4', mode='c')
+            while len(_maps) > MAX_OPEN_MAPS:
+                _maps.popitem(last=False)
+        _maps.move_to_end(raw_path)
+        return samples
+
+def pcm_slice(raw_path, start, end):
+    """
+    Samples [start, end) of a raw PCM file, without copying
+    """
+    return open_pcm(raw_path)[start:end]
+
+def load(path, cache_dir=PCM_DIR):
+    """
+    Decoded samples of path as a memory map, decoding only the first time
+    """
+    return open_pcm(decode_to_pcm(path, cache_dir)['pcm'])
+
+def evict(path, cache_dir=PCM_DIR):
+    """
+    Forget a file's decoded PCM, so the next load decodes it again
+    """
+    raw_path = os.path.join(cache_dir, cache_key(path) + '.f32')
+    for victim in (raw_path[:-len('.f32')] + '.json', raw_path):
+        try:
+            os.unlink(victim)
+        except OSError:
+            pass
+    with _maps_lock:
+        _maps.pop(raw_path, None)
+
+def prune(cache_dir=PCM_DIR, max_bytes=MAX_CACHE_BYTES):
+    """
+    Remove least recently used decoded files until the cache fits max_bytes
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.f32'):
+            continue
+        raw_path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(raw_path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, raw_path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, raw_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        # Header first, so a reader never trusts a header without its data
+        for victim in (raw_path[:-len('.f32')] + '.json', raw_path):
+            try:
+                os.unlink(victim)
+            except OSError:
+                pass
+        with _maps_lock:
+            _maps.pop(raw_path, None)
+        total -= size
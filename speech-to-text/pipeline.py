@@ -0,0 +1,112 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import audio
+
+def _timed_decode(path, decode):
+    """
+    Decode one file and record when the decode ran
+    """
+    start = time.perf_counter()
+    try:
+        samples, error = decode(path), None
+    except Exception as e:
+        samples, error = None, e
+    return {
+        'path': path,
+        'samples': samples,
+        'error': error,
+        'decode_start': start,
+        'decode_end': time.perf_counter()
+    }
+
+class DecodePipeline:
+    """
+    Pre-decode upcoming files to 16 kHz PCM while the caller runs inference
+
+    A bounded thread pool runs ffmpeg for the next files while the current
+    one is on the model. ffmpeg runs in a subprocess, so decode threads do
+    not compete with inference for the GIL. At most queue_depth files are
+    decoded ahead of the one being inferred, which bounds memory to about
+    queue_depth + 1 times the largest file's PCM.
+
+    Iterating yields one dict per file, in input order, with the decoded
+    'samples' (or the decode 'error'), the decode start/end and 'wait_seconds',
+    the time the consumer blocked waiting for it. Call mark_inference() around
+    the work done on each item to record the inference stage.
+    """
+
+    def __init__(self, paths, queue_depth=2, decode_workers=1, decode=audio.load_audio):
+        self.paths = list(paths)
+        self.queue_depth = max(1, queue_depth)
+        self.decode_workers = max(1, decode_workers)
+        self.decode = decode
+        self.timings = []
+        self.started = None
+
+    def __iter__(self):
+        self.started = time.perf_counter()
+        pending = deque()
+        upcoming = iter(self.paths)
+        with ThreadPoolExecutor(max_workers=self.decode_workers) as executor:
+            # Fill the queue up to its depth
+            for path in upcoming:
+                pending.append(executor.submit(_timed_decode, path, self.decode))
+                if len(pending) >= self.queue_depth:
+                    break
+
+            while pending:
+                wait_start = time.perf_counter()
+                item = pending.popleft().result()
+                item['wait_seconds'] = time.perf_counter() - wait_start
+
+                # Keep the queue full while the caller works on this item
+                next_path = next(upcoming, None)
+                if next_path is not None:
+                    pending.append(executor.submit(_timed_decode, next_path, self.decode))
+
+                self.timings.append(item)
+                yield item
+                # Release the PCM before the next file is handed out
+                item['samples'] = None
+
+    def mark_inference(self, item, start, end):
+        """
+        Record when inference on a decoded item ran
+        """
+        item['inference_start'] = start
+        item['inference_end'] = end
+
+    def summary(self):
+        """
+        Per-stage totals and how much of the decode time was hidden
+
+        Returns:
+            dict: Wall, decode, inference and wait seconds, plus the decode
+                seconds that ran concurrently with inference
+        """
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        decode = sum(t['decode_end'] - t['decode_start'] for t in self.timings)
+        inference = sum(
+            t['inference_end'] - t['inference_start']
+            for t in self.timings if 'inference_end' in t
+        )
+        wait = sum(t['wait_seconds'] for t in self.timings)
+        overlapped = 0.0
+        for t in self.timings:
+            for other in self.timings:
+                if 'inference_end' not in other:
+                    continue
+                overlapped += max(0.0,
+                    min(t['decode_end'], other['inference_end'])
+                    - max(t['decode_start'], other['inference_start'])
+                )
+        return {
+            'files': len(self.timings),
+            'wall_seconds': wall,
+            'decode_seconds': decode,
+            'inference_seconds': inference,
+            'wait_seconds': wait,
+            'overlapped_decode_seconds': overlapped
+        }
@@ -0,0 +1,381 @@
+"""
+Hardware probe and encoder micro-benchmark
+
+probe_hardware() collects what decides transcription speed on a node: usable
+and physical cores, the CPU's SIMD extensions (AVX2/FMA for fp32 matmuls,
+AVX-512 VNNI, AVX-VNNI, AMX or the ARM dot product for int8), RAM, torch's
+thread settings and kernel capability, and any CUDA devices. benchmark()
+times a 30 s encoder forward pass per model size, fp32 and int8, at a few
+torch thread counts, and recommend() turns the timings into a config:
+model size, workers, threads per worker and whether to quantize.
+
+The recommendation is saved per machine and read by the apps at startup:
+the GUIs and the command line default to its model size and int8 setting,
+and its layout is handed to autotune, so worker pools use it unless
+`python autotune.py --calibrate` has measured the real multi-worker layout.
+
+Usage (test.py runs the probe):
+    python test.py
+    python test.py --models tiny base small medium --target-rtf 0.5
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+
+import autotune
+import models
+
+RECOMMENDATION_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'whisper-transcriber', 'recommended.json'
+)
+
+# CPU flags that matter for Whisper's matmuls, in the order they are reported
+SIMD_FLAGS = (
+    'sse4_2', 'avx', 'avx2', 'fma', 'f16c', 'avx512f', 'avx512_vnni', 'avx512_bf16',
+    'avx_vnni', 'amx_tile', 'amx_int8', 'amx_bf16', 'neon', 'asimd', 'asimddp', 'sve'
+)
+
+# Flags with int8 dot-product instructions, where quantized matmuls pay off most
+INT8_FLAGS = ('avx512_vnni', 'avx_vnni', 'amx_int8', 'asimddp')
+
+WINDOW_SECONDS = 30.0
+
+# Rough share of the encoder in the time per 30 s window on CPU (the rest is
+# the token-by-token decoder), used to turn encoder timings into an RTF
+ENCODER_SHARE = 0.5
+
+# int8 is recommended only when it is clearly faster, since it costs some
+# accuracy (see quantize.py for the WER delta on real clips)
+INT8_SPEEDUP = 0.85
+
+def cpu_flags():
+    """
+    CPU feature flags from /proc/cpuinfo or sysctl; empty if unknown
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() in ('flags', 'Features'):
+                    return set(value.split())
+    except OSError:
+        pass
+    if platform.system() == 'Darwin':
+        if platform.machine() == 'arm64':
+            # Every Apple silicon core has NEON and the dot-product extension
+            return {'neon', 'asimd', 'asimddp'}
+        try:
+            out = subprocess.run(
+                ['sysctl', '-n', 'machdep.cpu.features', 'machdep.cpu.leaf7_features'],
+                capture_output=True, text=True
+            ).stdout
+        except OSError:
+            return set()
+        return {flag.lower().replace('.', '_') for flag in out.split()}
+    return set()
+
+def cpu_name():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key.strip() == 'model name':
+                    return value.strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+def physical_cores():
+    """
+    Physical cores (SMT siblings counted once), or None if unknown
+    """
+    try:
+        import psutil
+        return psutil.cpu_count(logical=False)
+    except ImportError:
+        pass
+    try:
+        cores = set()
+        physical_id = None
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                key = key.strip()
+                if key == 'physical id':
+                    physical_id = value.strip()
+                elif key == 'core id':
+                    cores.add((physical_id, value.strip()))
+        return len(cores) or None
+    except OSError:
+        return None
+
+def total_memory_mb():
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 2**20
+    except ImportError:
+        pass
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2**20
+
+def probe_hardware():
+    """
+    Cores, SIMD extensions, RAM, torch threads and CUDA devices of this machine
+
+    Returns:
+        dict: JSON-serializable description of the node
+    """
+    import torch
+
+    flags = cpu_flags()
+    cpu_capability = None
+    if hasattr(torch.backends, 'cpu') and hasattr(torch.backends.cpu, 'get_cpu_capability'):
+        # The vector ISA torch's own kernels were dispatched to
+        cpu_capability = torch.backends.cpu.get_cpu_capability()
+    return {
+        'machine': platform.node(),
+        'cpu': cpu_name(),
+        'arch': platform.machine(),
+        'usable_cores': autotune.usable_cores(),
+        'logical_cores': os.cpu_count(),
+        'physical_cores': physical_cores(),
+        'simd': [flag for flag in SIMD_FLAGS if flag in flags],
+        'int8_dot_product': any(flag in flags for flag in INT8_FLAGS),
+        'memory_total_mb': round(total_memory_mb()),
+        'memory_available_mb': round(autotune.available_memory_mb()),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'torch_interop_threads': torch.get_num_interop_threads(),
+        'torch_cpu_capability': cpu_capability,
+        'mkldnn': torch.backends.mkldnn.is_available(),
+        'thread_env': {
+            name: os.environ[name]
+            for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+            if name in os.environ
+        },
+        'cuda': [
+            {
+                'name': torch.cuda.get_device_name(i),
+                'memory_mb': round(torch.cuda.get_device_properties(i).total_memory / 2**20)
+            }
+            for i in range(torch.cuda.device_count())
+        ] if torch.cuda.is_available() else []
+    }
+
+def thread_candidates(cores):
+    """
+    torch thread counts to time: powers of two up to the cores, and the cores
+    """
+    candidates = set()
+    threads = 1
+    while threads <= cores:
+        candidates.add(threads)
+        threads *= 2
+    candidates.add(cores)
+    return sorted(candidates)
+
+def time_encoder(model, threads=None, passes=2, fp16=False):
+    """
+    Seconds for one 30 s encoder forward pass (best of passes, after a warm-up)
+    """
+    import torch
+    import whisper
+
+    if threads:
+        torch.set_num_threads(threads)
+    device = next(model.parameters()).device
+    audio = torch.randn(whisper.audio.N_SAMPLES) * 0.1
+    mel = whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels).unsqueeze(0).to(device)
+    if fp16:
+        mel = mel.half()
+    synchronize = torch.cuda.synchronize if device.type == 'cuda' else (lambda: None)
+
+    seconds = []
+    with torch.no_grad():
+        model.embed_audio(mel)
+        synchronize()
+        for _ in range(passes):
+            start = time.perf_counter()
+            model.embed_audio(mel)
+            synchronize()
+            seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+def benchmark(model_sizes, device='cpu', passes=2, int8=True):
+    """
+    Encoder seconds per 30 s window for each model size, precision and thread count
+
+    Sizes whose weights and working memory do not fit in the available RAM
+    are skipped. On CPU every size is timed in fp32 and (with int8) int8 at
+    thread_candidates(); on a GPU in fp16 only.
+
+    Returns:
+        dict: size -> precision -> threads (str, '0' on a GPU) -> seconds
+    """
+    import torch
+    import whisper
+    import quantize
+
+    cores = autotune.usable_cores()
+    memory_mb = autotune.available_memory_mb() * autotune.MEMORY_HEADROOM
+    initial_threads = torch.get_num_threads()
+    timings = {}
+    try:
+        for size in model_sizes:
+            profile = autotune.MODEL_PROFILES[size]
+            if profile['weights_mb'] + profile['working_mb'] > memory_mb:
+                print(f"{size:<7} skipped: needs about "
+                      f"{profile['weights_mb'] + profile['working_mb']} MB")
+                continue
+            model = whisper.load_model(size, device=device)
+            if device != 'cpu':
+                seconds = time_encoder(model, passes=passes, fp16=True)
+                timings[size] = {'fp16': {'0': seconds}}
+                print(f"{size:<7} fp16 {seconds:7.3f}s per window")
+                del model
+                torch.cuda.empty_cache()
+                continue
+
+            timings[size] = {'fp32': {}}
+            for threads in thread_candidates(cores):
+                seconds = time_encoder(model, threads, passes)
+                timings[size]['fp32'][str(threads)] = seconds
+                print(f"{size:<7} fp32 threads={threads:<3} {seconds:7.3f}s per window")
+            if int8:
+                quantized = quantize.quantize_model(model)
+                del model
+                timings[size]['int8'] = {}
+                for threads in thread_candidates(cores):
+                    seconds = time_encoder(quantized, threads, passes)
+                    timings[size]['int8'][str(threads)] = seconds
+                    print(f"{size:<7} int8 threads={threads:<3} {seconds:7.3f}s per window")
+                del quantized
+            else:
+                del model
+    finally:
+        torch.set_num_threads(initial_threads)
+    return timings
+
+def estimate_layout(model_size, precision, threads, seconds, cores, memory_mb):
+    """
+    Workers for a thread count and the batch RTF they would reach
+
+    Workers share one copy of the weights (see stt_parallel.worker_pool)
+    and each needs its working memory; the pool's RTF assumes the encoder is
+    ENCODER_SHARE of the time per window and workers scale linearly.
+    """
+    profile = autotune.MODEL_PROFILES[model_size]
+    budget = memory_mb * autotune.MEMORY_HEADROOM - models.footprint_mb(model_size, precision)
+    workers = max(1, min(cores // threads, int(budget // profile['working_mb'])))
+    rtf = seconds / ENCODER_SHARE / WINDOW_SECONDS / workers
+    return workers, rtf
+
+def recommend(hardware, timings, device='cpu', target_rtf=0.25):
+    """
+    Largest model size that reaches target_rtf, with its fastest layout
+
+    Each size gets its best (precision, threads) layout; int8 is chosen only
+    if it is faster than fp32 by INT8_SPEEDUP. The largest size whose
+    estimated batch RTF (processing seconds per audio second with every
+    worker busy) is within target_rtf wins; if none is, the fastest size.
+
+    Args:
+        hardware (dict): probe_hardware() result
+        timings (dict): benchmark() result
+        device (str): Device the timings were taken on
+        target_rtf (float): 0.25 transcribes an hour of audio in 15 minutes
+
+    Returns:
+        dict: 'model', 'workers', 'threads_per_worker', 'quantized',
+            'estimated_rtf', 'target_rtf', 'device' and 'source'
+    """
+    cores = hardware['usable_cores']
+    memory_mb = hardware['memory_available_mb']
+    candidates = []
+    for size in autotune.MODEL_PROFILES:
+        if size not in timings:
+            continue
+        best = {}
+        for precision, by_threads in timings[size].items():
+            for threads, seconds in by_threads.items():
+                if device != 'cpu':
+                    layout = {'workers': 1, 'threads_per_worker': None,
+                              'rtf': seconds / ENCODER_SHARE / WINDOW_SECONDS}
+                else:
+                    workers, rtf = estimate_layout(
+                        size, precision, int(threads), seconds, cores, memory_mb
+                    )
+                    layout = {'workers': workers, 'threads_per_worker': int(threads), 'rtf': rtf}
+                if precision not in best or layout['rtf'] < best[precision]['rtf']:
+                    best[precision] = layout
+        quantized = 'int8' in best and best['int8']['rtf'] < best['fp32']['rtf'] * INT8_SPEEDUP
+        layout = best['int8'] if quantized else best.get('fp32') or best['fp16']
+        candidates.append(dict(layout, model=size, quantized=quantized))
+
+    if not candidates:
+        raise ValueError("No model size was benchmarked")
+    fitting = [c for c in candidates if c['rtf'] <= target_rtf]
+    choice = fitting[-1] if fitting else min(candidates, key=lambda c: c['rtf'])
+    return {
+        'model': choice['model'],
+        'workers': choice['workers'],
+        'threads_per_worker': choice['threads_per_worker'],
+        'quantized': choice['quantized'],
+        'estimated_rtf': round(choice['rtf'], 4),
+        'target_rtf': target_rtf,
+        'device': device,
+        'source': 'probe'
+    }
+
+def machine_key():
+    return f"{platform.node()}:{autotune.usable_cores()}cores"
+
+def save_recommendation(hardware, timings, recommended, path=RECOMMENDATION_PATH):
+    """
+    Save the probe for this machine and hand its layout to autotune
+
+    The layout is saved through autotune.save_config unless a calibrated
+    one exists for the same model, since calibration measures the real
+    multi-worker layout.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    saved[machine_key()] = {
+        'hardware': hardware,
+        'timings': timings,
+        'recommended': recommended,
+        'probed_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(saved, f, indent=2)
+    os.replace(tmp_path, path)
+
+    device = recommended['device']
+    existing = autotune.load_config(recommended['model'], device)
+    if device == 'cpu' and (existing is None or existing.get('source') != 'calibrated'):
+        autotune.save_config({
+            'workers': recommended['workers'],
+            'threads_per_worker': recommended['threads_per_worker'],
+            'cores': hardware['usable_cores'],
+            'memory_mb': hardware['memory_available_mb'],
+            'model': recommended['model'],
+            'source': 'probe'
+        }, recommended['model'], device)
+    return path
+
+def load_recommendation(path=RECOMMENDATION_PATH):
+    """
+    Recommended config the probe saved for this machine, or None
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f).get(machine_key())
+    except (OSError, ValueError):
+        return None
+    return saved['recommended'] if saved else None
@@ -0,0 +1,179 @@
+"""
+Int8 dynamically quantized Whisper models for CPU inference
+
+quantize_dynamic stores every Linear layer's weights as int8 and quantizes
+activations on the fly, which cuts the weights to about a quarter and speeds
+up the matmuls that dominate CPU inference. The quantized model is saved in
+the cache directory, so later launches load it instead of re-quantizing.
+
+Running this module compares fp32 and int8 on a local clip set:
+    python quantize.py --model base --clips test_clips/
+
+Each clip may have a reference transcript next to it (<clip>.txt); without
+one, the fp32 transcript is the reference. The report lists word error rate
+(WER), the int8 WER delta and real-time factor (RTF) per clip and overall.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'whisper-transcriber')
+
+def quantized_path(model_size, cache_dir=CACHE_DIR):
+    import torch
+    version = torch.__version__.split('+')[0]
+    return os.path.join(cache_dir, f"{model_size}-int8-torch{version}.pt")
+
+def quantize_model(model):
+    """
+    Apply int8 dynamic quantization to every Linear layer of a CPU model
+    """
+    import torch
+    import whisper
+
+    # whisper's Linear only adds a dtype cast to nn.Linear, which is a no-op
+    # in fp32; quantize_dynamic matches exact types, so expose them as nn.Linear
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(
+        model.cpu().eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+def load_quantized_model(model_size, cache_dir=CACHE_DIR):
+    """
+    Int8 model for model_size, quantized once and then loaded from the cache
+
+    The cache file is keyed by model size and torch version, since pickled
+    quantized modules are tied to the torch build that made them.
+    """
+    import torch
+    import whisper
+
+    path = quantized_path(model_size, cache_dir)
+    if os.path.exists(path):
+        return torch.load(path, map_location='cpu', weights_only=False)
+
+    model = quantize_model(whisper.load_model(model_size, device='cpu'))
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary name first so concurrent launches never read a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(model, tmp_path)
+    os.replace(tmp_path, path)
+    return model
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level Levenshtein distance divided by the reference length
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+def transcribe_timed(model, clip):
+    """
+    Transcribe a clip; returns (text, processing seconds, audio seconds)
+    """
+    import audio
+    samples = audio.load_audio(clip)
+    start = time.perf_counter()
+    result = model.transcribe(samples, fp16=False, language='en', verbose=None)
+    return result['text'], time.perf_counter() - start, len(samples) / audio.SAMPLE_RATE
+
+def compare(model_size, clips, threads=None):
+    """
+    Accuracy-versus-speed report of int8 against fp32 on the given clips
+    """
+    import torch
+    import whisper
+
+    if threads:
+        torch.set_num_threads(threads)
+    models = {
+        'fp32': whisper.load_model(model_size, device='cpu'),
+        'int8': load_quantized_model(model_size)
+    }
+    rows = []
+    totals = {name: {'processing': 0.0, 'audio': 0.0, 'errors': 0.0, 'words': 0} for name in models}
+    for clip in clips:
+        outputs = {name: transcribe_timed(model, clip) for name, model in models.items()}
+        reference_path = os.path.splitext(clip)[0] + '.txt'
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding='utf-8') as f:
+                reference = f.read()
+        else:
+            reference = outputs['fp32'][0]
+        n_words = max(len(normalize_words(reference)), 1)
+
+        row = {'clip': os.path.basename(clip), 'reference': os.path.exists(reference_path)}
+        for name, (text, processing, audio_seconds) in outputs.items():
+            wer = word_error_rate(reference, text)
+            row[f'{name}_wer'] = wer
+            row[f'{name}_rtf'] = processing / audio_seconds
+            totals[name]['processing'] += processing
+            totals[name]['audio'] += audio_seconds
+            totals[name]['errors'] += wer * n_words
+            totals[name]['words'] += n_words
+        row['wer_delta'] = row['int8_wer'] - row['fp32_wer']
+        rows.append(row)
+
+    summary = {
+        name: {
+            'wer': t['errors'] / t['words'] if t['words'] else 0.0,
+            'rtf': t['processing'] / t['audio'] if t['audio'] else 0.0
+        }
+        for name, t in totals.items()
+    }
+    summary['wer_delta'] = summary['int8']['wer'] - summary['fp32']['wer']
+    summary['speedup'] = summary['fp32']['rtf'] / summary['int8']['rtf'] if summary['int8']['rtf'] else None
+    return {'model': model_size, 'clips': rows, 'summary': summary}
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare int8 and fp32 Whisper on local clips.')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--clips', default='test_clips', help='Directory of audio/video clips')
+    parser.add_argument('--threads', type=int, default=None, help='torch threads')
+    parser.add_argument('--output', default=None, help='Also write the report as JSON')
+    args = parser.parse_args()
+
+    clips = sorted(
+        path for path in glob.glob(os.path.join(args.clips, '*'))
+        if not path.endswith('.txt') and os.path.isfile(path)
+    )
+    if not clips:
+        raise SystemExit(f"No clips found in {args.clips}")
+
+    report = compare(args.model, clips, args.threads)
+    print(f"{'clip':<30} {'fp32 WER':>9} {'int8 WER':>9} {'delta':>7} {'fp32 RTF':>9} {'int8 RTF':>9}")
+    for row in report['clips']:
+        print(f"{row['clip'][:30]:<30} {row['fp32_wer']:9.3f} {row['int8_wer']:9.3f} "
+              f"{row['wer_delta']:+7.3f} {row['fp32_rtf']:9.3f} {row['int8_rtf']:9.3f}")
+    summary = report['summary']
+    print(f"{'overall':<30} {summary['fp32']['wer']:9.3f} {summary['int8']['wer']:9.3f} "
+          f"{summary['wer_delta']:+7.3f} {summary['fp32']['rtf']:9.3f} {summary['int8']['rtf']:9.3f}")
+    if summary['speedup']:
+        print(f"int8 speedup: {summary['speedup']:.2f}x")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import audio
+
+# Rough CPU real-time factors (processing seconds per audio second, one
+# worker); only used until the first file of a batch finishes
+DEFAULT_RTF = {'tiny': 0.1, 'base': 0.2, 'small': 0.5, 'medium': 1.2, 'large': 2.5}
+
+def probe_durations(paths, probe_workers=8):
+    """
+    Container durations of many files, probed concurrently
+
+    Returns:
+        dict: path -> seconds (None where the container has no duration)
+    """
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        return dict(zip(paths, executor.map(audio.probe_duration, paths)))
+
+def simulate_makespan(costs, workers):
+    """
+    Finish time of the last job when jobs run in the given order on workers
+    that each take the next job as soon as they are free
+    """
+    free_at = [0.0] * max(1, workers)
+    for cost in costs:
+        start = heapq.heappop(free_at)
+        heapq.heappush(free_at, start + cost)
+    return max(free_at)
+
+class DurationScheduler:
+    """
+    Longest-first ordering and progress tracking for a batch of media files
+
+    Durations come from container metadata (ffprobe), so nothing is decoded
+    up front. Submitting the longest files first keeps a long file from
+    starting last and running alone while every other worker idles
+    (LPT scheduling, within 4/3 of the optimal makespan).
+
+    Progress is tracked in audio seconds and converted to time with the
+    real-time factor (RTF, processing seconds per audio second) measured on
+    the files finished so far.
+    """
+
+    def __init__(self, video_files, workers, model_size='base', rtf=None, probe_workers=8,
+                 durations=None):
+        self.workers = max(1, workers)
+        # Durations already probed by the caller are reused
+        if durations is None:
+            durations = probe_durations(list(video_files), probe_workers)
+        self.durations = durations
+        known = [d for d in self.durations.values() if d]
+        # Files without a duration are scheduled as if of average length
+        self.fallback_duration = sum(known) / len(known) if known else 0.0
+        self.prior_rtf = rtf or DEFAULT_RTF.get(model_size, 1.0)
+        self.order = sorted(video_files, key=self.duration, reverse=True)
+        self.total_audio = sum(self.duration(path) for path in self.order)
+        self.done_audio = 0.0
+        self.processing = 0.0
+        self.started = None
+        self.predicted = self.predicted_makespan()
+        self.finished = {}
+
+    def duration(self, path):
+        return self.durations.get(path) or self.fallback_duration
+
+    @property
+    def rtf(self):
+        """
+        Measured RTF once files have finished, the prior before that
+        """
+        if self.done_audio > 0:
+            return self.processing / self.done_audio
+        return self.prior_rtf
+
+    def predicted_makespan(self, rtf=None):
+        rtf = rtf if rtf is not None else self.prior_rtf
+        return simulate_makespan([self.duration(p) * rtf for p in self.order], self.workers)
+
+    def start(self):
+        self.started = time.time()
+        self.predicted = self.predicted_makespan()
+
+    def file_finished(self, path, processing_seconds):
+        """
+        Record a finished file and return a progress estimate
+
+        Returns:
+            dict: Audio seconds done/total, the file's RTF, the batch RTF
+                and the estimated seconds remaining
+        """
+        audio_seconds = self.duration(path)
+        self.finished[path] = processing_seconds
+        if audio_seconds:
+            self.done_audio += audio_seconds
+            self.processing += processing_seconds
+
+        remaining = [self.duration(p) * self.rtf for p in self.order if p not in self.finished]
+        return {
+            'file': path,
+            'audio_seconds': audio_seconds,
+            'file_rtf': processing_seconds / audio_seconds if audio_seconds else None,
+            'batch_rtf': self.rtf,
+            'audio_done': self.done_audio,
+            'audio_total': self.total_audio,
+            'eta_seconds': simulate_makespan(remaining, self.workers) if remaining else 0.0
+        }
+
+    def report(self):
+        """
+        Predicted (prior RTF), re-predicted (measured RTF) and actual makespan
+
+        The actual makespan is None until start() has been called.
+        """
+        return {
+            'files': len(self.order),
+            'workers': self.workers,
+            'audio_seconds': self.total_audio,
+            'predicted_makespan': self.predicted,
+            'predicted_makespan_measured_rtf': self.predicted_makespan(self.rtf),
+            'actual_makespan': time.time() - self.started if self.started is not None else None,
+            'rtf': self.rtf
+        }
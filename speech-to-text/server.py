@@ -0,0 +1,447 @@
+"""
+Local HTTP transcription service
+
+Keeps warm Whisper models in memory, keyed by model size, so clients share
+the model-load cost instead of paying it on every run. Built on asyncio's
+stream server; no web framework is needed.
+
+Endpoints:
+    POST /transcribe?model=base
+        Body is either JSON {"path": "/local/file.mp4"} or the raw media
+        bytes (an upload, spooled to a temporary file). The response is
+        newline-delimited JSON, sent with chunked encoding as the file is
+        decoded: {"event": "queued"}, {"event": "started", ...}, one
+        {"event": "segment", ...} per segment and a final {"event": "done", ...}
+        (or {"event": "error", ...}).
+    GET /health
+        Loaded models, queue depth and requests in flight.
+    GET /metrics
+        Prometheus text snapshot (see metrics.py).
+
+At most max_queue_depth requests are accepted at once (running plus
+waiting for a model); beyond that the service answers 429 with Retry-After.
+
+Usage (from the speech-to-text directory):
+    python server.py --preload base --copies 2 --max-queue-depth 16
+    curl -N -d '{"path": "/data/talk.mp4"}' -H 'Content-Type: application/json' \\
+        'http://127.0.0.1:8765/transcribe?model=base'
+    curl -N --data-binary @talk.mp4 'http://127.0.0.1:8765/transcribe?model=base'
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+import streaming
+
+MODEL_SIZES = ('tiny', 'base', 'small', 'medium', 'large')
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 429: 'Too Many Requests',
+    500: 'Internal Server Error'
+}
+
+class ModelPool:
+    """
+    Warm Whisper models, copies per size, handed out one request at a time
+
+    A size is loaded on first use (or up front with preload) and stays
+    loaded. Each copy serves one request at a time; requests for a size
+    whose copies are all busy wait in an asyncio queue.
+    """
+
+    def __init__(self, copies=1):
+        self.copies = max(1, copies)
+        self.pools = {}
+        self.loading = {}
+        self.device = None
+
+    def _load(self, model_size):
+        import torch
+        import whisper
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        return whisper.load_model(model_size, device=self.device)
+
+    async def load(self, model_size):
+        if model_size in self.pools:
+            return
+        if model_size not in self.loading:
+            self.loading[model_size] = asyncio.ensure_future(self._load_copies(model_size))
+        loading = self.loading[model_size]
+        try:
+            await loading
+        except Exception:
+            # A failed load (out of memory, bad download) is retried by the
+            # next request instead of being replayed to every later one
+            if self.loading.get(model_size) is loading:
+                del self.loading[model_size]
+            raise
+
+    async def _load_copies(self, model_size):
+        loop = asyncio.get_running_loop()
+        pool = asyncio.Queue()
+        for _ in range(self.copies):
+            pool.put_nowait(await loop.run_in_executor(None, self._load, model_size))
+        self.pools[model_size] = pool
+        print(f"Loaded {self.copies} x {model_size} on {self.device}")
+
+    async def acquire(self, model_size):
+        await self.load(model_size)
+        return await self.pools[model_size].get()
+
+    def release(self, model_size, model):
+        self.pools[model_size].put_nowait(model)
+
+    def status(self):
+        return {
+            size: {'copies': self.copies, 'idle': pool.qsize()}
+            for size, pool in self.pools.items()
+        }
+
+class Request:
+    def __init__(self, method, target, headers):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+
+    @property
+    def content_length(self):
+        value = self.headers.get('content-length')
+        return int(value) if value is not None else None
+
+async def read_request(reader):
+    """
+    Parse the request line and headers; the body is left on the reader
+    """
+    line = await reader.readline()
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ValueError("malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return Request(method, target, headers)
+
+class ResponseWriter:
+    """
+    HTTP/1.1 responses over a stream writer, whole or chunked
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        # 'idle' until a status line is written, then 'sent', 'streaming' or 'ended'
+        self.state = 'idle'
+
+    def _head(self, status, content_type, extra):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in extra.items()]
+        return ('\r\n'.join(lines) + '\r\n').encode('latin-1')
+
+    async def send(self, status, body, content_type='application/json', headers=None):
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.state = 'sent'
+        self.writer.write(self._head(status, content_type, dict(headers or {})))
+        self.writer.write(f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        await self.writer.drain()
+
+    async def start_stream(self, content_type='application/x-ndjson'):
+        self.state = 'streaming'
+        self.writer.write(self._head(200, content_type, {'Transfer-Encoding': 'chunked'}) + b'\r\n')
+        await self.writer.drain()
+
+    async def send_event(self, event):
+        data = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+        self.writer.write(f"{len(data):X}\r\n".encode('latin-1') + data + b'\r\n')
+        await self.writer.drain()
+
+    async def end_stream(self):
+        self.state = 'ended'
+        self.writer.write(b'0\r\n\r\n')
+        await self.writer.drain()
+
+    async def fail(self, error):
+        """
+        Finish the response after an unexpected error: a 500 if nothing was
+        sent yet, an error record and the last chunk if streaming
+        """
+        if self.state == 'idle':
+            await self.send(500, {'error': str(error)})
+        elif self.state == 'streaming':
+            await self.send_event({'event': 'error', 'error': str(error)})
+            await self.end_stream()
+
+class TranscriptionServer:
+    """
+    Args:
+        pool (ModelPool): Warm models
+        max_queue_depth (int): Requests accepted at once before answering 429
+        max_upload_bytes (int): Largest accepted upload
+        path_root (str, optional): If set, JSON 'path' requests must point inside it
+        window_seconds (float): Audio per streamed window; smaller windows
+            give an earlier first segment
+        default_model (str): Model size when the query does not name one
+    """
+
+    def __init__(self, pool, max_queue_depth=8, max_upload_bytes=2 << 30, path_root=None,
+                 window_seconds=30.0, default_model='base'):
+        self.pool = pool
+        self.max_queue_depth = max_queue_depth
+        self.max_upload_bytes = max_upload_bytes
+        self.path_root = os.path.realpath(path_root) if path_root else None
+        self.window_seconds = window_seconds
+        self.default_model = default_model
+        self.accepted = 0
+        self.running = 0
+        self.metrics = metrics.MetricsExporter(None)
+
+    async def handle(self, reader, writer):
+        response = ResponseWriter(writer)
+        try:
+            try:
+                request = await read_request(reader)
+            except ValueError as e:
+                await response.send(400, {'error': str(e)})
+                return
+
+            if request.path == '/health':
+                await response.send(200, {
+                    'models': self.pool.status(),
+                    'accepted': self.accepted,
+                    'running': self.running,
+                    'max_queue_depth': self.max_queue_depth
+                })
+            elif request.path == '/metrics':
+                await response.send(200, self.metrics.prometheus_text(),
+                                    content_type='text/plain; version=0.0.4')
+            elif request.path == '/transcribe':
+                if request.method != 'POST':
+                    await response.send(405, {'error': 'use POST'})
+                else:
+                    await self.transcribe(request, reader, response)
+            else:
+                await response.send(404, {'error': f"no route {request.path}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # Client went away; nothing left to answer
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                await response.fail(e)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def transcribe(self, request, reader, response):
+        model_size = request.query.get('model', self.default_model)
+        if model_size not in MODEL_SIZES:
+            await response.send(400, {'error': f"unknown model {model_size}"})
+            return
+        if self.accepted >= self.max_queue_depth:
+            # Reject before reading the body, so a saturated server stays cheap
+            await response.send(429, {'error': 'queue full', 'max_queue_depth': self.max_queue_depth},
+                                headers={'Retry-After': '5'})
+            return
+
+        self.accepted += 1
+        upload_path = None
+        try:
+            if request.headers.get('content-type', '').startswith('application/json'):
+                path, error = await self.resolve_path(request, reader)
+                if error:
+                    await response.send(*error)
+                    return
+            else:
+                upload_path, error = await self.spool_upload(request, reader)
+                if error:
+                    await response.send(*error)
+                    return
+                path = upload_path
+
+            await response.start_stream()
+            await response.send_event({'event': 'queued', 'model': model_size,
+                                       'position': self.accepted - self.running})
+            queued_at = time.perf_counter()
+            model = await self.pool.acquire(model_size)
+            self.running += 1
+            try:
+                await self.stream_file(model, path, queued_at, response)
+            finally:
+                self.running -= 1
+                self.pool.release(model_size, model)
+            await response.end_stream()
+        finally:
+            self.accepted -= 1
+            if upload_path:
+                os.unlink(upload_path)
+
+    async def resolve_path(self, request, reader):
+        """
+        Returns:
+            tuple: (path, None), or (None, (status, body)) to reject
+        """
+        length = request.content_length
+        if length is None:
+            return None, (411, {'error': 'Content-Length required'})
+        try:
+            path = json.loads(await reader.readexactly(length))['path']
+        except (ValueError, KeyError, TypeError):
+            return None, (400, {'error': 'expected {"path": ...}'})
+        path = os.path.realpath(path)
+        if self.path_root and os.path.commonpath([path, self.path_root]) != self.path_root:
+            return None, (400, {'error': f"path must be inside {self.path_root}"})
+        if not os.path.isfile(path):
+            return None, (404, {'error': f"no such file {path}"})
+        return path, None
+
+    async def spool_upload(self, request, reader, block_size=1 << 20):
+        """
+        Copy the request body to a temporary file, one block in memory at a time
+
+        Returns:
+            tuple: (temporary path, None), or (None, (status, body)) to reject
+        """
+        length = request.content_length
+        if length is None:
+            return None, (411, {'error': 'Content-Length required'})
+        if length > self.max_upload_bytes:
+            return None, (413, {'error': f"upload larger than {self.max_upload_bytes} bytes"})
+        fd, path = tempfile.mkstemp(prefix='stt-upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = length
+                while remaining:
+                    block = await reader.readexactly(min(block_size, remaining))
+                    f.write(block)
+                    remaining -= len(block)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path, None
+
+    async def stream_file(self, model, path, queued_at, response):
+        """
+        Decode in a worker thread and forward each segment as it is produced
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        cancelled = threading.Event()
+        started = time.perf_counter()
+        queue_wait = started - queued_at
+        fp16 = str(model.device).startswith('cuda')
+        spans = metrics.FileSpans(path)
+        spans.add('queue_wait', queue_wait)
+
+        def run():
+            try:
+                # Stage timings as the CLI and watch service record them;
+                # decoding is interleaved with inference, as in
+                # stt_parallel's streamed formats
+                with metrics.measure(model, spans):
+                    for segment in streaming.stream_segments(
+                        model, path, window_seconds=self.window_seconds,
+                        fp16=fp16, language='en', verbose=None
+                    ):
+                        if cancelled.is_set():
+                            break
+                        loop.call_soon_threadsafe(events.put_nowait, ('segment', segment))
+                loop.call_soon_threadsafe(events.put_nowait, ('done', None))
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait, ('error', e))
+
+        await response.send_event({'event': 'started', 'queue_wait': round(queue_wait, 3)})
+        worker = loop.run_in_executor(None, run)
+        audio_seconds = 0.0
+        try:
+            while True:
+                kind, payload = await events.get()
+                if kind == 'segment':
+                    audio_seconds = max(audio_seconds, payload['end'])
+                    await response.send_event({
+                        'event': 'segment',
+                        'start': round(payload['start'], 3),
+                        'end': round(payload['end'], 3),
+                        'text': payload['text'].strip()
+                    })
+                    continue
+
+                processing = time.perf_counter() - started
+                self.metrics.record(
+                    path, spans.stages, audio_seconds or None,
+                    success=kind == 'done', error=payload
+                )
+                if kind == 'error':
+                    await response.send_event({'event': 'error', 'error': str(payload)})
+                else:
+                    await response.send_event({
+                        'event': 'done',
+                        'audio_seconds': round(audio_seconds, 3),
+                        'processing_seconds': round(processing, 3),
+                        'queue_wait': round(queue_wait, 3)
+                    })
+                return
+        finally:
+            # Stop decoding for a client that disconnected, and keep the
+            # model checked out until its thread is done with it
+            cancelled.set()
+            await worker
+
+async def serve(host, port, server, preload=()):
+    for model_size in preload:
+        await server.pool.load(model_size)
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"Listening on http://{host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description='Local HTTP transcription service with warm models.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--preload', nargs='*', default=['base'], choices=MODEL_SIZES,
+                        help='Model sizes to load before accepting requests')
+    parser.add_argument('--copies', type=int, default=1,
+                        help='Warm copies per model size (requests served concurrently per size)')
+    parser.add_argument('--max-queue-depth', type=int, default=8,
+                        help='Requests accepted at once before answering 429')
+    parser.add_argument('--max-upload-mb', type=int, default=2048)
+    parser.add_argument('--path-root', default=None,
+                        help='Only allow {"path": ...} requests inside this directory')
+    parser.add_argument('--window-seconds', type=float, default=30.0,
+                        help='Audio per streamed window; smaller means an earlier first segment')
+    args = parser.parse_args()
+
+    server = TranscriptionServer(
+        ModelPool(args.copies),
+        max_queue_depth=args.max_queue_depth,
+        max_upload_bytes=args.max_upload_mb << 20,
+        path_root=args.path_root,
+        window_seconds=args.window_seconds,
+        default_model=args.preload[0] if args.preload else 'base'
+    )
+    try:
+        asyncio.run(serve(args.host, args.port, server, args.preload))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import json
+import numpy as np
+
+import audio
+
+def format_timestamp(seconds, marker=','):
+    """
+    HH:MM:SS<marker>mmm as used by SRT (',') and WebVTT ('.')
+    """
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{marker}{milliseconds:03d}"
+
+class SegmentSink:
+    """
+    Transcript file that receives segments one at a time
+
+    Every segment is flushed as soon as it is written, so the file can be
+    tailed while a long transcription is still running.
+    """
+    extension = None
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write(self.header())
+        self.file.flush()
+
+    def header(self):
+        return ''
+
+    def format(self, segment):
+        raise NotImplementedError
+
+    def write(self, segment):
+        self.count += 1
+        self.file.write(self.format(segment))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class TextSink(SegmentSink):
+    extension = 'txt'
+
+    def format(self, segment):
+        return segment['text']
+
+class SrtSink(SegmentSink):
+    extension = 'srt'
+
+    def format(self, segment):
+        return (
+            f"{self.count}\n"
+            f"{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}\n"
+            f"{segment['text'].strip()}\n\n"
+        )
+
+class VttSink(SegmentSink):
+    extension = 'vtt'
+
+    def header(self):
+        return "WEBVTT\n\n"
+
+    def format(self, segment):
+        return (
+            f"{format_timestamp(segment['start'], '.')} --> "
+            f"{format_timestamp(segment['end'], '.')}\n"
+            f"{segment['text'].strip()}\n\n"
+        )
+
+class JsonlSink(SegmentSink):
+    extension = 'jsonl'
+
+    def format(self, segment):
+        return json.dumps({
+            'id': self.count - 1,
+            'start': round(segment['start'], 3),
+            'end': round(segment['end'], 3),
+            'text': segment['text'].strip()
+        }, ensure_ascii=False) + '\n'
+
+SINKS = {sink.extension: sink for sink in (TextSink, SrtSink, VttSink, JsonlSink)}
+
+# Formats that carry timestamps and are worth streaming
+STREAMING_FORMATS = ('srt', 'vtt', 'jsonl')
+
+def open_sinks(base_path, formats):
+    """
+    Open one sink per format at <base_path>.<format>
+    """
+    return [SINKS[fmt](f"{base_path}.{fmt}") for fmt in formats]
+
+def stream_segments(model, path, window_seconds=120, search_seconds=5.0,
+                    prompt_chars=200, **decode_options):
+    """
+    Transcribe a file window by window, yielding segments as each window finishes
+
+    The file is decoded incrementally; once window_seconds of audio are
+    buffered, the buffer is cut at the quietest point near its end, the head
+    is transcribed and the tail carried into the next window. The end of the
+    previous window's text is passed as the next window's prompt so context
+    carries across cuts. Memory stays at about one window whatever the
+    file's length.
+
+    Args:
+        model (whisper.Whisper): Loaded Whisper model
+        path (str): Path to the audio or video file
+        window_seconds (float): Audio transcribed per model.transcribe call
+        search_seconds (float): How far before the window end to look for silence
+        prompt_chars (int): Characters of previous text used as the prompt
+        **decode_options: Passed to model.transcribe
+
+    Yields:
+        dict: Segments with 'start', 'end' (file timeline, seconds) and 'text'
+    """
+    sr = audio.SAMPLE_RATE
+    window_samples = int(window_seconds * sr)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0.0
+    prompt = None
+
+    def transcribe_window(samples):
+        nonlocal prompt
+        result = model.transcribe(samples, initial_prompt=prompt, **decode_options)
+        text = result['text'].strip()
+        if text:
+            prompt = text[-prompt_chars:]
+        return audio.shift_segments(result['segments'], offset)
+
+    for block in audio.stream_audio(path, block_seconds=min(window_seconds, 30)):
+        buffer = np.concatenate([buffer, block])
+        if len(buffer) < window_samples:
+            continue
+
+        # Cut just before the window end, at the quietest nearby frame
+        cut = audio.quiet_cut(buffer, window_seconds - search_seconds, search_seconds, sr)
+        cut_samples = max(int(cut * sr), 1)
+        yield from transcribe_window(buffer[:cut_samples])
+        buffer = buffer[cut_samples:].copy()
+        offset += cut_samples / sr
+
+    if len(buffer):
+        yield from transcribe_window(buffer)
@@ -1,12 +1,17 @@
 import os
 import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
-import whisper
+from tkinter import filedialog, messagebox, scrolledtext, ttk
 import threading
+import metrics
+import models
+import probe
+from engine import TranscriptionEngine
 
 class WhisperTranscriptionApp:
     def __init__(self, master):
         self.master = master
+        self.engine = TranscriptionEngine()
+        self.recommended = probe.load_recommendation() or {}
         master.title("Whisper Video Transcription")
         master.geometry("600x500")
 
@@ -38,10 +43,21 @@ class WhisperTranscriptionApp:
         self.model_label = tk.Label(self.model_frame, text="Select Whisper Model:")
         self.model_label.pack(side=tk.LEFT)
 
-        self.model_var = tk.StringVar(value="base")
+        # Defaults to the size test.py recommended for this machine
+        self.model_var = tk.StringVar(value=self.recommended.get('model', 'base'))
         self.model_options = ["tiny", "base", "small", "medium", "large"]
         self.model_dropdown = tk.OptionMenu(self.model_frame, self.model_var, *self.model_options)
         self.model_dropdown.pack(side=tk.LEFT, padx=5)
+        # Start loading a size as soon as it is chosen
+        self.model_var.trace_add('write', lambda *_: self.preload_model())
+
+        self.strategy_label = tk.Label(self.model_frame, text="Strategy:")
+        self.strategy_label.pack(side=tk.LEFT)
+
+        self.strategy_var = tk.StringVar(value="auto")
+        self.strategy_options = ["auto", "sequential", "threads", "processes", "chunked"]
+        self.strategy_dropdown = tk.OptionMenu(self.model_frame, self.strategy_var, *self.strategy_options)
+        self.strategy_dropdown.pack(side=tk.LEFT, padx=5)
 
         # Status Frame
         self.status_frame = tk.Frame(master)
@@ -50,6 +66,12 @@ class WhisperTranscriptionApp:
         self.status_label = tk.Label(self.status_frame, text="Status: Ready", fg="green")
         self.status_label.pack(side=tk.TOP, anchor='w')
 
+        # Progress bar and ETA, driven by the per-file stage metrics
+        self.progress_bar = ttk.Progressbar(self.status_frame, maximum=1.0)
+        self.progress_bar.pack(side=tk.TOP, fill=tk.X, pady=5)
+        self.eta_label = tk.Label(self.status_frame, text="")
+        self.eta_label.pack(side=tk.TOP, anchor='w')
+
         self.progress_text = scrolledtext.ScrolledText(self.status_frame, height=6, width=70, wrap=tk.WORD)
         self.progress_text.pack(side=tk.TOP, fill=tk.X)
         self.progress_text.config(state=tk.DISABLED)
@@ -57,7 +79,18 @@ class WhisperTranscriptionApp:
         # Video files list
         self.video_files = []
 
+    def preload_model(self):
+        # Loads on a background thread, kept for later runs
+        # Same precision as the run below (int8 only on CPU, as the engine
+        # does), so the run finds this model instead of loading another copy
+        quantized = self.recommended.get('quantized') and self.recommended.get('device') == 'cpu'
+        precision = 'int8' if quantized else 'fp32'
+        models.default_registry().preload(self.model_var.get(), precision=precision)
+
     def select_files(self):
+        # Overlap loading the selected model with picking files
+        self.preload_model()
+
         # Reset previous selection
         self.video_files = []
         self.selected_files_text.config(state=tk.NORMAL)
@@ -87,43 +120,32 @@ class WhisperTranscriptionApp:
         # Clear previous progress
         self.progress_text.config(state=tk.NORMAL)
         self.progress_text.delete(1.0, tk.END)
+        self.progress_bar['value'] = 0
+        self.eta_label.config(text="")
         
         # Start transcription in a separate thread
         threading.Thread(target=self.transcribe_videos, daemon=True).start()
 
     def transcribe_videos(self):
         try:
-            # Load the Whisper model
             model_size = self.model_var.get()
-            self.update_status(f"Loading {model_size} Whisper model...")
-            model = whisper.load_model(model_size)
-
-            # Create transcriptions directory
-            transcription_dir = os.path.join(os.path.dirname(self.video_files[0]), 'transcriptions')
-            os.makedirs(transcription_dir, exist_ok=True)
-
-            # Transcribe each video
-            for video_path in self.video_files:
-                try:
-                    filename = os.path.basename(video_path)
-                    self.update_status(f"Transcribing: {filename}")
-                    
-                    # Transcribe the video
-                    result = model.transcribe(video_path, fp16=False)
-                    
-                    # Generate transcription filename
-                    transcription_filename = os.path.splitext(filename)[0] + '_transcription.txt'
-                    transcription_path = os.path.join(transcription_dir, transcription_filename)
-                    
-                    # Write transcription to file
-                    with open(transcription_path, 'w', encoding='utf-8') as f:
-                        f.write(result['text'])
-                    
-                    self.update_status(f"Transcription saved to {transcription_path}")
-                
-                except Exception as e:
-                    self.update_status(f"Error transcribing {filename}: {str(e)}")
-
+            self.update_status(f"Transcribing with the {model_size} Whisper model...")
+
+            # Transcriptions, the cache manifest and metrics go to a
+            # 'transcriptions' directory next to the first video
+            results = self.engine.run(
+                self.video_files,
+                model_size=model_size,
+                strategy=self.strategy_var.get(),
+                # int8 as recommended for this machine; the engine only uses it on CPU
+                quantized=self.recommended.get('quantized', False),
+                # Whisper detects each video's language, as before the engine
+                language=None,
+                on_result=self.report_result,
+                on_progress=self.show_progress
+            )
+
+            self.update_status(f"Strategy: {self.engine.plan['strategy']} ({self.engine.plan['reason']})")
             self.update_status("Transcription complete!")
         
         except Exception as e:
@@ -133,10 +155,27 @@ class WhisperTranscriptionApp:
             # Re-enable buttons
             self.master.after(0, self.reset_buttons)
 
+    def report_result(self, result):
+        filename = os.path.basename(result['input_file'])
+        if result.get('cached'):
+            self.update_status(f"Already transcribed: {filename}")
+        elif result['success']:
+            self.update_status(f"Transcription saved to {result['output_file']}")
+        else:
+            self.update_status(f"Error transcribing {filename}: {result['error']}")
+
     def update_status(self, message):
         # Update status in the GUI from a different thread
         self.master.after(0, self._update_status_thread, message)
 
+    def show_progress(self, progress):
+        # Update the progress bar from a different thread
+        self.master.after(0, self._show_progress_thread, progress)
+
+    def _show_progress_thread(self, progress):
+        self.progress_bar['value'] = progress['fraction']
+        self.eta_label.config(text=metrics.describe_progress(progress))
+
     def _update_status_thread(self, message):
         # Actual status update method
         self.progress_text.config(state=tk.NORMAL)
@@ -1,21 +1,76 @@
 import os
-import torch
-import whisper
+import json
+import time
 from pathlib import Path
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import multiprocessing
-import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, scrolledtext, ttk
+except ImportError:
+    # Headless nodes without Tk can still use the transcriber and the CLI
+    tk = None
+import audio
+import batched
+import metrics
+import models
+import pcm
+import probe
+import quantize
+import streaming
+import vad
+
+# Whisper model owned by the current worker process (set once by _init_worker)
+_worker_model = None
+
+def _init_worker(model_size, device, shared_model=None, threads=None, quantized=False):
+    """
+    Process pool initializer: attach to or load the Whisper model once per worker
+
+    Args:
+        model_size (str): Whisper model size
+        device (str): Device the worker runs inference on
+        shared_model (whisper.Whisper, optional): CPU model whose weights were
+            moved to shared memory by the parent; only the storage handles are
+            pickled, so every worker maps the same read-only pages
+        threads (int, optional): torch intra-op threads for this worker, so
+            the pool as a whole does not oversubscribe the CPU
+        quantized (bool): Load the cached int8 CPU model instead
+    """
+    global _worker_model
+    import torch
+    import whisper
+    if threads:
+        torch.set_num_threads(threads)
+    if quantized:
+        _worker_model = quantize.load_quantized_model(model_size)
+    elif shared_model is not None:
+        shared_model.eval()
+        _worker_model = shared_model
+    else:
+        _worker_model = whisper.load_model(model_size, device=device)
 
 class EfficientWhisperTranscriber:
     def __init__(self):
-        # Detect GPU availability
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # GPU availability is detected on first use, so torch is only
+        # imported once a transcription starts
+        self._device = None
         self.num_cpus = multiprocessing.cpu_count()
-        print(f"Device: {self.device}")
+        # Predicted vs actual makespan of the last scheduled batch
+        self.schedule_report = None
         print(f"Available CPUs: {self.num_cpus}")
 
-    def transcribe_video(self, video_path, model, output_dir):
+    @property
+    def device(self):
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Device: {self._device}")
+        return self._device
+
+    def transcribe_video(self, video_path, model, output_dir, output_format='txt',
+                         encoder_batch_size=None, spans=None, use_vad=False, language='en'):
         """
         Transcribe a single video file
         
@@ -23,29 +78,246 @@ class EfficientWhisperTranscriber:
             video_path (str): Path to the video file
             model (whisper.Whisper): Loaded Whisper model
             output_dir (str): Directory to save transcription
+            output_format (str): Comma-separated formats: 'txt' for plain
+                text, 'json' for text plus timestamped segments, or the
+                streaming formats 'srt', 'vtt' and 'jsonl'
+            encoder_batch_size (int, optional): Decode the file's 30 s
+                windows in batches of this size instead of one at a time;
+                not used for the streaming formats
+            spans (metrics.FileSpans, optional): Receives the decode, mel,
+                encoder, decoder and write times
+            use_vad (bool): Transcribe only the speech regions (see vad.py);
+                not used for the streaming formats or encoder_batch_size
+            language (str, optional): Spoken language; None lets Whisper
+                detect it
         
         Returns:
-            dict: Transcription result with file details
+            dict: Transcription result with file details, including
+                'stages' (seconds per stage), 'audio_seconds' and, with
+                use_vad, 'vad' (speech and skipped seconds)
         """
+        vad_report = None
+        if spans is None:
+            spans = metrics.FileSpans(video_path)
         try:
             filename = os.path.basename(video_path)
             print(f"Transcribing: {filename}")
             
-            # Transcribe with GPU acceleration if available
-            result = model.transcribe(
-                video_path, 
-                fp16=torch.cuda.is_available(),  # Use half precision on GPU
-                language='en',  # Optional: specify language if known
-                verbose=False
-            )
-            
-            # Generate output filename
-            transcription_filename = os.path.splitext(filename)[0] + '_transcription.txt'
-            transcription_path = os.path.join(output_dir, transcription_filename)
+            formats = output_format.split(',')
+            if any(fmt in streaming.STREAMING_FORMATS for fmt in formats):
+                # Segments are written and flushed as they are decoded, so
+                # decode and write are not separable from inference here
+                with metrics.measure(model, spans):
+                    transcription_path = self.stream_transcription(
+                        video_path, model, output_dir, formats, language
+                    )
+            else:
+                with spans.stage('decode'):
+                    # Decoded once to the PCM cache; retries and reruns map it
+                    samples = pcm.load(video_path)
+                spans.audio_seconds = len(samples) / audio.SAMPLE_RATE
+
+                with metrics.measure(model, spans):
+                    if encoder_batch_size:
+                        # Encoder and decoder see several windows per forward pass
+                        _, result = next(batched.transcribe_batched(
+                            model, [(video_path, samples)],
+                            batch_size=encoder_batch_size, fp16=self.device == "cuda",
+                            language=language
+                        ))
+                    elif use_vad:
+                        # Whisper only sees the speech regions
+                        result, vad_report = vad.transcribe_speech(
+                            model, samples,
+                            fp16=self.device == "cuda",
+                            language=language,
+                            verbose=False
+                        )
+                    else:
+                        # Transcribe with GPU acceleration if available
+                        result = model.transcribe(
+                            samples, 
+                            fp16=self.device == "cuda",  # Use half precision on GPU
+                            language=language,  # None detects it from the first window
+                            verbose=False
+                        )
+                
+                # Write transcription to file
+                with spans.stage('write'):
+                    transcription_path = self.write_transcription(
+                        video_path, result, output_dir, output_format
+                    )
             
-            # Write transcription to file
-            with open(transcription_path, 'w', encoding='utf-8') as f:
-                f.write(result['text'])
+            return {
+                'input_file': video_path,
+                'output_file': transcription_path,
+                'success': True,
+                'error': None,
+                'stages': spans.stages,
+                'audio_seconds': spans.audio_seconds,
+                'vad': vad_report
+            }
+        
+        except Exception as e:
+            return {
+                'input_file': video_path,
+                'output_file': None,
+                'success': False,
+                'error': str(e),
+                'stages': spans.stages,
+                'audio_seconds': spans.audio_seconds
+            }
+
+    def transcription_base(self, video_path, output_dir):
+        """
+        Output path of a video's transcription, without the format extension
+        """
+        filename = os.path.basename(video_path)
+        return os.path.join(output_dir, os.path.splitext(filename)[0] + '_transcription')
+
+    def write_transcription(self, video_path, result, output_dir, output_format='txt'):
+        """
+        Write a transcript next to the others as <name>_transcription.<format>
+
+        Args:
+            video_path (str): Path to the video file
+            result (dict): Whisper result with 'text' and 'segments'
+            output_dir (str): Directory to save transcription
+            output_format (str): Comma-separated formats ('txt', 'json',
+                'srt', 'vtt', 'jsonl')
+
+        Returns:
+            str: Path of the first written transcription
+        """
+        base = self.transcription_base(video_path, output_dir)
+        paths = []
+        for fmt in output_format.split(','):
+            transcription_path = f"{base}.{fmt}"
+            if fmt in ('txt', 'json'):
+                with open(transcription_path, 'w', encoding='utf-8') as f:
+                    if fmt == 'json':
+                        json.dump({
+                            'text': result['text'],
+                            'language': result.get('language'),
+                            'segments': [
+                                {'start': seg['start'], 'end': seg['end'], 'text': seg['text']}
+                                for seg in result.get('segments', [])
+                            ]
+                        }, f, ensure_ascii=False)
+                    else:
+                        f.write(result['text'])
+            else:
+                sink = streaming.SINKS[fmt](transcription_path)
+                try:
+                    for segment in result.get('segments', []):
+                        sink.write(segment)
+                finally:
+                    sink.close()
+            paths.append(transcription_path)
+        return paths[0]
+
+    def stream_transcription(self, video_path, model, output_dir, formats, language='en'):
+        """
+        Transcribe window by window, writing each segment to every sink as it is decoded
+
+        Segments are not kept once written, so memory stays flat however long
+        the file is.
+
+        Returns:
+            str: Path of the first written transcription
+        """
+        sinks = streaming.open_sinks(self.transcription_base(video_path, output_dir), formats)
+        try:
+            for segment in streaming.stream_segments(
+                model, video_path,
+                fp16=self.device == "cuda",
+                language=language,
+                verbose=None
+            ):
+                for sink in sinks:
+                    sink.write(segment)
+        finally:
+            for sink in sinks:
+                sink.close()
+        return sinks[0].path
+
+    def transcribe_in_worker(self, video_path, output_dir, output_format='txt',
+                             encoder_batch_size=None, submitted_at=None, use_vad=False,
+                             language='en'):
+        """
+        Transcribe a video with the model owned by the current worker process
+
+        Only the path and output directory cross the process boundary; the
+        model was attached once by _init_worker. The result also carries the
+        seconds the worker spent on the file, and the time between
+        submitted_at (time.time() in the parent) and the worker picking the
+        file up as the 'queue_wait' stage.
+        """
+        start = time.perf_counter()
+        spans = metrics.FileSpans(video_path)
+        if submitted_at is not None:
+            spans.add('queue_wait', time.time() - submitted_at)
+        result = self.transcribe_video(
+            video_path, _worker_model, output_dir, output_format, encoder_batch_size, spans,
+            use_vad, language
+        )
+        result['processing_seconds'] = time.perf_counter() - start
+        return result
+
+    def transcribe_chunk_in_worker(self, pcm_path, start, end, offset, language='en'):
+        """
+        Transcribe one window of a long file with the worker's model
+
+        The window is read from the file's memory-mapped PCM, so only the
+        path and sample offsets cross the process boundary and all workers
+        share the decoded pages.
+
+        Args:
+            pcm_path (str): Raw float32 PCM written by pcm.decode_to_pcm
+            start (int): First sample of the window
+            end (int): Sample after the last one
+            offset (float): Window start on the file's timeline, in seconds
+            language (str, optional): Spoken language; None lets Whisper
+                detect it in this window
+
+        Returns:
+            list: Segments on the file's timeline
+        """
+        result = _worker_model.transcribe(
+            pcm.pcm_slice(pcm_path, start, end),
+            fp16=self.device == "cuda",
+            language=language,
+            verbose=None
+        )
+        return audio.shift_segments(result['segments'], offset)
+
+    def stitch_chunks(self, video_path, chunk_futures, output_dir, output_format='txt',
+                      language='en'):
+        """
+        Wait for every window of a file, merge them and write the transcript
+
+        Args:
+            video_path (str): Path to the video file
+            chunk_futures (list): (chunk, future) pairs for the file's windows
+            output_dir (str): Directory to save transcription
+            output_format (str): 'txt' or 'json'
+            language (str, optional): Language the windows were transcribed
+                in, recorded in the transcript
+
+        Returns:
+            dict: Transcription result with file details
+        """
+        try:
+            chunk_segments = [(chunk, future.result()) for chunk, future in chunk_futures]
+            segments = audio.stitch_segments(chunk_segments)
+            result = {
+                'text': ''.join(segment['text'] for segment in segments),
+                'language': language,
+                'segments': segments
+            }
+            transcription_path = self.write_transcription(
+                video_path, result, output_dir, output_format
+            )
             
             return {
                 'input_file': video_path,
@@ -62,56 +334,120 @@ class EfficientWhisperTranscriber:
                 'error': str(e)
             }
 
-    def batch_transcribe(self, video_files, model_size='base', max_workers=None):
+    def transcribe_chunked(self, video_files, executor, output_dir,
+                           chunk_seconds, output_format='txt', max_files_in_flight=2,
+                           language='en'):
         """
-        Batch transcribe multiple video files in parallel
-        
+        Fan the silence-cut windows of each file out across the worker pool
+
+        Files are decoded one at a time in the parent, straight to the
+        memory-mapped PCM cache, while workers are busy with the previous
+        file's windows; workers receive sample offsets into the mapped file.
+        At most max_files_in_flight files have windows waiting on workers.
+
         Args:
             video_files (list): List of video file paths
-            model_size (str): Whisper model size
-            max_workers (int, optional): Number of parallel processes
-        
-        Returns:
-            list: Transcription results
+            executor (ProcessPoolExecutor): Pool created by worker_pool
+            output_dir (str): Directory to save transcriptions
+            chunk_seconds (float): Nominal window length
+            output_format (str): 'txt' or 'json'
+            max_files_in_flight (int): Decoded files allowed to wait on workers
+            language (str, optional): Spoken language; None lets Whisper
+                detect it in each window
+
+        Yields:
+            dict: Transcription result with file details, in input order
         """
-        # Determine number of workers
-        if max_workers is None:
-            max_workers = min(self.num_cpus, len(video_files))
-        
-        # Load model on specified device
-        print(f"Loading {model_size} model on {self.device}")
-        model = whisper.load_model(model_size).to(self.device)
-        
-        # Create output directory
-        output_dir = os.path.join(os.path.dirname(video_files[0]), 'transcriptions')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Parallel processing
-        results = []
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Submit transcription jobs
-            futures = {
-                executor.submit(self.transcribe_video, video, model, output_dir): video 
-                for video in video_files
-            }
+        in_flight = deque()
+        for video in video_files:
+            try:
+                header = pcm.decode_to_pcm(video)
+                samples = pcm.open_pcm(header['pcm'])
+                chunks = audio.plan_chunks(samples, chunk_seconds=chunk_seconds)
+                print(f"Split {os.path.basename(video)} into {len(chunks)} chunks")
+                sr = header['sample_rate']
+                chunk_futures = [
+                    (chunk, executor.submit(
+                        self.transcribe_chunk_in_worker,
+                        header['pcm'],
+                        int(chunk['start'] * sr),
+                        int(chunk['end'] * sr),
+                        chunk['start'],
+                        language
+                    ))
+                    for chunk in chunks
+                ]
+            except Exception as e:
+                yield {
+                    'input_file': video,
+                    'output_file': None,
+                    'success': False,
+                    'error': str(e)
+                }
+                continue
             
-            # Collect results
-            for future in as_completed(futures):
-                result = future.result()
-                results.append(result)
-                
-                # Print individual results
-                if result['success']:
-                    print(f"Successfully transcribed: {result['input_file']}")
-                else:
-                    print(f"Failed to transcribe: {result['input_file']} - {result['error']}")
+            in_flight.append((video, chunk_futures))
+            if len(in_flight) >= max_files_in_flight:
+                yield self.stitch_chunks(*in_flight.popleft(), output_dir, output_format, language)
         
-        return results
+        while in_flight:
+            yield self.stitch_chunks(*in_flight.popleft(), output_dir, output_format, language)
+
+    def worker_pool(self, model_size, max_workers, threads_per_worker=None, quantized=False,
+                    device=None):
+        """
+        Create a process pool whose workers each hold the model exactly once
+
+        On CPU the parent's model comes from the model registry, so it is
+        read from disk once and reused by later pools and the sequential
+        strategy; its weights are moved to shared memory, so workers attach
+        to the same pages instead of keeping private copies. On GPU each
+        worker loads its own copy on the device. A quantized pool is
+        quantized once into the on-disk cache and every worker loads the
+        (4x smaller) int8 model from there.
+
+        Args:
+            model_size (str): Whisper model size
+            max_workers (int): Number of worker processes
+            threads_per_worker (int, optional): torch threads in each worker
+            quantized (bool): Use the int8 CPU model
+            device (str, optional): Run the workers on this device instead
+                of self.device
+
+        Returns:
+            ProcessPoolExecutor: Executor with the model initializer installed
+        """
+        import torch
+
+        device = device or self.device
+        shared_model = None
+        if quantized:
+            print(f"Preparing int8 {model_size} model")
+            quantize.load_quantized_model(model_size)
+        elif device == "cpu":
+            print(f"Loading {model_size} model into shared memory")
+            shared_model = models.default_registry().get(model_size, "cpu")
+            shared_model.share_memory()
+        else:
+            print(f"Loading {model_size} model on {device} in each worker")
+
+        # spawn keeps CUDA usable in workers; torch's reducers pass shared
+        # storages as file descriptors rather than pickling the tensors
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=torch.multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_size, device, shared_model, threads_per_worker, quantized)
+        )
 
 class WhisperTranscriptionApp:
     def __init__(self, master):
         self.master = master
-        self.transcriber = EfficientWhisperTranscriber()
+        # engine builds on this module's transcriber, so it is imported here
+        from engine import TranscriptionEngine
+        self.engine = TranscriptionEngine()
+        self.transcriber = self.engine.transcriber
+        self.recommended = probe.load_recommendation() or {}
         
         master.title("Efficient Whisper Transcription")
         master.geometry("700x600")
@@ -127,9 +463,9 @@ class WhisperTranscriptionApp:
         self.selected_files_text.pack(side=tk.TOP, fill=tk.X)
         self.selected_files_text.config(state=tk.DISABLED)
 
-        # Device Information
+        # Device Information (the device is detected when transcription starts)
         self.device_label = tk.Label(master, 
-            text=f"Device: {self.transcriber.device}, CPUs: {self.transcriber.num_cpus}", 
+            text=f"CPUs: {self.transcriber.num_cpus}", 
             fg="blue"
         )
         self.device_label.pack(padx=10)
@@ -140,7 +476,8 @@ class WhisperTranscriptionApp:
 
         # Model Selection
         tk.Label(self.config_frame, text="Whisper Model:").pack(side=tk.LEFT)
-        self.model_var = tk.StringVar(value="base")
+        # Defaults to the size and int8 setting test.py recommended for this machine
+        self.model_var = tk.StringVar(value=self.recommended.get('model', 'base'))
         self.model_dropdown = tk.OptionMenu(
             self.config_frame, 
             self.model_var, 
@@ -150,10 +487,35 @@ class WhisperTranscriptionApp:
 
         # Workers Selection
         tk.Label(self.config_frame, text="Parallel Workers:").pack(side=tk.LEFT)
-        self.workers_var = tk.StringVar(value=str(self.transcriber.num_cpus))
+        self.workers_var = tk.StringVar(value="auto")
         self.workers_entry = tk.Entry(self.config_frame, textvariable=self.workers_var, width=5)
         self.workers_entry.pack(side=tk.LEFT, padx=5)
 
+        # Execution strategy; "chunked" splits long videos across all workers
+        tk.Label(self.config_frame, text="Strategy:").pack(side=tk.LEFT)
+        self.strategy_var = tk.StringVar(value="auto")
+        tk.OptionMenu(
+            self.config_frame,
+            self.strategy_var,
+            "auto", "sequential", "threads", "processes", "chunked"
+        ).pack(side=tk.LEFT, padx=5)
+
+        # Int8 quantized inference (CPU only)
+        self.int8_var = tk.BooleanVar(value=self.recommended.get('quantized', False))
+        tk.Checkbutton(
+            self.config_frame,
+            text="Int8 (CPU)",
+            variable=self.int8_var
+        ).pack(side=tk.LEFT, padx=5)
+
+        # Skip silence and music before Whisper
+        self.vad_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            self.config_frame,
+            text="Skip silence",
+            variable=self.vad_var
+        ).pack(side=tk.LEFT, padx=5)
+
         # Buttons Frame
         self.buttons_frame = tk.Frame(master)
         self.buttons_frame.pack(padx=10, pady=10)
@@ -180,6 +542,12 @@ class WhisperTranscriptionApp:
         self.status_label = tk.Label(self.status_frame, text="Ready", fg="green")
         self.status_label.pack(side=tk.TOP, anchor='w')
 
+        # Progress bar and ETA, driven by the per-file stage metrics
+        self.progress_bar = ttk.Progressbar(self.status_frame, maximum=1.0)
+        self.progress_bar.pack(side=tk.TOP, fill=tk.X, pady=5)
+        self.eta_label = tk.Label(self.status_frame, text="")
+        self.eta_label.pack(side=tk.TOP, anchor='w')
+
         self.progress_text = scrolledtext.ScrolledText(
             self.status_frame, 
             height=10, 
@@ -223,6 +591,8 @@ class WhisperTranscriptionApp:
         self.progress_text.config(state=tk.NORMAL)
         self.progress_text.delete(1.0, tk.END)
         self.progress_text.config(state=tk.DISABLED)
+        self.progress_bar['value'] = 0
+        self.eta_label.config(text="")
         
         # Start transcription in a separate thread
         import threading
@@ -232,18 +602,28 @@ class WhisperTranscriptionApp:
         try:
             # Get model and workers from UI
             model_size = self.model_var.get()
-            workers = int(self.workers_var.get())
+            workers_text = self.workers_var.get().strip().lower()
+            workers = None if workers_text in ("", "auto") else int(workers_text)
 
             # Update status
             self.update_status(f"Starting transcription with {model_size} model")
-            self.update_status(f"Using {workers} parallel workers")
+            self.update_status(f"Using {workers or 'autotuned'} parallel workers")
+            device_text = f"Device: {self.transcriber.device}, CPUs: {self.transcriber.num_cpus}"
+            self.master.after(0, lambda: self.device_label.config(text=device_text))
             
             # Perform transcription
-            results = self.transcriber.batch_transcribe(
+            results = self.engine.run(
                 self.video_files, 
                 model_size=model_size, 
-                max_workers=workers
+                strategy=self.strategy_var.get(),
+                max_workers=workers,
+                quantized=self.int8_var.get(),
+                on_progress=self.show_progress,
+                use_vad=self.vad_var.get()
             )
+            if self.engine.plan is not None:
+                self.update_status(f"Strategy: {self.engine.plan['strategy']} "
+                                   f"({self.engine.plan['reason']})")
             
             # Summarize results
             successful = sum(1 for r in results if r['success'])
@@ -263,6 +643,14 @@ class WhisperTranscriptionApp:
         # Thread-safe status update
         self.master.after(0, self._update_status_thread, message)
 
+    def show_progress(self, progress):
+        # Thread-safe progress bar update
+        self.master.after(0, self._show_progress_thread, progress)
+
+    def _show_progress_thread(self, progress):
+        self.progress_bar['value'] = progress['fraction']
+        self.eta_label.config(text=metrics.describe_progress(progress))
+
     def _update_status_thread(self, message):
         # Actual status update method
         self.progress_text.config(state=tk.NORMAL)
@@ -277,6 +665,8 @@ class WhisperTranscriptionApp:
         self.status_label.config(text="Ready", fg="green")
 
 def main():
+    if tk is None:
+        raise SystemExit("tkinter is not available; use 'python -m transcribe' instead")
     root = tk.Tk()
     app = WhisperTranscriptionApp(root)
     root.mainloop()
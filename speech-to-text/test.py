@@ -1,37 +1,86 @@
+"""
+Probe this machine and recommend a transcription config
+
+Prints the CPU (cores, SIMD extensions), RAM, torch thread settings and any
+CUDA devices, times a 30 s encoder pass per model size and saves the
+recommended model size, workers, threads per worker and int8 setting for the
+apps to read at startup (see probe.py).
+
+Usage:
+    python test.py
+    python test.py --models tiny base small medium --target-rtf 0.5 --no-save
+"""
+import argparse
+import json
 import sys
 import torch
-import whisper
+import probe
 
 def check_gpu_setup():
+    """
+    Print the hardware probe and return it
+    """
     print("Python Version:", sys.version)
-    
+    hardware = probe.probe_hardware()
+
+    # CPU Information
+    print("\n--- CPU Information ---")
+    print("CPU:", hardware['cpu'], f"({hardware['arch']})")
+    print("Cores: usable", hardware['usable_cores'], "logical", hardware['logical_cores'],
+          "physical", hardware['physical_cores'])
+    print("SIMD:", " ".join(hardware['simd']) or "unknown")
+    print("Int8 Dot Product:", hardware['int8_dot_product'])
+    print(f"Memory: {hardware['memory_available_mb']} MB available of {hardware['memory_total_mb']} MB")
+
+    # torch Threading
+    print("\n--- torch Threads ---")
+    print("torch Version:", hardware['torch'])
+    print("Intra-op Threads:", hardware['torch_threads'])
+    print("Inter-op Threads:", hardware['torch_interop_threads'])
+    print("CPU Capability:", hardware['torch_cpu_capability'])
+    print("oneDNN (MKL-DNN):", hardware['mkldnn'])
+    for name, value in hardware['thread_env'].items():
+        print(f"{name}={value}")
+
     # CUDA Information
     print("\n--- CUDA Information ---")
     print("CUDA Available:", torch.cuda.is_available())
     print("CUDA Version:", torch.version.cuda)
     print("cuDNN Version:", torch.backends.cudnn.version())
     print("CUDA Device Count:", torch.cuda.device_count())
-    
+
     # GPU Details
-    if torch.cuda.is_available():
-        print("\n--- GPU Details ---")
-        for i in range(torch.cuda.device_count()):
-            print(f"GPU {i}:")
-            print(f"  Name: {torch.cuda.get_device_name(i)}")
-            print(f"  Total Memory: {torch.cuda.get_device_properties(i).total_memory / 1e9:.2f} GB")
-    
-    # Whisper Model GPU Test
-    try:
-        print("\n--- Whisper GPU Test ---")
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print("Selected Device:", device)
-        
-        # Load small model to test GPU
-        model = whisper.load_model("tiny").to(device)
-        print("Whisper Model Successfully Loaded to GPU")
-    
-    except Exception as e:
-        print("Whisper GPU Test Failed:", str(e))
+    for i, gpu in enumerate(hardware['cuda']):
+        print(f"GPU {i}:")
+        print(f"  Name: {gpu['name']}")
+        print(f"  Total Memory: {gpu['memory_mb'] / 1024:.2f} GB")
+
+    return hardware
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Probe this machine and recommend a transcription config.')
+    parser.add_argument('--models', nargs='+', default=['tiny', 'base', 'small'],
+                        choices=['tiny', 'base', 'small', 'medium', 'large'],
+                        help='Model sizes to benchmark (default: tiny base small)')
+    parser.add_argument('--target-rtf', type=float, default=0.25,
+                        help='Processing seconds per audio second the batch should reach (default: 0.25)')
+    parser.add_argument('--passes', type=int, default=2, help='Timed encoder passes per setting')
+    parser.add_argument('--no-int8', action='store_true', help='Do not benchmark int8 models')
+    parser.add_argument('--no-save', action='store_true', help='Print the recommendation only')
+    args = parser.parse_args(argv)
+
+    hardware = check_gpu_setup()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    print(f"\n--- Encoder Benchmark ({device}) ---")
+    timings = probe.benchmark(args.models, device, passes=args.passes, int8=not args.no_int8)
+    recommended = probe.recommend(hardware, timings, device, target_rtf=args.target_rtf)
+
+    print("\n--- Recommended Config ---")
+    print(json.dumps(recommended, indent=2))
+    if not args.no_save:
+        path = probe.save_recommendation(hardware, timings, recommended)
+        print(f"Saved to {path}")
 
 if __name__ == "__main__":
-    check_gpu_setup()
\ No newline at end of file
+    main()
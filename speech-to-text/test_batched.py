@@ -0,0 +1,62 @@
+import unittest
+
+from batched import TIME_PRECISION, tokens_to_segments
+
+class StubTokenizer:
+    """
+    Text tokens below eot, special tokens from eot, timestamps from
+    timestamp_begin; decode spells out the text token ids
+    """
+    eot = 100
+    timestamp_begin = 200
+
+    def decode(self, tokens):
+        return ''.join(f" w{token}" for token in tokens)
+
+TOKENIZER = StubTokenizer()
+
+def ts(seconds):
+    return TOKENIZER.timestamp_begin + round(seconds / TIME_PRECISION)
+
+def spans(segments):
+    return [(round(s['start'], 6), round(s['end'], 6), s['text']) for s in segments]
+
+class TestTokensToSegments(unittest.TestCase):
+    def segments(self, tokens, offset=60.0, window_seconds=30.0):
+        return spans(tokens_to_segments(TOKENIZER, tokens, offset, window_seconds))
+
+    def test_pairs_on_the_file_timeline(self):
+        tokens = [ts(0.0), 1, 2, ts(2.5), ts(2.5), 3, ts(4.0), TOKENIZER.eot]
+        self.assertEqual(self.segments(tokens), [
+            (60.0, 62.5, ' w1 w2'), (62.5, 64.0, ' w3')
+        ])
+
+    def test_special_tokens_are_not_text(self):
+        tokens = [TOKENIZER.eot + 1, ts(1.0), 1, TOKENIZER.eot + 2, ts(2.0)]
+        self.assertEqual(self.segments(tokens), [(61.0, 62.0, ' w1')])
+
+    def test_unpaired_timestamp_starts_the_next_segment(self):
+        # A timestamp with no text after it is replaced by the next one
+        tokens = [ts(0.0), ts(1.0), 1, ts(3.0)]
+        self.assertEqual(self.segments(tokens), [(61.0, 63.0, ' w1')])
+
+    def test_trailing_timestamp_adds_nothing(self):
+        tokens = [ts(0.0), 1, ts(2.0), ts(2.0), TOKENIZER.eot]
+        self.assertEqual(self.segments(tokens), [(60.0, 62.0, ' w1')])
+
+    def test_unclosed_text_runs_to_window_end(self):
+        tokens = [ts(0.0), 1, ts(2.0), ts(2.0), 2, 3]
+        self.assertEqual(self.segments(tokens, window_seconds=12.5), [
+            (60.0, 62.0, ' w1'), (62.0, 72.5, ' w2 w3')
+        ])
+
+    def test_text_without_timestamps_spans_the_window(self):
+        self.assertEqual(self.segments([1, 2], offset=0.0), [(0.0, 30.0, ' w1 w2')])
+
+    def test_empty_decode(self):
+        self.assertEqual(self.segments([]), [])
+        self.assertEqual(self.segments([TOKENIZER.eot]), [])
+        self.assertEqual(self.segments([ts(0.0), ts(0.0), TOKENIZER.eot]), [])
+
+if __name__ == '__main__':
+    unittest.main()
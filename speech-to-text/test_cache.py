@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from cache import TranscriptionCache
+
+class TestTranscriptionCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.cache = TranscriptionCache(os.path.join(self.dir, 'out'))
+        self.addCleanup(self.cache.close)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def transcribe(self, video, formats=('txt',), **options):
+        """
+        Record a finished job for video, with one transcript per format
+        """
+        key = self.cache.job_key(video, 'base', 'en', **options)
+        base = self.base(video)
+        for fmt in formats:
+            self.write(f"{base}.{fmt}", f"{fmt} of {os.path.basename(video)}")
+        self.cache.mark_running(key, video)
+        self.cache.mark_done(key, video, f"{base}.{formats[0]}")
+        return key
+
+    def base(self, video):
+        return os.path.join(self.dir, 'out', os.path.splitext(os.path.basename(video))[0])
+
+    def test_hit(self):
+        video = self.write('a.mp4', 'audio')
+        key = self.transcribe(video)
+        self.assertEqual(self.cache.job_key(video, 'base', 'en'), key)
+        self.assertEqual(self.cache.lookup(key, self.base(video)), self.base(video) + '.txt')
+
+    def test_miss(self):
+        video = self.write('a.mp4', 'audio')
+        key = self.cache.job_key(video, 'base', 'en')
+        self.assertIsNone(self.cache.lookup(key))
+        # Running and failed jobs are not hits
+        self.cache.mark_running(key, video)
+        self.assertIsNone(self.cache.lookup(key))
+        self.cache.mark_failed(key, video, 'boom')
+        self.assertIsNone(self.cache.lookup(key))
+
+    def test_missing_output_is_a_miss(self):
+        video = self.write('a.mp4', 'audio')
+        key = self.transcribe(video)
+        os.unlink(self.base(video) + '.txt')
+        self.assertIsNone(self.cache.lookup(key))
+
+    def test_settings_and_content_change_key(self):
+        video = self.write('a.mp4', 'audio')
+        key = self.transcribe(video, fp16=False)
+        self.assertNotEqual(self.cache.job_key(video, 'small', 'en', fp16=False), key)
+        self.assertNotEqual(self.cache.job_key(video, 'base', None, fp16=False), key)
+        self.assertNotEqual(self.cache.job_key(video, 'base', 'en', fp16=True), key)
+        self.write('a.mp4', 'other audio')
+        self.assertNotEqual(self.cache.job_key(video, 'base', 'en', fp16=False), key)
+
+    def test_copy_hit_writes_outputs_under_its_own_name(self):
+        original = self.write('a.mp4', 'audio')
+        self.transcribe(original, formats=('srt', 'txt'))
+        copy = self.write('b.mp4', 'audio')
+        key = self.cache.job_key(copy, 'base', 'en')
+
+        output = self.cache.lookup(key, self.base(copy), ['srt', 'txt'])
+        self.assertEqual(output, self.base(copy) + '.srt')
+        for fmt in ('srt', 'txt'):
+            with open(f"{self.base(copy)}.{fmt}") as f:
+                self.assertEqual(f.read(), f"{fmt} of a.mp4")
+        # Without an output path the cached file itself is returned
+        self.assertEqual(self.cache.lookup(key), self.base(original) + '.srt')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+
+import numpy as np
+
+import audio
+from stt_parallel import EfficientWhisperTranscriber
+
+SR = 1000
+
+def noise_with_silences(seconds, silences):
+    """
+    Loud noise with exact silence over each (start, end) in seconds
+    """
+    samples = np.random.default_rng(0).uniform(0.2, 0.5, int(seconds * SR)).astype(np.float32)
+    for start, end in silences:
+        samples[int(start * SR):int(end * SR)] = 0.0
+    return samples
+
+def chunk(index, keep_start, keep_end, overlap=2.0, duration=60.0):
+    return {'index': index, 'start': max(keep_start - overlap, 0.0),
+            'end': min(keep_end + overlap, duration),
+            'keep_start': keep_start, 'keep_end': keep_end}
+
+def segment(start, end, text):
+    return {'start': start, 'end': end, 'text': text}
+
+def spans(segments):
+    return [(s['start'], s['end'], s['text']) for s in segments]
+
+class TestPlanChunks(unittest.TestCase):
+    def plan(self, samples, **kwargs):
+        return audio.plan_chunks(samples, chunk_seconds=30, overlap_seconds=2.0, search_seconds=5.0,
+                                 sr=SR, **kwargs)
+
+    def test_single_chunk(self):
+        chunks = self.plan(noise_with_silences(40, []))
+        self.assertEqual(chunks, [{'index': 0, 'start': 0.0, 'end': 40.0,
+                                   'keep_start': 0.0, 'keep_end': 40.0}])
+
+    def test_cuts_snap_to_silence(self):
+        chunks = self.plan(noise_with_silences(100, [(28.0, 28.2), (61.0, 61.2)]))
+        self.assertEqual(len(chunks), 3)
+        first_cut, second_cut = chunks[0]['keep_end'], chunks[1]['keep_end']
+        self.assertTrue(28.0 <= first_cut <= 28.2, first_cut)
+        self.assertTrue(61.0 <= second_cut <= 61.2, second_cut)
+        # Owned ranges tile the file; windows reach overlap_seconds past each cut
+        self.assertEqual([c['keep_start'] for c in chunks], [0.0, first_cut, second_cut])
+        self.assertEqual(chunks[-1]['keep_end'], 100.0)
+        self.assertAlmostEqual(chunks[1]['start'], first_cut - 2.0)
+        self.assertAlmostEqual(chunks[1]['end'], second_cut + 2.0)
+
+    def test_last_short_chunk(self):
+        # 19 s remain after the second cut: more than half a chunk, so it is
+        # its own chunk, and its window is clamped to the end of the file
+        chunks = self.plan(noise_with_silences(80, [(28.0, 28.2), (61.0, 61.2)]))
+        last = chunks[-1]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual((last['keep_end'], last['end']), (80.0, 80.0))
+        self.assertAlmostEqual(last['start'], last['keep_start'] - 2.0)
+
+    def test_short_tail_joins_last_chunk(self):
+        # 12 s past the second nominal cut is less than half a chunk, so the
+        # last chunk runs to the end instead of leaving a 12 s one
+        chunks = self.plan(noise_with_silences(70, [(28.0, 28.2)]))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[-1]['keep_end'], 70.0)
+        self.assertGreater(chunks[-1]['keep_end'] - chunks[-1]['keep_start'], 30)
+
+class TestStitchSegments(unittest.TestCase):
+    def test_segment_straddling_the_overlap_is_kept_once(self):
+        first, second = chunk(0, 0.0, 30.0), chunk(1, 30.0, 60.0)
+        stitched = audio.stitch_segments([
+            # Second window listed first: stitching follows chunk order
+            (second, [segment(28.0, 31.0, ' straddle'), segment(31.0, 32.0, ' tail'),
+                      segment(40.0, 59.0, ' end')]),
+            (first, [segment(0.0, 10.0, ' start'), segment(27.0, 31.0, ' straddle'),
+                     segment(31.0, 32.0, ' tail')])
+        ])
+        self.assertEqual(spans(stitched), [
+            (0.0, 10.0, ' start'), (27.0, 31.0, ' straddle'), (31.0, 32.0, ' tail'),
+            (40.0, 59.0, ' end')
+        ])
+        self.assertEqual([s['id'] for s in stitched], [0, 1, 2, 3])
+
+    def test_repeat_timed_differently_across_the_cut_is_dropped(self):
+        # Midpoints fall on both sides of the cut, so both are owned
+        stitched = audio.stitch_segments([
+            (chunk(0, 0.0, 30.0), [segment(28.0, 30.2, ' Same words.')]),
+            (chunk(1, 30.0, 60.0), [segment(29.9, 31.0, 'Same words. '),
+                                    segment(31.0, 35.0, ' Next.')])
+        ])
+        self.assertEqual(spans(stitched), [(28.0, 30.2, ' Same words.'), (31.0, 35.0, ' Next.')])
+
+    def test_last_chunk_keeps_segments_past_its_end(self):
+        stitched = audio.stitch_segments([
+            (chunk(0, 0.0, 30.0), [segment(29.0, 33.0, ' dropped')]),
+            (chunk(1, 30.0, 60.0), [segment(59.0, 61.5, ' last')])
+        ])
+        self.assertEqual(spans(stitched), [(59.0, 61.5, ' last')])
+
+    def test_single_chunk(self):
+        only = chunk(0, 0.0, 40.0, duration=40.0)
+        stitched = audio.stitch_segments([
+            (only, [segment(5.0, 9.0, ' b'), segment(0.0, 5.0, ' a'), segment(39.0, 41.0, ' c')])
+        ])
+        self.assertEqual(spans(stitched), [(0.0, 5.0, ' a'), (5.0, 9.0, ' b'), (39.0, 41.0, ' c')])
+        self.assertEqual(audio.stitch_segments([]), [])
+
+    def test_shift_segments(self):
+        shifted = audio.shift_segments([segment(1.0, 2.5, ' x')], 28.0)
+        self.assertEqual(spans(shifted), [(29.0, 30.5, ' x')])
+
+class TestStitchChunks(unittest.TestCase):
+    def test_windows_written_as_one_transcript(self):
+        transcriber = EfficientWhisperTranscriber()
+        first, second = chunk(0, 0.0, 30.0), chunk(1, 30.0, 60.0)
+        windows = [
+            (first, [segment(0.0, 10.0, ' Hello'), segment(29.0, 31.0, ' there')]),
+            (second, [segment(29.0, 31.0, ' there'), segment(31.0, 40.0, ' friend.')])
+        ]
+        chunk_futures = []
+        for planned, segments in windows:
+            future = Future()
+            future.set_result(audio.shift_segments(segments, 0.0))
+            chunk_futures.append((planned, future))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = transcriber.stitch_chunks(
+                '/videos/talk.mp4', chunk_futures, output_dir, 'json', language=None
+            )
+            self.assertTrue(result['success'], result['error'])
+            self.assertEqual(result['output_file'], os.path.join(output_dir, 'talk_transcription.json'))
+            with open(result['output_file'], encoding='utf-8') as f:
+                written = json.load(f)
+        self.assertEqual(written['text'], ' Hello there friend.')
+        self.assertIsNone(written['language'])
+        self.assertEqual(spans(written['segments']), [
+            (0.0, 10.0, ' Hello'), (29.0, 31.0, ' there'), (31.0, 40.0, ' friend.')
+        ])
+
+    def test_failed_window_fails_the_file(self):
+        future = Future()
+        future.set_exception(RuntimeError("worker died"))
+        with tempfile.TemporaryDirectory() as output_dir:
+            result = EfficientWhisperTranscriber().stitch_chunks(
+                '/videos/talk.mp4', [(chunk(0, 0.0, 30.0), future)], output_dir
+            )
+        self.assertEqual((result['success'], result['error']), (False, "worker died"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import engine
+from cache import MANIFEST_NAME
+from stt_parallel import EfficientWhisperTranscriber
+
+HOST = {'cores': 8, 'memory_mb': 32000}
+
+class TestChooseStrategy(unittest.TestCase):
+    def choose(self, durations, model_size='base', **kwargs):
+        return engine.choose_strategy(durations, model_size, **dict(HOST, **kwargs))
+
+    def test_gpu_runs_one_model(self):
+        plan = self.choose([60] * 10, device='cuda')
+        self.assertEqual((plan['strategy'], plan['workers']), ('sequential', 1))
+
+    def test_one_worker_host_is_sequential(self):
+        self.assertEqual(self.choose([600] * 10, 'large', memory_mb=8000)['strategy'], 'sequential')
+        self.assertEqual(self.choose([600] * 10, cores=1)['strategy'], 'sequential')
+
+    def test_long_file_is_chunked(self):
+        self.assertEqual(self.choose([3600])['strategy'], 'chunked')
+        self.assertEqual(self.choose([4 * 3600, 600, 600])['strategy'], 'chunked')
+
+    def test_single_short_file_is_sequential(self):
+        self.assertEqual(self.choose([120])['strategy'], 'sequential')
+
+    def test_short_batch_uses_threads(self):
+        plan = self.choose([60] * 3, 'small')
+        self.assertEqual(plan['strategy'], 'threads')
+        self.assertLessEqual(plan['workers'], engine.MAX_THREAD_WORKERS)
+
+    def test_large_batch_uses_processes(self):
+        plan = self.choose([600] * 20)
+        self.assertEqual(plan['strategy'], 'processes')
+        self.assertGreater(plan['workers'], 1)
+        self.assertLessEqual(plan['workers'] * plan['threads_per_worker'], HOST['cores'])
+
+    def test_unknown_durations_count_as_average(self):
+        self.assertEqual(
+            self.choose([600] * 19 + [None])['strategy'], self.choose([600] * 20)['strategy']
+        )
+
+    def test_saved_layout_changes_the_auto_choice(self):
+        calibrated = {'workers': 2, 'threads_per_worker': 4, 'cores': 8, 'memory_mb': 32000,
+                      'model': 'base', 'source': 'calibrated'}
+        with mock.patch.object(engine.autotune, 'load_config', return_value=calibrated), \
+                mock.patch.object(engine.autotune, 'available_memory_mb', return_value=32000):
+            plan = engine.choose_strategy([600] * 20, 'base')
+            self.assertEqual((plan['strategy'], plan['workers'], plan['threads_per_worker']),
+                             ('processes', 2, 4))
+            self.assertEqual(plan['layout_source'], 'calibrated')
+
+            calibrated.update(workers=1, threads_per_worker=8)
+            self.assertEqual(engine.choose_strategy([600] * 20, 'base')['strategy'], 'sequential')
+        # Without a saved layout the heuristic runs four base workers on eight cores
+        self.assertEqual(self.choose([600] * 20)['workers'], 4)
+        self.assertEqual(self.choose([600] * 20)['layout_source'], 'heuristic')
+
+class StubTranscriber:
+    device = 'cpu'
+    num_cpus = 4
+    transcription_base = EfficientWhisperTranscriber.transcription_base
+
+class StubExecutor(engine.Executor):
+    """
+    Writes each file's name as its transcript; files named fail* fail and a
+    file named crash* makes the executor raise
+    """
+    name = 'sequential'
+    calls = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args)
+
+    def run(self, files, output_dir, output_format='txt', encoder_batch_size=None,
+            use_vad=False, language='en'):
+        StubExecutor.calls.append((list(files), language))
+        for video in files:
+            name = os.path.splitext(os.path.basename(video))[0]
+            if name.startswith('crash'):
+                raise RuntimeError("executor crashed")
+            if name.startswith('fail'):
+                yield engine._result(video, error="decode failed")
+                continue
+            path = self.transcriber.transcription_base(video, output_dir) + '.txt'
+            with open(path, 'w') as f:
+                f.write(name)
+            yield engine._result(video, path)
+
+class TestRun(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.output_dir = os.path.join(self.dir, 'transcriptions')
+        StubExecutor.calls = []
+        for patch in (
+            mock.patch.dict(engine.EXECUTORS, {'sequential': StubExecutor}),
+            mock.patch.object(engine, 'probe_durations', lambda paths: {p: 60.0 for p in paths})
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.engine = engine.TranscriptionEngine(StubTranscriber())
+
+    def video(self, name, content=None):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(content if content is not None else name)
+        return path
+
+    def output(self, name):
+        return os.path.join(self.output_dir, name + '_transcription.txt')
+
+    def run_engine(self, videos, **kwargs):
+        reported = []
+        results = self.engine.run(
+            videos, strategy='sequential', output_dir=self.output_dir,
+            on_result=reported.append, **kwargs
+        )
+        self.assertEqual(reported, results)
+        return results
+
+    def statuses(self):
+        conn = sqlite3.connect(os.path.join(self.output_dir, MANIFEST_NAME))
+        try:
+            return dict(conn.execute("SELECT input_file, status FROM jobs"))
+        finally:
+            conn.close()
+
+    def test_results_reported_and_recorded(self):
+        videos = [self.video('a.mp4'), self.video('fail.mp4')]
+        results = {r['input_file']: r for r in self.run_engine(videos)}
+        self.assertTrue(results[videos[0]]['success'])
+        self.assertEqual(results[videos[0]]['output_file'], self.output('a'))
+        self.assertFalse(results[videos[1]]['success'])
+        self.assertEqual(results[videos[1]]['error'], "decode failed")
+        self.assertEqual(self.statuses(), {videos[0]: 'done', videos[1]: 'failed'})
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'metrics.jsonl')))
+
+    def test_rerun_skips_cached_and_retries_failed(self):
+        videos = [self.video('a.mp4'), self.video('fail.mp4')]
+        self.run_engine(videos)
+        results = {r['input_file']: r for r in self.run_engine(videos)}
+        self.assertEqual(StubExecutor.calls[-1][0], [videos[1]])
+        self.assertTrue(results[videos[0]]['cached'])
+        self.assertEqual(results[videos[0]]['output_file'], self.output('a'))
+        self.assertNotIn('cached', results[videos[1]])
+
+    def test_copy_of_transcribed_file_gets_its_own_output(self):
+        original = self.video('a.mp4', 'same audio')
+        self.run_engine([original])
+        copy = self.video('b.mp4', 'same audio')
+        result, = self.run_engine([copy])
+        self.assertEqual(StubExecutor.calls, [([original], 'en')])
+        self.assertTrue(result['cached'])
+        self.assertEqual(result['output_file'], self.output('b'))
+        with open(self.output('b')) as f:
+            self.assertEqual(f.read(), 'a')
+
+    def test_changed_settings_rerun(self):
+        video = self.video('a.mp4')
+        self.run_engine([video])
+        self.run_engine([video], language=None)
+        self.assertEqual(StubExecutor.calls, [([video], 'en'), ([video], None)])
+
+    def test_executor_error_fails_pending_jobs(self):
+        videos = [self.video('a.mp4'), self.video('crash.mp4'), self.video('b.mp4')]
+        with self.assertRaises(RuntimeError):
+            self.run_engine(videos)
+        self.assertEqual(
+            self.statuses(), {videos[0]: 'done', videos[1]: 'failed', videos[2]: 'failed'}
+        )
+
+class StubBatcher:
+    """
+    Completes files two at a time, taking BATCH_SECONDS per batch
+    """
+    BATCH_SECONDS = 0.05
+
+    def __init__(self, model, batch_size=8, language='en', fp16=False):
+        self.queue = []
+
+    def add(self, key, samples):
+        self.queue.append(key)
+        if len(self.queue) == 2:
+            yield from self.flush()
+
+    def flush(self):
+        if self.queue:
+            time.sleep(self.BATCH_SECONDS)
+        for key in self.queue:
+            yield key, {'text': os.path.basename(key), 'segments': [], 'language': 'en'}
+        self.queue = []
+
+class WritingTranscriber(StubTranscriber):
+    write_transcription = EfficientWhisperTranscriber.write_transcription
+
+class TestSequentialBatched(unittest.TestCase):
+    def test_results_carry_processing_seconds(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patch in (
+            mock.patch.object(engine, 'WindowBatcher', StubBatcher),
+            mock.patch.object(engine.pcm, 'load', lambda path: np.zeros(16000, np.float32)),
+            mock.patch.object(engine.SequentialExecutor, 'load_model', lambda self: None)
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        executor = engine.SequentialExecutor(WritingTranscriber(), 'base')
+        files = [os.path.join(tmp.name, f'{name}.mp4') for name in 'abc']
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = list(executor.run(files, tmp.name, encoder_batch_size=2))
+
+        self.assertEqual([r['input_file'] for r in results], files)
+        self.assertTrue(all(r['success'] for r in results))
+        # a and b share the batch run when b is added; c runs in the flush
+        processing = [r['processing_seconds'] for r in results]
+        self.assertLess(processing[0], StubBatcher.BATCH_SECONDS)
+        self.assertGreaterEqual(processing[1], StubBatcher.BATCH_SECONDS)
+        self.assertGreaterEqual(processing[2], StubBatcher.BATCH_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import os
+import re
+import tempfile
+import unittest
+
+import metrics
+
+METRIC_NAME = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*$')
+# name{label="value"} number, with \\, \" and \n the only escapes in a value
+SAMPLE = re.compile(r'^([^{ ]+)(?:\{(\w+)="((?:[^"\\\n]|\\[\\"n])*)"\})? (\S+)$')
+
+def parse(text):
+    """
+    (types, samples) of a Prometheus text-format snapshot, where types maps
+    metric name to its TYPE and samples are (name, labels, value)
+    """
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif line.startswith('# HELP '):
+            continue
+        else:
+            match = SAMPLE.match(line)
+            assert match, line
+            name, label, value, number = match.groups()
+            # Every sample follows its metric's TYPE line
+            assert name in types, name
+            samples.append((name, {label: value} if label else {}, float(number)))
+    return types, samples
+
+class TestPrometheusText(unittest.TestCase):
+    def setUp(self):
+        self.exporter = metrics.MetricsExporter(None, total_files=2, total_audio_seconds=100.0, workers=2)
+        self.exporter.record('/in/a.mp4', {'queue_wait': 3.0, 'decode': 1.0, 'encoder': 4.0},
+                             audio_seconds=50.0)
+
+    def test_names_and_types(self):
+        types, samples = parse(self.exporter.prometheus_text())
+        self.assertTrue(all(METRIC_NAME.match(name) for name in types))
+        self.assertEqual(types, {
+            'transcription_stage_seconds_total': 'counter',
+            'transcription_files_total': 'counter',
+            'transcription_audio_seconds_total': 'counter',
+            'transcription_processing_seconds_total': 'counter',
+            'transcription_real_time_factor': 'gauge',
+            'transcription_progress_ratio': 'gauge',
+            'transcription_eta_seconds': 'gauge',
+        })
+        values = {(name, tuple(labels.items())): value for name, labels, value in samples}
+        self.assertEqual(values[('transcription_stage_seconds_total', (('stage', 'encoder'),))], 4.0)
+        self.assertEqual(values[('transcription_stage_seconds_total', (('stage', 'mel'),))], 0.0)
+        self.assertEqual(values[('transcription_files_total', (('status', 'success'),))], 1)
+        self.assertEqual(values[('transcription_files_total', (('status', 'failed'),))], 0)
+        # Queue wait is not processing time
+        self.assertEqual(values[('transcription_processing_seconds_total', ())], 5.0)
+        self.assertEqual(values[('transcription_real_time_factor', ())], 0.1)
+        self.assertEqual(values[('transcription_progress_ratio', ())], 0.5)
+        # 50 s of audio left at RTF 0.1 on two workers
+        self.assertEqual(values[('transcription_eta_seconds', ())], 2.5)
+
+    def test_untimed_gauges_are_left_out(self):
+        types, _ = parse(metrics.MetricsExporter(None, total_files=1).prometheus_text())
+        self.assertNotIn('transcription_real_time_factor', types)
+        self.assertNotIn('transcription_eta_seconds', types)
+
+    def test_label_values_are_escaped(self):
+        self.exporter.record('/in/b.mp4', {'odd "stage"\\\nname': 1.5}, audio_seconds=10.0)
+        text = self.exporter.prometheus_text()
+        self.assertIn('transcription_stage_seconds_total{stage="odd \\"stage\\"\\\\\\nname"} 1.500000\n',
+                      text)
+        _, samples = parse(text)
+        self.assertIn(('transcription_stage_seconds_total', {'stage': 'odd \\"stage\\"\\\\\\nname'}, 1.5),
+                      samples)
+
+    def test_snapshot_written(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            exporter = metrics.MetricsExporter(output_dir, total_files=1)
+            record = exporter.record('/in/a.mp4', {'decode': 2.0}, audio_seconds=4.0, success=False,
+                                     error=RuntimeError("boom"))
+            with open(os.path.join(output_dir, 'metrics.prom'), encoding='utf-8') as f:
+                self.assertEqual(f.read(), exporter.prometheus_text())
+            with open(os.path.join(output_dir, 'metrics.jsonl'), encoding='utf-8') as f:
+                self.assertEqual([json.loads(line) for line in f], [record])
+        self.assertEqual((record['error'], record['rtf']), ("boom", 0.5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import contextlib
+import io
+import multiprocessing
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+import models
+from stt_parallel import EfficientWhisperTranscriber
+
+class StubLoader:
+    """
+    Loader returning a label per key; keys in `block` wait for release
+    """
+
+    def __init__(self, block=()):
+        self.calls = []
+        self.block = set(block)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, model_size, device, precision):
+        self.calls.append(model_size)
+        if model_size in self.block:
+            self.started.set()
+            self.release.wait(10)
+        return f"{model_size}/{device}/{precision}"
+
+class TestModelRegistry(unittest.TestCase):
+    def registry(self, budget_mb, loader=None):
+        self.loader = loader or StubLoader()
+        registry = models.ModelRegistry(budget_mb, loader=self.loader)
+        self.addCleanup(registry.executor.shutdown)
+        return registry
+
+    def test_loaded_once_per_key(self):
+        registry = self.registry(10000)
+        self.assertEqual(registry.get('base', 'cpu'), 'base/cpu/fp32')
+        self.assertEqual(registry.get('base', 'cpu'), 'base/cpu/fp32')
+        # int8 always runs on the CPU
+        self.assertEqual(registry.get('base', 'cuda', 'int8'), 'base/cpu/int8')
+        self.assertEqual(self.loader.calls, ['base', 'base'])
+        self.assertEqual(registry.loaded(), [('base', 'cpu', 'fp32'), ('base', 'cpu', 'int8')])
+
+    def test_least_recently_used_evicted_over_budget(self):
+        # tiny 150 + base 290 fit; adding small (970) needs 1410
+        registry = self.registry(1200)
+        registry.get('tiny', 'cpu')
+        registry.get('base', 'cpu')
+        registry.get('tiny', 'cpu')
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            registry.get('small', 'cpu')
+        self.assertEqual(registry.loaded(), [('tiny', 'cpu', 'fp32'), ('small', 'cpu', 'fp32')])
+        self.assertEqual(out.getvalue(), "Evicted base (fp32, cpu) from the model cache\n")
+
+        # Evicted models are loaded again on the next use
+        with contextlib.redirect_stdout(io.StringIO()):
+            registry.get('base', 'cpu')
+        self.assertEqual(self.loader.calls, ['tiny', 'base', 'small', 'base'])
+
+    def test_int8_footprint(self):
+        self.assertEqual(models.footprint_mb('small', 'int8'), 970 * 0.3)
+        registry = self.registry(600)
+        registry.get('tiny', 'cpu')
+        registry.get('small', 'cpu', 'int8')
+        self.assertEqual(len(registry.loaded()), 2)
+
+    def test_latest_model_kept_over_budget(self):
+        registry = self.registry(100)
+        with contextlib.redirect_stdout(io.StringIO()):
+            registry.get('tiny', 'cpu')
+            registry.get('small', 'cpu')
+        self.assertEqual(registry.loaded(), [('small', 'cpu', 'fp32')])
+
+    def test_preload_drops_a_waiting_preload(self):
+        registry = self.registry(10000, StubLoader(block={'tiny'}))
+        running = registry.preload('tiny', 'cpu')
+        self.assertTrue(self.loader.started.wait(10))
+        waiting = registry.preload('base', 'cpu')
+        latest = registry.preload('small', 'cpu')
+        self.loader.release.set()
+
+        self.assertEqual(latest.result(10), 'small/cpu/fp32')
+        self.assertTrue(waiting.cancelled())
+        # A load already in progress is not interrupted
+        self.assertEqual(running.result(10), 'tiny/cpu/fp32')
+        self.assertEqual(self.loader.calls, ['tiny', 'small'])
+
+    def test_preload_then_get_shares_the_load(self):
+        registry = self.registry(10000)
+        future = registry.preload('base', 'cpu')
+        self.assertEqual(registry.get('base', 'cpu'), future.result(10))
+        self.assertEqual(self.loader.calls, ['base'])
+
+    def test_set_default_registry(self):
+        registry = self.registry(10000)
+        previous = models.set_default_registry(registry)
+        self.addCleanup(models.set_default_registry, previous)
+        self.assertIs(models.default_registry(), registry)
+        self.assertIs(models.set_default_registry(previous), registry)
+
+class StubModel:
+    def __init__(self):
+        self.shared = 0
+
+    def share_memory(self):
+        self.shared += 1
+
+class TestWorkerPool(unittest.TestCase):
+    def test_cpu_pool_reuses_the_registry_model(self):
+        loads = []
+        registry = models.ModelRegistry(10000, loader=lambda *key: loads.append(key) or StubModel())
+        self.addCleanup(registry.executor.shutdown)
+        previous = models.set_default_registry(registry)
+        self.addCleanup(models.set_default_registry, previous)
+        # worker_pool only needs torch for its multiprocessing context; the
+        # pools never start a worker here
+        fake_torch = types.SimpleNamespace(multiprocessing=types.SimpleNamespace(
+            get_context=lambda method: multiprocessing.get_context('fork')
+        ))
+        with mock.patch.dict(sys.modules, {'torch': fake_torch}), \
+                contextlib.redirect_stdout(io.StringIO()):
+            transcriber = EfficientWhisperTranscriber()
+            pools = [transcriber.worker_pool('base', 2, device='cpu') for _ in range(2)]
+        for pool in pools:
+            self.addCleanup(pool.shutdown)
+
+        model = registry.get('base', 'cpu')
+        self.assertEqual(loads, [('base', 'cpu', 'fp32')])
+        self.assertTrue(all(pool._initargs[2] is model for pool in pools))
+        self.assertEqual(model.shared, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+import probe
+
+HARDWARE = {'usable_cores': 8, 'memory_available_mb': 32000}
+
+def timings(fp32, int8=None):
+    """
+    Encoder seconds per window at 1..8 threads, scaling linearly
+    """
+    def by_threads(seconds):
+        return {str(t): seconds / t for t in (1, 2, 4, 8)}
+    result = {'fp32': by_threads(fp32)}
+    if int8 is not None:
+        result['int8'] = by_threads(int8)
+    return result
+
+class TestRecommend(unittest.TestCase):
+    def test_largest_size_within_target(self):
+        measured = {'tiny': timings(0.4), 'base': timings(1.0), 'small': timings(4.0)}
+        config = probe.recommend(HARDWARE, measured, target_rtf=0.01)
+        self.assertEqual(config['model'], 'base')
+        self.assertLessEqual(config['estimated_rtf'], 0.01)
+        self.assertLessEqual(config['workers'] * config['threads_per_worker'], 8)
+
+    def test_fastest_size_when_none_reaches_target(self):
+        measured = {'tiny': timings(0.4), 'base': timings(1.0)}
+        self.assertEqual(probe.recommend(HARDWARE, measured, target_rtf=1e-6)['model'], 'tiny')
+
+    def test_int8_only_when_clearly_faster(self):
+        self.assertTrue(probe.recommend(HARDWARE, {'base': timings(1.0, 0.5)})['quantized'])
+        self.assertFalse(probe.recommend(HARDWARE, {'base': timings(1.0, 0.95)})['quantized'])
+
+    def test_memory_limits_workers(self):
+        config = probe.recommend(
+            {'usable_cores': 8, 'memory_available_mb': 6000}, {'medium': timings(8.0)}
+        )
+        self.assertEqual(config['workers'], 1)
+
+    def test_gpu_runs_one_worker(self):
+        config = probe.recommend(HARDWARE, {'small': {'fp16': {'0': 0.05}}}, device='cuda')
+        self.assertEqual((config['workers'], config['quantized']), (1, False))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+import scheduler
+from scheduler import DurationScheduler, simulate_makespan
+
+DURATIONS = {'a.mp4': 10.0, 'b.mp4': 40.0, 'c.mp4': 30.0, 'd.mp4': 20.0}
+
+def make_scheduler(durations=DURATIONS, workers=2, rtf=0.5):
+    return DurationScheduler(list(durations), workers, rtf=rtf, durations=durations)
+
+class TestSimulateMakespan(unittest.TestCase):
+    def test_longest_first_beats_submission_order(self):
+        self.assertEqual(simulate_makespan([10, 10, 30], 2), 40)
+        self.assertEqual(simulate_makespan([30, 10, 10], 2), 30)
+
+    def test_workers(self):
+        self.assertEqual(simulate_makespan([5, 5, 5], 1), 15)
+        self.assertEqual(simulate_makespan([5, 5, 5], 0), 15)
+        self.assertEqual(simulate_makespan([5, 5, 5], 8), 5)
+
+class TestDurationScheduler(unittest.TestCase):
+    def test_longest_first(self):
+        self.assertEqual(make_scheduler().order, ['b.mp4', 'c.mp4', 'd.mp4', 'a.mp4'])
+
+    def test_unknown_duration_scheduled_as_average(self):
+        durations = dict(DURATIONS, **{'e.mp4': None})
+        schedule = make_scheduler(durations)
+        self.assertEqual(schedule.duration('e.mp4'), 25.0)
+        self.assertEqual(schedule.order, ['b.mp4', 'c.mp4', 'e.mp4', 'd.mp4', 'a.mp4'])
+        self.assertEqual(schedule.total_audio, 125.0)
+
+    def test_predicted_makespan(self):
+        schedule = make_scheduler()
+        # Costs 20, 15, 10, 5 on two workers: 20 + 5 and 15 + 10
+        self.assertEqual(schedule.predicted_makespan(), 25.0)
+        self.assertEqual(schedule.predicted_makespan(rtf=1.0), 50.0)
+        self.assertEqual(make_scheduler(workers=1).predicted_makespan(), 50.0)
+
+    def test_prior_rtf_by_model(self):
+        schedule = DurationScheduler(list(DURATIONS), 2, model_size='small', durations=DURATIONS)
+        self.assertEqual(schedule.rtf, scheduler.DEFAULT_RTF['small'])
+        schedule = DurationScheduler(list(DURATIONS), 2, model_size='custom', durations=DURATIONS)
+        self.assertEqual(schedule.rtf, 1.0)
+
+    def test_eta_uses_measured_rtf(self):
+        schedule = make_scheduler()
+        progress = schedule.file_finished('b.mp4', 30.0)
+        self.assertEqual(progress['file_rtf'], 0.75)
+        self.assertEqual(progress['batch_rtf'], 0.75)
+        self.assertEqual((progress['audio_done'], progress['audio_total']), (40.0, 100.0))
+        # Costs 22.5, 15, 7.5 left on two workers
+        self.assertEqual(progress['eta_seconds'], 22.5)
+
+        schedule.file_finished('c.mp4', 10.0)
+        self.assertEqual(schedule.rtf, 40.0 / 70.0)
+        schedule.file_finished('d.mp4', 10.0)
+        progress = schedule.file_finished('a.mp4', 10.0)
+        self.assertEqual(progress['eta_seconds'], 0.0)
+        self.assertEqual(progress['batch_rtf'], 0.6)
+
+    def test_file_without_duration_keeps_the_prior(self):
+        schedule = make_scheduler({'x.mp4': None})
+        progress = schedule.file_finished('x.mp4', 3.0)
+        self.assertIsNone(progress['file_rtf'])
+        self.assertEqual(progress['batch_rtf'], 0.5)
+
+    def test_report(self):
+        schedule = make_scheduler()
+        with mock.patch.object(scheduler.time, 'time', side_effect=[1000.0, 1040.0]):
+            schedule.start()
+            for path in schedule.order:
+                schedule.file_finished(path, DURATIONS[path])
+            report = schedule.report()
+        self.assertEqual(report, {
+            'files': 4, 'workers': 2, 'audio_seconds': 100.0,
+            'predicted_makespan': 25.0, 'predicted_makespan_measured_rtf': 50.0,
+            'actual_makespan': 40.0, 'rtf': 1.0
+        })
+
+    def test_report_before_start(self):
+        report = make_scheduler().report()
+        self.assertEqual(report['predicted_makespan'], 25.0)
+        self.assertIsNone(report['actual_makespan'])
+
+if __name__ == '__main__':
+    unittest.main()
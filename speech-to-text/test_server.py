@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import metrics
+import server
+
+SEGMENTS = [
+    {'start': 0.0, 'end': 2.5, 'text': ' Hello there.'},
+    {'start': 2.5, 'end': 4.1234, 'text': ' General "Kenobi".'}
+]
+
+class StubModel:
+    device = 'cpu'
+
+class FlakyPool(server.ModelPool):
+    """
+    Loads StubModels after raising on the first `failures` loads
+    """
+
+    def __init__(self, failures=0, copies=1):
+        super().__init__(copies)
+        self.failures = failures
+        self.attempts = 0
+
+    def _load(self, model_size):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise MemoryError("out of memory")
+        return StubModel()
+
+class TestModelPool(unittest.TestCase):
+    def test_failed_load_is_retried(self):
+        pool = FlakyPool(failures=1)
+
+        async def scenario():
+            with self.assertRaises(MemoryError):
+                await pool.acquire('base')
+            return await pool.acquire('base')
+
+        self.assertIsInstance(asyncio.run(scenario()), StubModel)
+        self.assertEqual(pool.attempts, 2)
+
+    def test_concurrent_requests_share_one_load(self):
+        pool = FlakyPool(copies=2)
+
+        async def scenario():
+            return await asyncio.gather(pool.acquire('base'), pool.acquire('base'))
+
+        first, second = asyncio.run(scenario())
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.attempts, 2)
+
+def parse_response(raw):
+    """
+    (status, headers, body) of an HTTP/1.1 response; chunked bodies are
+    decoded and must end with the terminating chunk
+    """
+    head, _, body = raw.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') != 'chunked':
+        return status, headers, body
+    decoded = b''
+    while True:
+        size_line, _, body = body.partition(b'\r\n')
+        size = int(size_line, 16)
+        if size == 0:
+            assert body == b'\r\n', "missing terminating chunk"
+            return status, headers, decoded
+        decoded += body[:size]
+        assert body[size:size + 2] == b'\r\n'
+        body = body[size + 2:]
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media = os.path.join(tmp.name, 'talk.mp4')
+        open(self.media, 'wb').close()
+        # Unexpected errors are logged with a traceback; keep test output clean
+        patch = mock.patch.object(server.traceback, 'print_exc')
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    async def start(self, transcription_server):
+        listener = await asyncio.start_server(transcription_server.handle, '127.0.0.1', 0)
+        return listener, listener.sockets[0].getsockname()[1]
+
+    async def post(self, port, path=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        body = json.dumps({'path': path or self.media}).encode('utf-8')
+        writer.write(
+            b"POST /transcribe?model=base HTTP/1.1\r\nHost: localhost\r\n"
+            b"Content-Type: application/json\r\n"
+            + f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), 10)
+        writer.close()
+        return parse_response(raw)
+
+    def transcribe(self, stream_segments, pool=None):
+        transcription_server = self.server = server.TranscriptionServer(pool or FlakyPool())
+
+        async def scenario():
+            listener, port = await self.start(transcription_server)
+            async with listener:
+                return await self.post(port)
+
+        with mock.patch.object(server.streaming, 'stream_segments', stream_segments):
+            status, headers, body = asyncio.run(scenario())
+        events = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        return status, headers, events
+
+    def test_ndjson_stream(self):
+        def stream_segments(model, path, **options):
+            # Stands in for the encoder/decoder hooks metrics.measure installs
+            metrics._active.spans.add('decoder', 1.5)
+            return iter(SEGMENTS)
+
+        status, headers, events = self.transcribe(stream_segments)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['content-type'], 'application/x-ndjson')
+        self.assertEqual([e['event'] for e in events], ['queued', 'started', 'segment', 'segment', 'done'])
+        self.assertEqual(events[0], {'event': 'queued', 'model': 'base', 'position': 1})
+        self.assertEqual(events[2], {'event': 'segment', 'start': 0.0, 'end': 2.5, 'text': 'Hello there.'})
+        self.assertEqual(events[3]['end'], 4.123)
+        self.assertEqual(events[3]['text'], 'General "Kenobi".')
+        self.assertEqual(events[4]['audio_seconds'], 4.123)
+        # Recorded under the CLI's stage names
+        totals = self.server.metrics.stage_totals
+        self.assertEqual(set(totals), set(metrics.STAGES))
+        self.assertEqual(totals['decoder'], 1.5)
+        self.assertGreater(totals['queue_wait'], 0.0)
+
+    def test_decode_error_ends_stream(self):
+        def stream_segments(model, path, **options):
+            yield SEGMENTS[0]
+            raise RuntimeError("ffmpeg failed")
+
+        status, _, events = self.transcribe(stream_segments)
+        self.assertEqual(status, 200)
+        self.assertEqual([e['event'] for e in events], ['queued', 'started', 'segment', 'error'])
+        self.assertEqual(events[-1]['error'], "ffmpeg failed")
+
+    def test_error_after_stream_started_ends_stream(self):
+        # The model fails to load once the stream is already open
+        status, _, events = self.transcribe(lambda model, path, **options: iter(SEGMENTS),
+                                            pool=FlakyPool(failures=1))
+        self.assertEqual(status, 200)
+        self.assertEqual([e['event'] for e in events], ['queued', 'error'])
+        self.assertEqual(events[-1]['error'], "out of memory")
+
+    def test_error_before_response_is_500(self):
+        pool = FlakyPool()
+        transcription_server = server.TranscriptionServer(pool)
+
+        async def scenario():
+            listener, port = await self.start(transcription_server)
+            async with listener:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b"GET /health HTTP/1.1\r\n\r\n")
+                raw = await asyncio.wait_for(reader.read(), 10)
+                writer.close()
+                return parse_response(raw)
+
+        with mock.patch.object(pool, 'status', side_effect=RuntimeError("broken")):
+            status, _, body = asyncio.run(scenario())
+        self.assertEqual(status, 500)
+        self.assertEqual(json.loads(body), {'error': 'broken'})
+
+    def test_queue_full_is_429(self):
+        transcription_server = server.TranscriptionServer(FlakyPool(), max_queue_depth=1)
+        decoding = threading.Event()
+        release = threading.Event()
+
+        def stream_segments(model, path, **options):
+            decoding.set()
+            release.wait(10)
+            return iter(SEGMENTS)
+
+        async def scenario():
+            listener, port = await self.start(transcription_server)
+            async with listener:
+                first = asyncio.ensure_future(self.post(port))
+                loop = asyncio.get_running_loop()
+                self.assertTrue(await loop.run_in_executor(None, decoding.wait, 10))
+                rejected = await self.post(port)
+                release.set()
+                return rejected, await first
+
+        with mock.patch.object(server.streaming, 'stream_segments', stream_segments):
+            (status, headers, body), (first_status, _, _) = asyncio.run(scenario())
+        self.assertEqual(status, 429)
+        self.assertEqual(headers['retry-after'], '5')
+        self.assertEqual(json.loads(body), {'error': 'queue full', 'max_queue_depth': 1})
+        self.assertEqual(first_status, 200)
+        self.assertEqual(transcription_server.accepted, 0)
+
+if __name__ == '__main__':
+    unittest.main()
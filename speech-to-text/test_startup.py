@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Startup budget for the GUI and CLI modules, in seconds
+IMPORT_BUDGET = 1.0
+HEAVY_MODULES = ('torch', 'whisper')
+
+def import_in_fresh_interpreter(module):
+    """
+    Import module in a new interpreter and return (seconds, heavy modules loaded)
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    return float(out[0]), out[1].split() if len(out) > 1 else []
+
+class TestStartup(unittest.TestCase):
+    def test_modules_import_without_torch_or_whisper(self):
+        for module in ('transcribe', 'engine', 'stt_parallel', 'cuda', 'stt'):
+            with self.subTest(module=module):
+                try:
+                    seconds, heavy = import_in_fresh_interpreter(module)
+                except subprocess.CalledProcessError as e:
+                    if 'tkinter' in e.stderr and module == 'stt':
+                        self.skipTest("tkinter is not installed")
+                    raise
+                self.assertEqual(heavy, [])
+                self.assertLess(seconds, IMPORT_BUDGET)
+
+    def test_cli_help_within_budget(self):
+        result = subprocess.run(
+            [sys.executable, '-m', 'transcribe', '--help'],
+            cwd=HERE, capture_output=True, text=True, timeout=IMPORT_BUDGET * 10
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertIn('--workers', result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()
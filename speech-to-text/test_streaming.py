@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import audio
+import streaming
+
+SEGMENTS = [
+    {'start': -0.01, 'end': 2.5, 'text': ' Hello there.'},
+    {'start': 3725.4996, 'end': 3727.0, 'text': ' "Café", she said. '}
+]
+
+GOLDEN = {
+    'txt': ' Hello there. "Café", she said. ',
+    'srt': (
+        "1\n00:00:00,000 --> 00:00:02,500\nHello there.\n\n"
+        "2\n01:02:05,500 --> 01:02:07,000\n\"Café\", she said.\n\n"
+    ),
+    'vtt': (
+        "WEBVTT\n\n"
+        "00:00:00.000 --> 00:00:02.500\nHello there.\n\n"
+        "01:02:05.500 --> 01:02:07.000\n\"Café\", she said.\n\n"
+    ),
+    'jsonl': (
+        '{"id": 0, "start": -0.01, "end": 2.5, "text": "Hello there."}\n'
+        '{"id": 1, "start": 3725.5, "end": 3727.0, "text": "\\"Café\\", she said."}\n'
+    )
+}
+
+class TestSinks(unittest.TestCase):
+    def test_golden_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, 'talk')
+            sinks = streaming.open_sinks(base, list(GOLDEN))
+            for sink in sinks:
+                for segment in SEGMENTS:
+                    sink.write(segment)
+                sink.close()
+            for fmt, expected in GOLDEN.items():
+                with open(f"{base}.{fmt}", encoding='utf-8') as f:
+                    self.assertEqual(f.read(), expected, fmt)
+
+    def test_written_segments_are_flushed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = streaming.VttSink(os.path.join(tmp, 'talk.vtt'))
+            self.addCleanup(sink.close)
+            sink.write(SEGMENTS[0])
+            with open(sink.path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), GOLDEN['vtt'].split('01:02')[0])
+
+    def test_format_timestamp(self):
+        self.assertEqual(streaming.format_timestamp(1.0016), '00:00:01,002')
+        self.assertEqual(streaming.format_timestamp(59.9999, '.'), '00:01:00.000')
+        self.assertEqual(streaming.format_timestamp(-3.0), '00:00:00,000')
+
+SR = audio.SAMPLE_RATE
+
+class StubModel:
+    """
+    Transcribes each window as one segment with the next scripted text
+    """
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.calls = []
+
+    def transcribe(self, samples, initial_prompt=None, **options):
+        self.calls.append((len(samples), initial_prompt, options))
+        text = self.texts.pop(0)
+        segments = [{'start': 0.1, 'end': len(samples) / SR - 0.1, 'text': text}] if text else []
+        return {'text': text, 'segments': segments}
+
+class TestStreamSegments(unittest.TestCase):
+    def setUp(self):
+        # 5 s of noise, silent at 1.60-1.64 s and 3.11-3.15 s, decoded in
+        # 2, 2 and 1 s blocks
+        samples = np.random.default_rng(0).uniform(0.2, 0.5, 5 * SR).astype(np.float32)
+        for start, end in ((1.60, 1.64), (3.11, 3.15)):
+            samples[int(start * SR):int(end * SR)] = 0.0
+        self.block_seconds = []
+
+        def stream_audio(path, block_seconds=30, sr=SR):
+            self.block_seconds.append(block_seconds)
+            for start in range(0, len(samples), 2 * SR):
+                yield samples[start:start + 2 * SR]
+
+        patch = mock.patch.object(streaming.audio, 'stream_audio', stream_audio)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_windows_cut_at_silence(self):
+        model = StubModel([' Part one.', '', ' Part three.'])
+        segments = list(streaming.stream_segments(
+            model, 'talk.mp4', window_seconds=2, search_seconds=0.5, prompt_chars=5, language='en'
+        ))
+        self.assertEqual(self.block_seconds, [2])
+
+        # Each window is cut inside the silence near its end; the rest is the tail
+        lengths = [length for length, _, _ in model.calls]
+        first_cut, second_cut = lengths[0] / SR, (lengths[0] + lengths[1]) / SR
+        self.assertTrue(1.60 <= first_cut <= 1.64, first_cut)
+        self.assertTrue(3.11 <= second_cut <= 3.15, second_cut)
+        self.assertEqual(sum(lengths), 5 * SR)
+        # An empty window leaves the previous prompt in place
+        self.assertEqual([prompt for _, prompt, _ in model.calls], [None, ' one.', ' one.'])
+        self.assertEqual([options for _, _, options in model.calls], [{'language': 'en'}] * 3)
+
+        # Segments are shifted onto the file's timeline
+        self.assertEqual([s['text'] for s in segments], [' Part one.', ' Part three.'])
+        self.assertAlmostEqual(segments[0]['start'], 0.1)
+        self.assertAlmostEqual(segments[0]['end'], first_cut - 0.1)
+        self.assertAlmostEqual(segments[1]['start'], second_cut + 0.1)
+        self.assertAlmostEqual(segments[1]['end'], 4.9)
+
+    def test_short_file_is_one_window(self):
+        model = StubModel([' All of it.'])
+        segments = list(streaming.stream_segments(model, 'talk.mp4', window_seconds=120))
+        self.assertEqual(self.block_seconds, [30])
+        self.assertEqual(model.calls, [(5 * SR, None, {})])
+        self.assertEqual([(s['start'], s['end']) for s in segments], [(0.1, 4.9)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# transcribe.main with the engine replaced by one that, like the real pools,
+# prints progress itself and from a spawned worker, then reports one result
+# per file
+STUB_RUN = """
+import multiprocessing, os, sys
+import transcribe
+
+class StubEngine:
+    def run(self, video_files, on_result=None, **kwargs):
+        print("Strategy: processes with 2 workers")
+        worker = multiprocessing.get_context('spawn').Process(
+            target=print, args=('Transcribing: worker output',))
+        worker.start()
+        worker.join()
+        os.write(1, b'native library output\\n')
+        results = []
+        for video in video_files:
+            result = {'input_file': video, 'output_file': video + '.txt',
+                      'success': True, 'error': None}
+            on_result(result)
+            results.append(result)
+        return results
+
+if __name__ == '__main__':
+    transcribe.TranscriptionEngine = StubEngine
+    code = transcribe.main(sys.argv[1:])
+    print('after the batch')
+    sys.exit(code)
+"""
+
+class TestResultsOnStdout(unittest.TestCase):
+    def test_stdout_carries_only_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            videos = [os.path.join(tmp, name) for name in ('a.mp4', 'b.mkv')]
+            for video in videos:
+                open(video, 'wb').close()
+            script = os.path.join(tmp, 'run_stub.py')
+            with open(script, 'w') as f:
+                f.write(STUB_RUN)
+
+            out = subprocess.run(
+                [sys.executable, script, tmp, '--results', '-', '-o', os.path.join(tmp, 'out')],
+                cwd=HERE, env=dict(os.environ, PYTHONPATH=HERE),
+                capture_output=True, text=True, check=True
+            )
+
+        lines = out.stdout.splitlines()
+        # Results first, then stdout is back to normal once main returns
+        self.assertEqual(lines[-1], 'after the batch')
+        results = [json.loads(line) for line in lines[:-1]]
+        self.assertEqual([r['input_file'] for r in results], videos)
+        for noise in ('Strategy:', 'Transcribing: worker output', 'native library output',
+                      'Transcribed 2 of 2 files'):
+            self.assertIn(noise, out.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import vad
+
+# Speech from 2 to 5 s, 8 to 10 s and 12.5 to 13 s of a 15 s file: gaps at
+# the start, in the middle and at the end
+REGIONS = [(2.0, 5.0), (8.0, 10.0), (12.5, 13.0)]
+GAP = 0.2
+
+class TestTimeMap(unittest.TestCase):
+    def setUp(self):
+        self.time_map = vad.TimeMap(REGIONS, GAP)
+        # Where each region starts on the compact timeline
+        self.starts = [compact_start for compact_start, _, _ in self.time_map.pieces]
+
+    def assertMaps(self, t, original):
+        self.assertAlmostEqual(self.time_map.to_original(t), original, places=9)
+
+    def test_layout(self):
+        self.assertEqual(self.time_map.pieces[0], (0.0, 2.0, 3.0))
+        self.assertAlmostEqual(self.starts[1], 3.0 + GAP)
+        self.assertAlmostEqual(self.starts[2], 5.0 + 2 * GAP)
+        self.assertAlmostEqual(self.time_map.compact_seconds, 5.5 + 2 * GAP)
+
+    def test_leading_gap(self):
+        # Compact time 0 is the first speech, not the start of the file
+        self.assertMaps(0.0, 2.0)
+        self.assertMaps(1.5, 3.5)
+        self.assertMaps(-1.0, 2.0)
+
+    def test_region_edges(self):
+        for (start, end), compact_start in zip(REGIONS, self.starts):
+            self.assertMaps(compact_start, start)
+            self.assertMaps(compact_start + (end - start), end)
+
+    def test_inside_regions(self):
+        self.assertMaps(self.starts[1] + 1.25, 9.25)
+        self.assertMaps(self.starts[2] + 0.1, 12.6)
+
+    def test_middle_gaps_map_to_the_previous_region_end(self):
+        self.assertMaps(3.0 + GAP / 2, 5.0)
+        self.assertMaps(self.starts[2] - 1e-9, 10.0)
+
+    def test_trailing_gap(self):
+        # Past the last speech (Whisper's last timestamp can overshoot)
+        self.assertMaps(self.time_map.compact_seconds + 1.0, 13.0)
+
+    def test_no_regions(self):
+        time_map = vad.TimeMap([], GAP)
+        self.assertEqual(time_map.compact_seconds, 0.0)
+        self.assertEqual(time_map.to_original(4.0), 4.0)
+
+class StubModel:
+    def __init__(self, segments):
+        self.segments = segments
+        self.heard = None
+
+    def transcribe(self, samples, **options):
+        self.heard = samples
+        return {'text': '', 'language': options.get('language'),
+                'segments': [dict(start=start, end=end, text='') for start, end in self.segments]}
+
+class TestTranscribeSpeech(unittest.TestCase):
+    def test_segments_on_original_timeline(self):
+        sr = 100
+        samples = np.arange(15 * sr, dtype=np.float32)
+        time_map = vad.TimeMap(REGIONS, GAP)
+        model = StubModel([(0.0, 3.0), (time_map.pieces[1][0], time_map.pieces[2][0] + 0.5)])
+        with mock.patch.object(vad, 'speech_regions', return_value=REGIONS):
+            result, report = vad.transcribe_speech(model, samples, sr=sr, language='en')
+
+        # Regions joined by GAP seconds of silence
+        self.assertEqual(len(model.heard), int(5.5 * sr) + 2 * int(GAP * sr))
+        self.assertEqual(model.heard[0], samples[2 * sr])
+        self.assertEqual(model.heard[3 * sr:3 * sr + int(GAP * sr)].tolist(), [0.0] * int(GAP * sr))
+        self.assertEqual([(s['start'], s['end']) for s in result['segments']],
+                         [(2.0, 5.0), (8.0, 13.0)])
+        self.assertEqual(report['speech_seconds'], 5.5)
+        self.assertEqual(report['skipped_seconds'], 9.5)
+        self.assertEqual(report['regions'], 3)
+
+    def test_no_speech_skips_the_model(self):
+        model = StubModel([])
+        with mock.patch.object(vad, 'speech_regions', return_value=[]):
+            result, report = vad.transcribe_speech(model, np.zeros(1600, np.float32), language='en')
+        self.assertIsNone(model.heard)
+        self.assertEqual(result, {'text': '', 'segments': [], 'language': 'en'})
+        self.assertEqual(report['skipped_ratio'], 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from stt_parallel import EfficientWhisperTranscriber
+from watch import JobQueue, WatchService
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.queue = JobQueue(os.path.join(tmp.name, 'jobs.sqlite3'), max_attempts=3,
+                              backoff_seconds=10.0, max_backoff_seconds=15.0)
+        self.addCleanup(self.queue.close)
+
+    def job(self, job_id):
+        return self.queue.conn.execute(
+            "SELECT status, attempts, next_attempt FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+    def test_enqueue_once_per_file_version(self):
+        self.assertTrue(self.queue.enqueue('/in/a.mp4', 100, 1))
+        self.assertFalse(self.queue.enqueue('/in/a.mp4', 100, 1))
+        # Replaced in place: a new job
+        self.assertTrue(self.queue.enqueue('/in/a.mp4', 200, 2))
+        self.assertEqual(self.queue.counts(), {'queued': 2})
+
+    def test_claim_oldest_first_up_to_limit(self):
+        for name in ('a', 'b', 'c'):
+            self.queue.enqueue(f'/in/{name}.mp4', 1, 1)
+        self.assertEqual(self.queue.claim(0), [])
+        claimed = self.queue.claim(2)
+        self.assertEqual([path for _, path in claimed], ['/in/a.mp4', '/in/b.mp4'])
+        self.assertEqual(self.queue.counts(), {'running': 2, 'queued': 1})
+        # Running jobs are not claimed again
+        self.assertEqual([path for _, path in self.queue.claim(5)], ['/in/c.mp4'])
+        self.assertEqual(self.queue.claim(5), [])
+
+    def test_fail_backs_off_then_dies(self):
+        self.queue.enqueue('/in/a.mp4', 1, 1)
+        (job_id, _), = self.queue.claim(1)
+
+        before = time.time()
+        self.assertEqual(self.queue.fail(job_id, 'boom'), 10.0)
+        status, attempts, next_attempt = self.job(job_id)
+        self.assertEqual((status, attempts), ('queued', 1))
+        self.assertGreaterEqual(next_attempt, before + 10.0)
+        # Not due yet
+        self.assertEqual(self.queue.claim(1), [])
+
+        # Doubled, then capped at max_backoff_seconds
+        self.assertEqual(self.queue.fail(job_id, 'boom'), 15.0)
+        self.assertIsNone(self.queue.fail(job_id, 'boom'))
+        self.assertEqual(self.job(job_id)[:2], ('dead', 3))
+        self.assertEqual(self.queue.counts(), {'dead': 1})
+
+    def test_recover_requeues_running_without_an_attempt(self):
+        for name in ('a', 'b'):
+            self.queue.enqueue(f'/in/{name}.mp4', 1, 1)
+        (first, _), (second, _) = self.queue.claim(2)
+        self.queue.complete(first, '/out/a.txt')
+        self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual(self.job(first)[0], 'done')
+        self.assertEqual(self.job(second)[:2], ('queued', 0))
+        self.assertEqual(self.queue.claim(1), [(second, '/in/b.mp4')])
+
+    def test_requeue_does_not_use_an_attempt(self):
+        self.queue.enqueue('/in/a.mp4', 1, 1)
+        (job_id, _), = self.queue.claim(1)
+        self.queue.requeue(job_id)
+        self.assertEqual(self.job(job_id)[:2], ('queued', 0))
+        self.assertEqual(self.queue.claim(1), [(job_id, '/in/a.mp4')])
+
+def crash_or_transcribe(path, output_dir, output_format, encoder_batch_size, submitted_at,
+                        use_vad):
+    """
+    Worker stand-in that kills its process on files named crash*
+    """
+    if os.path.basename(path).startswith('crash'):
+        os._exit(1)
+    return {'success': True, 'error': None, 'output_file': path + '.txt', 'stages': {},
+            'audio_seconds': 1.0}
+
+class TestWatchServiceCrashes(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.input_dir = tmp.name
+        patch = mock.patch.object(EfficientWhisperTranscriber, 'device', 'cpu')
+        patch.start()
+        self.addCleanup(patch.stop)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.service = WatchService(self.input_dir, os.path.join(tmp.name, 'out'), workers=1,
+                                        max_in_flight=2, max_attempts=3, backoff_seconds=0.0)
+        self.addCleanup(self.service.queue.close)
+        self.addCleanup(self.service.cache.close)
+        self.service.transcriber.worker_pool = lambda *args, **kwargs: ProcessPoolExecutor(1)
+        self.service.transcriber.transcribe_in_worker = crash_or_transcribe
+
+    def enqueue(self, name):
+        path = os.path.join(self.input_dir, name)
+        with open(path, 'w') as f:
+            f.write(name)
+        self.service.queue.enqueue(path, 1, 1)
+        return path
+
+    def drain(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.service.start_pool()
+            try:
+                for _ in range(20):
+                    self.service.submit_ready()
+                    self.service.collect(10)
+                    if not set(self.service.queue.counts()) & {'queued', 'running'}:
+                        break
+            finally:
+                self.service.executor.shutdown()
+        return dict(self.service.queue.conn.execute("SELECT path, status || ' ' || attempts FROM jobs"))
+
+    def test_job_that_kills_its_worker_goes_dead(self):
+        crash = self.enqueue('crash.mp4')
+        self.assertEqual(self.drain(), {crash: 'dead 3'})
+
+    def test_vad_setting_changes_the_job_key(self):
+        path = self.enqueue('talk.mp4')
+        key = self.service.job_key(path)
+        self.service.use_vad = True
+        self.assertNotEqual(self.service.job_key(path), key)
+
+    def test_jobs_in_flight_with_a_crash_are_not_charged(self):
+        crash = self.enqueue('crash.mp4')
+        good = self.enqueue('good.mp4')
+        self.assertEqual(self.drain(), {crash: 'dead 3', good: 'done 0'})
+        self.assertEqual(self.service.suspects, set())
+
+if __name__ == '__main__':
+    unittest.main()
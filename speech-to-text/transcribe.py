@@ -0,0 +1,155 @@
+"""
+Headless batch transcription
+
+Runs engine.TranscriptionEngine without the Tk GUI and writes one JSON line
+per file as soon as it finishes. torch and whisper are
+only imported once there is something to transcribe.
+
+Usage (from the speech-to-text directory):
+    python -m transcribe videos/ "more/*.mkv" --workers 4 --model small
+    python -m transcribe lecture.mp4 --chunk-seconds 300 --format json
+    python -m transcribe clips/ --strategy threads --workers 3
+    python -m transcribe long_stream.mkv --format srt,vtt,jsonl
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+
+import probe
+from engine import STRATEGIES, TranscriptionEngine
+
+MEDIA_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wav', '.mp3', '.m4a', '.flac']
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Resolve files, directories and glob patterns into a sorted list of media files
+
+    Args:
+        inputs (list): Paths, directories or glob patterns
+        recursive (bool): Descend into subdirectories of directory inputs
+
+    Returns:
+        list: Unique media file paths
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif os.path.isfile(item):
+            # Explicitly named files are taken whatever their extension
+            files.add(os.path.abspath(item))
+            continue
+        else:
+            candidates = glob.glob(item, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in MEDIA_EXTENSIONS:
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m transcribe',
+        description='Batch transcribe media files with Whisper, without the GUI.'
+    )
+    parser.add_argument('inputs', nargs='+', help='Media files, directories or glob patterns')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='Search directories recursively')
+    # Model size and int8 default to what test.py recommended for this machine
+    recommended = probe.load_recommendation() or {}
+    model = recommended.get('model', 'base')
+    parser.add_argument('-m', '--model', default=model,
+                        choices=['tiny', 'base', 'small', 'medium', 'large'],
+                        help=f'Whisper model size (default: {model})')
+    parser.add_argument('-s', '--strategy', default='auto', choices=('auto',) + STRATEGIES,
+                        help='How files are spread over the CPU/GPU; auto picks one from the '
+                             "batch's files and durations and the host's cores and RAM (default: auto)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Worker threads or processes (default: autotuned from cores, RAM and model size)')
+    parser.add_argument('-t', '--threads', type=int, default=None,
+                        help='torch threads per worker (default: autotuned)')
+    parser.add_argument('-f', '--format', dest='output_format', default='txt',
+                        help="Comma-separated transcription formats: txt, json, or srt, vtt, "
+                             "jsonl which are written segment by segment as they are decoded "
+                             "(default: txt)")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="Transcription directory (default: 'transcriptions' next to the first file)")
+    parser.add_argument('--int8', action=argparse.BooleanOptionalAction,
+                        default=recommended.get('quantized', False),
+                        help='Int8 dynamically quantized CPU inference (cached on disk after the first run)')
+    parser.add_argument('--chunk-seconds', type=float, default=None,
+                        help='Split files into windows of about this length and spread them over '
+                             'all workers (implies --strategy chunked with auto)')
+    parser.add_argument('--encoder-batch', type=int, default=None,
+                        help="Run each file's 30 s windows through the model in batches of this size")
+    parser.add_argument('--vad', action='store_true',
+                        help='Skip silence and non-speech audio before Whisper; results report the seconds skipped')
+    parser.add_argument('--results', default=None,
+                        help="JSONL results file, '-' for stdout (default: <output-dir>/results.jsonl)")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    for fmt in args.output_format.split(','):
+        if fmt not in ('txt', 'json', 'srt', 'vtt', 'jsonl'):
+            parser.error(f"unknown format: {fmt}")
+
+    video_files = expand_inputs(args.inputs, recursive=args.recursive)
+    if not video_files:
+        print("No media files found", file=sys.stderr)
+        return 2
+
+    output_dir = args.output_dir or os.path.join(os.path.dirname(video_files[0]), 'transcriptions')
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = args.results or os.path.join(output_dir, 'results.jsonl')
+
+    real_stdout = None
+    if results_path == '-':
+        # Results own fd 1; everything else written to it, by this process,
+        # the pool workers it spawns (which inherit the fd) or native
+        # libraries, is sent to stderr until the batch is done
+        sys.stdout.flush()
+        real_stdout = os.dup(1)
+        results_file = os.fdopen(os.dup(real_stdout), 'w', encoding='utf-8')
+        os.dup2(2, 1)
+    else:
+        results_file = open(results_path, 'a', encoding='utf-8')
+    try:
+        def write_result(result):
+            results_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+            results_file.flush()
+
+        # Progress messages go to stderr so stdout can carry JSONL results
+        with contextlib.redirect_stdout(sys.stderr):
+            engine = TranscriptionEngine()
+            results = engine.run(
+                video_files,
+                model_size=args.model,
+                strategy=args.strategy,
+                max_workers=args.workers,
+                chunk_seconds=args.chunk_seconds,
+                output_format=args.output_format,
+                output_dir=output_dir,
+                on_result=write_result,
+                threads_per_worker=args.threads,
+                quantized=args.int8,
+                encoder_batch_size=args.encoder_batch,
+                use_vad=args.vad
+            )
+    finally:
+        results_file.close()
+        if real_stdout is not None:
+            sys.stdout.flush()
+            os.dup2(real_stdout, 1)
+            os.close(real_stdout)
+
+    failed = sum(1 for r in results if not r['success'])
+    print(f"Transcribed {len(results) - failed} of {len(results)} files", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
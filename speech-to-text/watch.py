@@ -0,0 +1,464 @@
+"""
+Watch-folder transcription service
+
+Watches an input directory and transcribes every media file that lands in it
+with a warm EfficientWhisperTranscriber worker pool (the model is loaded once
+per worker for the life of the service).
+
+Discovered files go into a durable SQLite job table (jobs.sqlite3 in the
+output directory) before anything else happens, so:
+    - only max_in_flight jobs are submitted to the pool at a time; a burst of
+      uploads waits in the table, not in memory
+    - failed jobs are retried with exponential backoff, up to max_attempts
+    - jobs that were running when the service died are requeued on restart
+
+A file is enqueued once its size and mtime stop changing, so uploads still
+being copied in are not picked up half-written. With inotify_simple
+installed, filesystem events wake the scanner immediately; otherwise the
+directory is polled.
+
+Usage (from the speech-to-text directory):
+    python watch.py incoming/ --output-dir transcripts/ --model small --max-in-flight 4
+"""
+import argparse
+import os
+import signal
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import autotune
+import metrics
+from cache import TranscriptionCache
+from stt_parallel import EfficientWhisperTranscriber
+from transcribe import MEDIA_EXTENSIONS
+
+QUEUE_NAME = 'jobs.sqlite3'
+
+class JobQueue:
+    """
+    Durable job table for the watch service
+
+    Each (path, size, mtime) is one job, so a file replaced in place is
+    transcribed again. Status moves queued -> running -> done, or back to
+    queued with a later next_attempt after a failure, or to 'dead' once
+    max_attempts are used up.
+    """
+
+    def __init__(self, path, max_attempts=5, backoff_seconds=30.0, max_backoff_seconds=3600.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER, "
+                "status TEXT, attempts INTEGER DEFAULT 0, next_attempt REAL, "
+                "output_file TEXT, error TEXT, enqueued REAL, updated REAL, "
+                "UNIQUE (path, size, mtime_ns))"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt)"
+            )
+
+    def enqueue(self, path, size, mtime_ns):
+        """
+        Add a job unless this version of the file is already known
+
+        Returns:
+            bool: Whether a new job was added
+        """
+        now = time.time()
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (path, size, mtime_ns, status, next_attempt, enqueued, updated) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (path, size, mtime_ns, now, now, now)
+            )
+        return cursor.rowcount == 1
+
+    def recover(self):
+        """
+        Requeue jobs left 'running' by a previous process; returns how many
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'queued', next_attempt = ?, updated = ? "
+                "WHERE status = 'running'",
+                (time.time(), time.time())
+            )
+        return cursor.rowcount
+
+    def requeue(self, job_id):
+        """
+        Put a claimed job back in the queue without using an attempt
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'queued', next_attempt = ?, updated = ? WHERE id = ?",
+                (time.time(), time.time(), job_id)
+            )
+
+    def claim(self, limit):
+        """
+        Mark up to limit due jobs as running, oldest first
+
+        Returns:
+            list: (id, path) pairs
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self.conn:
+            rows = self.conn.execute(
+                "SELECT id, path FROM jobs WHERE status = 'queued' AND next_attempt <= ? "
+                "ORDER BY enqueued, id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE jobs SET status = 'running', updated = ? WHERE id = ?",
+                [(now, job_id) for job_id, _ in rows]
+            )
+        return rows
+
+    def complete(self, job_id, output_file):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'done', output_file = ?, error = NULL, updated = ? WHERE id = ?",
+                (output_file, time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        """
+        Count a failed attempt; requeue with backoff or give up
+
+        Returns:
+            float: Seconds until the retry, or None if the job is dead
+        """
+        attempts = self.conn.execute(
+            "SELECT attempts FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()[0] + 1
+        now = time.time()
+        if attempts >= self.max_attempts:
+            status, delay = 'dead', None
+        else:
+            status = 'queued'
+            delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+        with self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, next_attempt = ?, error = ?, updated = ? "
+                "WHERE id = ?",
+                (status, attempts, now + (delay or 0.0), str(error), now, job_id)
+            )
+        return delay
+
+    def counts(self):
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+    def close(self):
+        self.conn.close()
+
+class DirectoryScanner:
+    """
+    Report media files whose size and mtime have settled
+
+    A file is ready when two consecutive scans see the same size and mtime
+    and it has not been modified for settle_seconds.
+    """
+
+    def __init__(self, directory, recursive=False, settle_seconds=2.0):
+        self.directory = directory
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.seen = {}
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags
+            self.inotify = INotify()
+            self.inotify.add_watch(
+                directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+            )
+        except (ImportError, OSError):
+            pass
+
+    def _media_files(self):
+        if self.recursive:
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    yield os.path.join(root, name)
+        else:
+            for entry in os.scandir(self.directory):
+                if entry.is_file():
+                    yield entry.path
+
+    def scan(self):
+        """
+        Returns:
+            list: (path, size, mtime_ns) of files ready to enqueue
+        """
+        ready = []
+        current = {}
+        now = time.time()
+        for path in self._media_files():
+            if os.path.splitext(path)[1].lower() not in MEDIA_EXTENSIONS:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            path = os.path.abspath(path)
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+            if (self.seen.get(path) == current[path]
+                    and now - stat.st_mtime_ns / 1e9 >= self.settle_seconds):
+                ready.append((path, stat.st_size, stat.st_mtime_ns))
+        self.seen = current
+        return ready
+
+    def wait(self, timeout):
+        """
+        Sleep until the next scan: a filesystem event or timeout seconds
+        """
+        if self.inotify is not None:
+            self.inotify.read(timeout=int(timeout * 1000))
+        else:
+            time.sleep(timeout)
+
+class WatchService:
+    """
+    Drain the job table with a warm worker pool
+
+    Args:
+        input_dir (str): Directory to watch
+        output_dir (str): Transcriptions, jobs.sqlite3, the transcription
+            manifest and metrics
+        model_size (str): Whisper model size
+        workers (int, optional): Worker processes; autotuned when omitted
+        max_in_flight (int, optional): Jobs submitted to the pool at once;
+            defaults to twice the workers
+        max_attempts (int): Attempts per job before it is marked dead
+        backoff_seconds (float): Delay before the first retry, doubled per attempt
+        poll_seconds (float): Longest wait between directory scans
+        output_format (str): As for engine.TranscriptionEngine.run
+        use_vad (bool): Skip non-speech audio before Whisper
+    """
+
+    def __init__(self, input_dir, output_dir, model_size='base', workers=None, max_in_flight=None,
+                 max_attempts=5, backoff_seconds=30.0, poll_seconds=5.0, output_format='txt',
+                 recursive=False, threads_per_worker=None, use_vad=False):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.model_size = model_size
+        self.output_format = output_format
+        self.use_vad = use_vad
+        self.poll_seconds = poll_seconds
+        self.transcriber = EfficientWhisperTranscriber()
+
+        if workers is None:
+            config = autotune.recommend(model_size, device=self.transcriber.device)
+            workers = config['workers']
+            threads_per_worker = threads_per_worker or config['threads_per_worker']
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, self.transcriber.num_cpus // workers)
+        self.max_in_flight = max_in_flight or 2 * workers
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.queue = JobQueue(os.path.join(output_dir, QUEUE_NAME), max_attempts, backoff_seconds)
+        self.cache = TranscriptionCache(output_dir)
+        self.metrics = metrics.MetricsExporter(output_dir, workers=workers)
+        self.scanner = DirectoryScanner(input_dir, recursive=recursive)
+        self.executor = None
+        self.in_flight = {}
+        # Jobs requeued after a crash with others in flight
+        self.suspects = set()
+        self.stopping = False
+
+    def start_pool(self):
+        self.executor = self.transcriber.worker_pool(
+            self.model_size, self.workers, self.threads_per_worker
+        )
+        # Spawn the workers and load the model now, not on the first upload
+        wait([self.executor.submit(os.getpid) for _ in range(self.workers)])
+
+    def job_key(self, path):
+        return self.cache.job_key(
+            path, self.model_size, language='en', fp16=self.transcriber.device == "cuda",
+            chunk_seconds=None, output_format=self.output_format, int8=False,
+            encoder_batch_size=None, vad=self.use_vad
+        )
+
+    def submit_ready(self):
+        limit = self.max_in_flight - len(self.in_flight)
+        if self.suspects:
+            # After a crash, jobs run one at a time until each suspect has
+            # had a turn, so a file that kills its worker does so alone
+            limit = 0 if self.in_flight else 1
+        broken = False
+        for job_id, path in self.queue.claim(limit):
+            self.suspects.discard(job_id)
+            if broken:
+                self.queue.requeue(job_id)
+                continue
+            try:
+                key = self.job_key(path)
+            except OSError as e:
+                # Deleted or unreadable since it was enqueued
+                self.queue.fail(job_id, e)
+                continue
+            cached_output = self.cache.lookup(
+                key, self.transcriber.transcription_base(path, self.output_dir),
+                self.output_format.split(',')
+            )
+            if cached_output:
+                print(f"Already transcribed: {path}")
+                self.queue.complete(job_id, cached_output)
+                continue
+            try:
+                future = self.executor.submit(
+                    self.transcriber.transcribe_in_worker, path, self.output_dir,
+                    self.output_format, None, time.time(), self.use_vad
+                )
+            except BrokenProcessPool:
+                # A job already in flight killed a worker; collect() restarts
+                # the pool, and these never ran, so they keep their attempts
+                broken = True
+                self.queue.requeue(job_id)
+                continue
+            self.cache.mark_running(key, path)
+            self.in_flight[future] = (job_id, path, key)
+
+    def collect(self, timeout):
+        """
+        Record jobs that finish within timeout seconds
+        """
+        if not self.in_flight:
+            self.scanner.wait(timeout)
+            return
+        done, _ = wait(list(self.in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+            # A dead worker fails every job in the pool; collect them all now
+            # so none of them is mistaken for a failure of the restarted pool
+            done = list(self.in_flight)
+            wait(done)
+        crashed = []
+        for future in done:
+            job_id, path, key = self.in_flight.pop(future)
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                crashed.append((job_id, path, key))
+                continue
+            self.metrics.record(
+                path, result.get('stages', {}), result.get('audio_seconds'),
+                success=result['success'], error=result['error']
+            )
+            if result['success']:
+                self.queue.complete(job_id, result['output_file'])
+                self.cache.mark_done(key, path, result['output_file'])
+                print(f"Transcribed: {path}")
+            else:
+                self.fail(job_id, path, key, result['error'])
+
+        # On Ctrl-C the workers die too; crashed jobs are left 'running' so
+        # the next start requeues them without using an attempt
+        if crashed and not self.stopping:
+            self.recover_crash(crashed)
+
+    def fail(self, job_id, path, key, error):
+        self.cache.mark_failed(key, path, error)
+        delay = self.queue.fail(job_id, error)
+        retry = f"retrying in {delay:.0f}s" if delay is not None else "giving up"
+        print(f"Failed: {path} - {error} ({retry})")
+
+    def recover_crash(self, crashed):
+        """
+        Charge or requeue the jobs lost with a broken pool and restart it
+
+        A job that was alone in the pool killed its worker (e.g. out of
+        memory, a decoder crash) and is charged an attempt, so it backs off
+        and eventually goes dead like any other failure. When several were
+        in flight the culprit is unknown: they are requeued without using
+        an attempt and retried one at a time.
+        """
+        if len(crashed) == 1:
+            job_id, path, key = crashed[0]
+            self.fail(job_id, path, key, "worker process died")
+        else:
+            for job_id, path, _ in crashed:
+                self.queue.requeue(job_id)
+                self.suspects.add(job_id)
+                print(f"Requeued: {path} (worker pool broke)")
+        print("Worker pool broke; restarting it")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.start_pool()
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Requeued {recovered} job(s) interrupted by the last shutdown")
+        self.start_pool()
+        print(f"Watching {self.input_dir} with {self.workers} warm {self.model_size} worker(s), "
+              f"at most {self.max_in_flight} job(s) in flight")
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        try:
+            while not self.stopping:
+                for path, size, mtime_ns in self.scanner.scan():
+                    if self.queue.enqueue(path, size, mtime_ns):
+                        print(f"Queued: {path}")
+                self.submit_ready()
+                self.collect(self.poll_seconds)
+
+            # Let running jobs finish; anything still queued waits for the next start
+            print("Stopping after jobs in flight finish")
+            while self.in_flight:
+                self.collect(self.poll_seconds)
+        finally:
+            self.executor.shutdown()
+            self.queue.close()
+            self.cache.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Transcribe media files as they appear in a directory.')
+    parser.add_argument('input_dir')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="Transcription directory (default: 'transcriptions' inside input_dir)")
+    parser.add_argument('-r', '--recursive', action='store_true', help='Watch subdirectories too')
+    parser.add_argument('-m', '--model', default='base',
+                        choices=['tiny', 'base', 'small', 'medium', 'large'])
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Worker processes (default: autotuned)')
+    parser.add_argument('-t', '--threads', type=int, default=None, help='torch threads per worker')
+    parser.add_argument('-f', '--format', dest='output_format', default='txt')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='Jobs handed to the pool at once (default: 2 x workers)')
+    parser.add_argument('--max-attempts', type=int, default=5)
+    parser.add_argument('--backoff', type=float, default=30.0,
+                        help='Seconds before the first retry; doubles per attempt')
+    parser.add_argument('--poll', type=float, default=5.0, help='Seconds between directory scans')
+    parser.add_argument('--vad', action='store_true', help='Skip silence and non-speech audio before Whisper')
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(args.input_dir, 'transcriptions')
+    WatchService(
+        args.input_dir, output_dir,
+        model_size=args.model,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        max_attempts=args.max_attempts,
+        backoff_seconds=args.backoff,
+        poll_seconds=args.poll,
+        output_format=args.output_format,
+        recursive=args.recursive,
+        threads_per_worker=args.threads,
+        use_vad=args.vad
+    ).run()
+
+if __name__ == "__main__":
+    main()